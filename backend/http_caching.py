@@ -0,0 +1,197 @@
+"""
+Response compression and conditional GET.
+
+CompressionMiddleware negotiates brotli (when the brotli package is
+installed) or gzip from Accept-Encoding and compresses complete responses
+above a size threshold. Streaming responses (server-sent events) pass through
+untouched so every event is flushed as soon as it is written.
+
+cacheable_response builds a JSON response with a strong ETag (a hash of the
+body) and optionally Last-Modified, and answers a matching If-None-Match or
+If-Modified-Since with an empty 304. A compressed body is a different
+representation, so the middleware tags it "<etag>-<encoding>" and maps the
+suffix back when the client revalidates.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+# Cache-Control for responses that may change and must be revalidated, and for closed data
+REVALIDATE = "no-cache"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding the client accepts, preferring brotli"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _split_etag(tag: str):
+    """Strip an encoding suffix from an ETag: '"abc-gzip"' -> ('"abc"', 'gzip')"""
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"', encoding
+    return tag, None
+
+
+def _suffix_etag(tag: str, encoding: str) -> str:
+    return tag[:-1] + f'-{encoding}"' if tag.endswith('"') else tag
+
+
+class CompressionMiddleware:
+    """Compresses complete responses above minimum_size with the negotiated encoding"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+
+        # Revalidation of a compressed representation: hand the handler the base tag
+        revalidated_encoding = None
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            tags = []
+            for tag in if_none_match.split(","):
+                tag, tag_encoding = _split_etag(tag.strip())
+                revalidated_encoding = revalidated_encoding or tag_encoding
+                tags.append(tag)
+            scope = dict(scope)
+            scope["headers"] = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+            scope["headers"].append((b"if-none-match", ", ".join(tags).encode("latin-1")))
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            compressible = content_type.startswith(COMPRESSIBLE_TYPES) and "content-encoding" not in headers
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")
+
+            if start["status"] == 304:
+                # Echo the tag the client holds
+                if revalidated_encoding and revalidated_encoding == encoding and "etag" in headers:
+                    headers["ETag"] = _suffix_etag(headers["etag"], encoding)
+            elif (encoding and compressible and not message.get("more_body", False)
+                  and len(body) >= self.minimum_size):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = _suffix_etag(headers["etag"], encoding)
+                message = {**message, "body": body}
+
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+def http_date(value: datetime) -> str:
+    # Naive datetimes come from datetime.fromtimestamp, so astimezone reads them as local time
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; compared weakly as RFC 9110 requires
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+
+def cacheable_response(request: Request, content: Any, last_modified: Optional[datetime] = None,
+                       cache_control: str = REVALIDATE, media_type: str = "application/json") -> Response:
+    """Response with a strong ETag (and Last-Modified), or 304 if the client's copy is current.
+
+    content is encoded as JSON unless it is already bytes.
+    """
+    if isinstance(content, bytes):
+        body = content
+    else:
+        body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
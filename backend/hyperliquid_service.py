@@ -1,14 +1,12 @@
 import os
 import json
 import asyncio
-import websockets
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
-from hyperliquid.info import Info
-from hyperliquid.exchange import Exchange
-from hyperliquid.utils import constants
+import time
 import random
 import uuid
+import requests
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from models import (
@@ -16,35 +14,159 @@ from models import (
     CandlestickData, OrderBook, OrderBookLevel, Account,
     OrderType, OrderSide, OrderStatus, StrategyStatus
 )
+from shared_state import shared_store
+from tick_ring import TickRingReader
+
+INFO_URL = "https://api.hyperliquid.xyz/info"
+API_URLS = {
+    "mainnet": "https://api.hyperliquid.xyz",
+    "testnet": "https://api.hyperliquid-testnet.xyz"
+}
+
+# Shared cache lifetimes in seconds
+MIDS_CACHE_TTL = 1.0
+UNIVERSE_CACHE_TTL = 60.0
+WALLET_STATE_CACHE_TTL = 2.0
+CANDLE_CACHE_TTL = 15.0
+ASSET_CTX_CACHE_TTL = 5.0
+
+# Asset contexts are refreshed in the background while market data is being
+# requested, and the refresher stops after this long without a request
+ASSET_CTX_REFRESH_INTERVAL = 2.0
+ASSET_CTX_IDLE_TIMEOUT = 60.0
+
+# "hyperliquid" (default) or "simulator" to serve synthetic market data for demos and load tests
+MARKET_DATA_SOURCE = os.getenv("MARKET_DATA_SOURCE", "hyperliquid").strip().lower()
+
+INTERVAL_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400}
+
+# Closed candles never change, so ranges ending before the current candle are kept longer
+CLOSED_CANDLE_CACHE_TTL = 3600.0
+MAX_SIMULATED_CANDLE_OFFSET = 5000
+
+# How often books are re-checked for resting paper orders
+PAPER_SWEEP_INTERVAL = 1.0
+
+# Paper accounts live in one process's memory, so paper orders need a single API worker
+# (uvicorn reads the same variable as its default worker count)
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1") or "1")
+
+# Ticks older than this are ignored in favour of an upstream call
+MAX_TICK_AGE_MS = 5000
+TICK_RING_RETRY_SECONDS = 5.0
+
+_tick_reader = None
+_tick_reader_checked_at = None
+# Last write sequence seen on the attached ring and when it last moved
+_tick_reader_seq = 0
+_tick_reader_moved_at = 0.0
+_paper_sweeper: Optional[asyncio.Task] = None
+_asset_ctx_refresher: Optional[asyncio.Task] = None
+_asset_ctx_used_at = 0.0
+
+# Upstream fetches currently running in this process, by cache key
+_inflight_fetches: Dict[str, asyncio.Future] = {}
+
+# One keep-alive connection pool for every service's public info requests
+HTTP_POOL_SIZE = 32
+_http_session = requests.Session()
+_http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE))
+
+def get_simulator():
+    """Process-wide market simulator (NumPy is only imported when simulated data is used)"""
+    from market_simulator import get_market_simulator
+    return get_market_simulator()
+
+def is_simulated() -> bool:
+    return MARKET_DATA_SOURCE == "simulator"
+
+def get_paper_exchange():
+    """Paper account that takes orders while no trading credentials are configured"""
+    from paper_trading import get_paper_exchange as get_exchange
+    return get_exchange()
+
+def require_single_worker():
+    """Refuse paper orders when requests are spread over several workers, each with its own
+    paper account; no paper order exists then, so every worker reports the same empty account"""
+    if API_WORKERS > 1:
+        raise Exception(
+            f"Paper trading needs a single API worker (WEB_CONCURRENCY=1, not {API_WORKERS}); "
+            f"configure trading credentials to trade with more workers"
+        )
+
+def is_closed_candle_range(interval: str, end_time: int, now_ms: Optional[int] = None) -> bool:
+    """Whether a range ending at end_time (epoch ms) holds only closed candles"""
+    interval_ms = INTERVAL_SECONDS.get(interval, 3600) * 1000
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return end_time < now_ms - now_ms % interval_ms
+
+def optional_float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+def fill_id(*parts) -> str:
+    """Stable Order id for a fill, so repeated history responses (and their ETags) match"""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, ":".join(map(str, parts))))
+
+def get_tick_reader() -> Optional[TickRingReader]:
+    """Reader for the market ingest process's tick ring, if it is running.
+    
+    A restarted ingest process replaces the segment, leaving an attached
+    reader on the old one, whose writes have stopped. A ring that has not
+    moved for TICK_RING_RETRY_SECONDS is re-attached.
+    """
+    global _tick_reader, _tick_reader_checked_at, _tick_reader_seq, _tick_reader_moved_at
+    now = time.monotonic()
+    if _tick_reader is not None:
+        seq = _tick_reader.write_seq
+        if seq != _tick_reader_seq:
+            _tick_reader_seq, _tick_reader_moved_at = seq, now
+            return _tick_reader
+        if now - _tick_reader_moved_at < TICK_RING_RETRY_SECONDS:
+            return _tick_reader
+    if _tick_reader_checked_at is None or now - _tick_reader_checked_at >= TICK_RING_RETRY_SECONDS:
+        _tick_reader_checked_at = now
+        reader = TickRingReader.attach()
+        if _tick_reader is not None:
+            _tick_reader.close()
+        _tick_reader = reader
+        if reader:
+            _tick_reader_seq, _tick_reader_moved_at = reader.write_seq, now
+            print(f"Attached to market ingest tick ring '{reader.name}'")
+    return _tick_reader
 
 class HyperliquidService:
-    def __init__(self, wallet_address=None, api_key=None, api_secret=None, environment="testnet"):
+    def __init__(self, wallet_address=None, api_key=None, api_secret=None, environment="testnet", info=None):
         # Use provided credentials or get from environment
         self.wallet_address = wallet_address or os.getenv("HYPERLIQUID_WALLET_ADDRESS", "")
         self.api_key = api_key or os.getenv("HYPERLIQUID_API_KEY", "")
         self.api_secret = api_secret or os.getenv("HYPERLIQUID_API_SECRET", "")
         self.environment = environment or os.getenv("HYPERLIQUID_ENV", "testnet")
         
+        self.base_url = API_URLS["testnet"] if self.environment == "testnet" else API_URLS["mainnet"]
+        
         # Check if we have the required credentials
         self.is_configured = bool(self.wallet_address and self.api_key and self.api_secret)
         
         if self.is_configured:
             try:
-                self.base_url = (
-                    "https://api.hyperliquid-testnet.xyz" if self.environment == "testnet" 
-                    else "https://api.hyperliquid.xyz"
-                )
-                
                 print(f"Hyperliquid service initialized:")
                 print(f"- Environment: {self.environment}")
                 print(f"- Target Wallet: {self.wallet_address}")
                 
-                # Initialize Info API (doesn't need private key)
-                self.info = Info(self.base_url, skip_ws=True)
+                # The SDK and eth_account are slow to import, only load them when configured
+                from hyperliquid.info import Info
+                from hyperliquid.exchange import Exchange
+                from eth_account import Account
+                
+                # Initialize Info API (doesn't need private key), reusing one
+                # built for the same environment when the caller has it
+                if info is not None and getattr(info, "base_url", None) == self.base_url:
+                    self.info = info
+                else:
+                    self.info = Info(self.base_url, skip_ws=True)
                 
                 # Initialize Exchange for trading (needs private key)
                 # Note: We pass the private key, but we'll query using the target wallet address
-                from eth_account import Account
                 wallet_account = Account.from_key(self.api_secret)
                 self.exchange = Exchange(wallet_account, self.base_url)
                 
@@ -63,182 +185,308 @@ class HyperliquidService:
     def is_api_configured(self) -> bool:
         return self.is_configured
     
+    async def prefetch(self):
+        """Load this account's wallet state into the shared cache"""
+        if self.is_configured:
+            await self._get_user_state(self.wallet_address)
+    
+    def close(self):
+        """Release the trading connection pool once the service is retired.
+        
+        The Info client may have been handed to a replacement service, so it is
+        left to be garbage collected instead of closed here.
+        """
+        exchange = getattr(self, "exchange", None)
+        session = getattr(exchange, "session", None)
+        if session is not None:
+            session.close()
+    
+    async def _cached(self, key: str, ttl: float, fetch) -> Any:
+        """Return a value from the shared cache, fetching it off-loop on a miss.
+        
+        Concurrent misses for the same key share a single upstream fetch.
+        """
+        cached = await shared_store.get_json(key)
+        if cached is not None:
+            return cached
+        
+        inflight = _inflight_fetches.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight_fetches[key] = future
+        try:
+            value = await asyncio.to_thread(fetch)
+            await shared_store.set_json(key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else Exception(f"Fetch of {key} was cancelled"))
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            _inflight_fetches.pop(key, None)
+    
+    def _post_info(self, payload: Dict[str, Any], url: str = INFO_URL) -> Any:
+        """Blocking POST to a public /info endpoint over the shared connection pool"""
+        response = _http_session.post(
+            url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=10
+        )
+        if response.status_code != 200:
+            raise Exception(f"Info request {payload.get('type')} failed: HTTP {response.status_code}")
+        return response.json()
+    
+    async def get_all_mids(self) -> Dict[str, Any]:
+        """Current mid prices for every coin (tick ring, else shared market cache)"""
+        if is_simulated():
+            return get_simulator().all_mids()
+        reader = get_tick_reader()
+        if reader:
+            mids = reader.all_mids(MAX_TICK_AGE_MS)
+            if mids:
+                return mids
+        return await self._cached("market:all_mids", MIDS_CACHE_TTL, lambda: self._post_info({"type": "allMids"}))
+    
+    async def get_universe(self) -> Dict[str, Any]:
+        """Perpetuals universe metadata (shared universe cache)"""
+        if is_simulated():
+            return get_simulator().universe()
+        return await self._cached("universe:meta", UNIVERSE_CACHE_TTL, lambda: self._post_info({"type": "meta"}))
+    
+    async def get_asset_contexts(self) -> Dict[str, Dict[str, Any]]:
+        """Asset context per coin for the whole perp universe (shared market cache).
+        
+        Each context carries dayNtlVlm, prevDayPx, funding, openInterest,
+        markPx, oraclePx, midPx and impactPxs as returned by metaAndAssetCtxs.
+        """
+        global _asset_ctx_used_at
+        _asset_ctx_used_at = time.monotonic()
+        self._ensure_asset_ctx_refresher()
+        return await self._cached("market:asset_ctxs", ASSET_CTX_CACHE_TTL, self._fetch_asset_contexts)
+    
+    def _fetch_asset_contexts(self) -> Dict[str, Dict[str, Any]]:
+        meta, contexts = self._post_info({"type": "metaAndAssetCtxs"})
+        return {asset["name"]: context for asset, context in zip(meta.get("universe", []), contexts)}
+    
+    def _ensure_asset_ctx_refresher(self):
+        """Keep the asset contexts warm while market data is being requested"""
+        global _asset_ctx_refresher
+        if _asset_ctx_refresher is None or _asset_ctx_refresher.done():
+            _asset_ctx_refresher = asyncio.create_task(self._refresh_asset_contexts())
+    
+    async def _refresh_asset_contexts(self):
+        while time.monotonic() - _asset_ctx_used_at < ASSET_CTX_IDLE_TIMEOUT:
+            await asyncio.sleep(ASSET_CTX_REFRESH_INTERVAL)
+            try:
+                contexts = await asyncio.to_thread(self._fetch_asset_contexts)
+                await shared_store.set_json("market:asset_ctxs", contexts, ASSET_CTX_CACHE_TTL)
+            except Exception as e:
+                print(f"Error refreshing asset contexts: {e}")
+    
+    async def _get_top_of_book(self, coin: str) -> Optional[tuple]:
+        """Best bid and ask: the ingest process's tick ring, else the shared L2 book cache"""
+        reader = get_tick_reader()
+        quote = reader.latest(coin) if reader else None
+        if quote and quote.bid > 0 and quote.ask > 0 and \
+                quote.bbo_ts_ms >= time.time() * 1000 - MAX_TICK_AGE_MS:
+            return quote.bid, quote.ask
+        try:
+            bids, asks = (await self.get_l2_book(coin))["levels"]
+            if bids and asks:
+                return float(bids[0]["px"]), float(asks[0]["px"])
+        except Exception as e:
+            print(f"Error fetching top of book for {coin}: {e}")
+        return None
+    
+    async def get_spot_universe(self) -> Dict[str, Any]:
+        """Spot universe metadata (shared universe cache)"""
+        return await self._cached("universe:spot_meta", UNIVERSE_CACHE_TTL, lambda: self._post_info({"type": "spotMeta"}))
+    
+    async def get_l2_book(self, coin: str) -> Dict[str, Any]:
+        """Raw L2 book snapshot for a coin (shared market cache)"""
+        return await self._cached(
+            f"market:l2_book:{coin}",
+            MIDS_CACHE_TTL,
+            lambda: self._post_info({"type": "l2Book", "coin": coin})
+        )
+    
+    async def _get_user_state(self, wallet: str) -> Dict[str, Any]:
+        """Perp clearinghouse state for a wallet (shared wallet-state cache)"""
+        return await self._cached(
+            f"wallet:{self.environment}:{wallet.lower()}:user_state",
+            WALLET_STATE_CACHE_TTL,
+            lambda: self._post_info({"type": "clearinghouseState", "user": wallet}, f"{self.base_url}/info")
+        )
+    
+    async def _get_spot_state(self, wallet: str) -> Dict[str, Any]:
+        """Spot clearinghouse state for a wallet (shared wallet-state cache)"""
+        return await self._cached(
+            f"wallet:{self.environment}:{wallet.lower()}:spot_state",
+            WALLET_STATE_CACHE_TTL,
+            lambda: self._post_info({"type": "spotClearinghouseState", "user": wallet}, f"{self.base_url}/info")
+        )
+    
     async def get_portfolio(self) -> Portfolio:
         """Get user portfolio with positions and account value"""
         if not self.is_configured:
-            return self._generate_mock_portfolio()
+            return await self._get_paper_portfolio()
         
         try:
             print("Portfolio: Using real Hyperliquid API data")
-            
-            # Use the wallet address from settings, not derived from private key
-            target_wallet = self.wallet_address
-            print(f"Querying portfolio for wallet: {target_wallet}")
-            
-            # Get user state from Hyperliquid using the target wallet address
-            user_state = self.info.user_state(target_wallet)
-            
-            # Debug: Print the raw user_state response
-            print(f"Raw user_state response: {json.dumps(user_state, indent=2)}")
-            
-            portfolio = Portfolio(
-                account_value=float(user_state.get("marginSummary", {}).get("accountValue", 0)),
-                available_balance=float(user_state.get("withdrawable", 0)),
-                margin_used=float(user_state.get("marginSummary", {}).get("totalMarginUsed", 0)),
-                total_pnl=float(user_state.get("marginSummary", {}).get("totalRawUsd", 0))
-            )
-            
-            # Convert positions
-            positions = []
-            for pos in user_state.get("assetPositions", []):
-                if float(pos["position"]["szi"]) != 0:
-                    position = Position(
-                        coin=pos["position"]["coin"],
-                        size=abs(float(pos["position"]["szi"])),
-                        entry_price=float(pos["position"]["entryPx"]),
-                        current_price=float(pos["position"]["positionValue"]) / abs(float(pos["position"]["szi"])),
-                        unrealized_pnl=float(pos["position"]["unrealizedPnl"]),
-                        side=OrderSide.BUY if float(pos["position"]["szi"]) > 0 else OrderSide.SELL
-                    )
-                    positions.append(position)
-            
-            portfolio.positions = positions
-            
-            print(f"Portfolio: Account Value ${portfolio.account_value}, Available ${portfolio.available_balance}, Positions: {len(positions)}")
-            return portfolio
+            return await self.fetch_portfolio()
             
         except Exception as e:
             print(f"Error fetching real portfolio: {e}")
             print("Portfolio: Falling back to mock data")
             return self._generate_mock_portfolio()
     
+    async def fetch_portfolio(self) -> Portfolio:
+        """Real portfolio of the configured wallet; raises instead of falling back to mock data"""
+        # Use the wallet address from settings, not derived from private key
+        target_wallet = self.wallet_address
+        print(f"Querying portfolio for wallet: {target_wallet}")
+        
+        # Get user state from Hyperliquid using the target wallet address
+        user_state = await self._get_user_state(target_wallet)
+        
+        # Debug: Print the raw user_state response
+        print(f"Raw user_state response: {json.dumps(user_state, indent=2)}")
+        
+        portfolio = Portfolio(
+            account_value=float(user_state.get("marginSummary", {}).get("accountValue", 0)),
+            available_balance=float(user_state.get("withdrawable", 0)),
+            margin_used=float(user_state.get("marginSummary", {}).get("totalMarginUsed", 0)),
+            total_pnl=float(user_state.get("marginSummary", {}).get("totalRawUsd", 0))
+        )
+        
+        # Convert positions
+        positions = []
+        for pos in user_state.get("assetPositions", []):
+            if float(pos["position"]["szi"]) != 0:
+                position = Position(
+                    coin=pos["position"]["coin"],
+                    size=abs(float(pos["position"]["szi"])),
+                    entry_price=float(pos["position"]["entryPx"]),
+                    current_price=float(pos["position"]["positionValue"]) / abs(float(pos["position"]["szi"])),
+                    unrealized_pnl=float(pos["position"]["unrealizedPnl"]),
+                    side=OrderSide.BUY if float(pos["position"]["szi"]) > 0 else OrderSide.SELL
+                )
+                positions.append(position)
+        
+        portfolio.positions = positions
+        
+        print(f"Portfolio: Account Value ${portfolio.account_value}, Available ${portfolio.available_balance}, Positions: {len(positions)}")
+        return portfolio
+    
     async def get_account_info(self) -> Account:
         """Get account information"""
         if not self.is_configured:
-            print("Account: Using mock data - API not configured")
-            return self._generate_mock_account()
+            print("Account: Using paper account - API not configured")
+            return await self._get_paper_account()
         
         try:
             print("Account: Using real Hyperliquid API data")
-            
-            # Use the wallet address from settings, not derived from private key
-            target_wallet = self.wallet_address
-            print(f"Querying account info for wallet: {target_wallet}")
-            
-            user_state = self.info.user_state(target_wallet)
-            
-            # Debug: Print the raw user_state response
-            print(f"Raw user_state response: {json.dumps(user_state, indent=2)}")
-            
-            # Get account value from marginSummary
-            margin_summary = user_state.get("marginSummary", {})
-            account_value = float(margin_summary.get("accountValue", 0))
-            withdrawable = float(user_state.get("withdrawable", 0))
-            
-            # If perpetual account is empty, check spot balances using different API
-            spot_balance = 0.0
-            try:
-                # Try to get spot token balances using the public API
-                import requests
-                
-                spot_response = requests.post(
-                    "https://api.hyperliquid.xyz/info",
-                    json={"type": "spotClearinghouseState", "user": target_wallet},
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if spot_response.status_code == 200:
-                    spot_data = spot_response.json()
-                    print(f"Raw spot_clearinghouse response: {json.dumps(spot_data, indent=2)}")
-                    
-                    if "balances" in spot_data:
-                        for balance in spot_data["balances"]:
-                            if balance.get("coin") == "USDC":
-                                total = float(balance.get("total", 0))
-                                hold = float(balance.get("hold", 0))
-                                spot_balance = total + hold
-                                print(f"Found USDC spot balance: total={total}, hold={hold}, combined={spot_balance}")
-                                break
-                else:
-                    print(f"Spot API response status: {spot_response.status_code}")
-                    print(f"Spot API response: {spot_response.text}")
-                    
-            except Exception as e:
-                print(f"Error fetching spot balances via API: {e}")
-            
-            # Use the higher of perp account value or spot balance
-            total_account_value = max(account_value, spot_balance)
-            total_withdrawable = max(withdrawable, spot_balance)
-            
-            account = Account(
-                address=target_wallet,
-                account_value=total_account_value,
-                margin_summary=margin_summary,
-                cross_margin_summary=user_state.get("crossMarginSummary", {}),
-                withdrawable=total_withdrawable
-            )
-            
-            print(f"Account: Address {account.address[:8]}..., Account Value: ${account.account_value}, Withdrawable: ${account.withdrawable}")
-            print(f"Perp Account Value: ${account_value}, Spot Balance: ${spot_balance}")
-            return account
+            return await self.fetch_account_info()
             
         except Exception as e:
             print(f"Error fetching real account info: {e}")
             print("Account: Falling back to mock data")
             return self._generate_mock_account()
     
+    async def fetch_account_info(self) -> Account:
+        """Real account information of the configured wallet; raises instead of falling back to mock data"""
+        # Use the wallet address from settings, not derived from private key
+        target_wallet = self.wallet_address
+        print(f"Querying account info for wallet: {target_wallet}")
+        
+        user_state = await self._get_user_state(target_wallet)
+        
+        # Debug: Print the raw user_state response
+        print(f"Raw user_state response: {json.dumps(user_state, indent=2)}")
+        
+        # Get account value from marginSummary
+        margin_summary = user_state.get("marginSummary", {})
+        account_value = float(margin_summary.get("accountValue", 0))
+        withdrawable = float(user_state.get("withdrawable", 0))
+        
+        # If perpetual account is empty, check spot balances using different API
+        spot_balance = 0.0
+        try:
+            # Try to get spot token balances using the public API
+            spot_data = await self._get_spot_state(target_wallet)
+            print(f"Raw spot_clearinghouse response: {json.dumps(spot_data, indent=2)}")
+            
+            if "balances" in spot_data:
+                for balance in spot_data["balances"]:
+                    if balance.get("coin") == "USDC":
+                        total = float(balance.get("total", 0))
+                        hold = float(balance.get("hold", 0))
+                        spot_balance = total + hold
+                        print(f"Found USDC spot balance: total={total}, hold={hold}, combined={spot_balance}")
+                        break
+                
+        except Exception as e:
+            print(f"Error fetching spot balances via API: {e}")
+        
+        # Use the higher of perp account value or spot balance
+        total_account_value = max(account_value, spot_balance)
+        total_withdrawable = max(withdrawable, spot_balance)
+        
+        account = Account(
+            address=target_wallet,
+            account_value=total_account_value,
+            margin_summary=margin_summary,
+            cross_margin_summary=user_state.get("crossMarginSummary", {}),
+            withdrawable=total_withdrawable
+        )
+        
+        print(f"Account: Address {account.address[:8]}..., Account Value: ${account.account_value}, Withdrawable: ${account.withdrawable}")
+        print(f"Perp Account Value: ${account_value}, Spot Balance: ${spot_balance}")
+        return account
+    
     async def get_market_data(self, coin: str) -> MarketData:
         """Get current market data for a coin from real Hyperliquid API"""
+        if is_simulated():
+            return self._generate_mock_market_data(coin)
         try:
-            # Always fetch real market data from Hyperliquid public API
-            import requests
-            
-            # Get all mids (current prices)
-            mids_response = requests.post(
-                "https://api.hyperliquid.xyz/info",
-                json={"type": "allMids"},
-                headers={"Content-Type": "application/json"}
+            # Mids, the universe-wide asset contexts and the book all come from shared caches
+            all_mids, contexts, top_of_book = await asyncio.gather(
+                self.get_all_mids(), self.get_asset_contexts(), self._get_top_of_book(coin)
             )
+            context = contexts.get(coin) or {}
+            
+            # Get current price for the coin
+            current_price = float(all_mids.get(coin) or context.get("midPx") or context.get("markPx") or 0)
             
-            if mids_response.status_code == 200:
-                all_mids = mids_response.json()
+            if current_price > 0:
+                if top_of_book:
+                    bid, ask = top_of_book
+                else:
+                    # Impact prices bound the touch when no book is available
+                    impact = context.get("impactPxs") or [current_price, current_price]
+                    bid, ask = float(impact[0]), float(impact[1])
                 
-                # Get current price for the coin
-                current_price = float(all_mids.get(coin, 0))
+                prev_day_price = optional_float(context.get("prevDayPx"))
+                change_24h = (current_price - prev_day_price) / prev_day_price * 100 if prev_day_price else 0.0
                 
-                if current_price > 0:
-                    # Get 24h volume and other data
-                    meta_response = requests.post(
-                        "https://api.hyperliquid.xyz/info", 
-                        json={"type": "meta"},
-                        headers={"Content-Type": "application/json"}
-                    )
-                    
-                    # Calculate approximate bid/ask spread (0.1% typical for major pairs)
-                    spread = current_price * 0.001
-                    bid = current_price - spread
-                    ask = current_price + spread
-                    
-                    # Get 24h stats if available
-                    stats_response = requests.post(
-                        "https://api.hyperliquid.xyz/info",
-                        json={"type": "spotMeta"},
-                        headers={"Content-Type": "application/json"}
-                    )
-                    
-                    # For now, we'll use approximate values for volume and change
-                    # In a production system, you'd calculate these from historical data
-                    volume_24h = current_price * 1000000  # Approximate volume
-                    change_24h = 0.0  # Would need historical data to calculate
-                    
-                    return MarketData(
-                        coin=coin,
-                        price=current_price,
-                        bid=bid,
-                        ask=ask,
-                        volume_24h=volume_24h,
-                        change_24h=change_24h
-                    )
+                return MarketData(
+                    coin=coin,
+                    price=current_price,
+                    bid=bid,
+                    ask=ask,
+                    volume_24h=optional_float(context.get("dayNtlVlm")) or 0.0,
+                    change_24h=change_24h,
+                    prev_day_price=prev_day_price,
+                    mark_price=optional_float(context.get("markPx")),
+                    oracle_price=optional_float(context.get("oraclePx")),
+                    funding=optional_float(context.get("funding")),
+                    open_interest=optional_float(context.get("openInterest"))
+                )
             
             # If we can't get real data, return error
             raise Exception(f"Could not fetch real market data for {coin}")
@@ -247,13 +495,17 @@ class HyperliquidService:
             print(f"Error fetching real market data for {coin}: {e}")
             raise Exception(f"Failed to fetch real market data: {str(e)}")
     
-    async def get_candlestick_data(self, coin: str, interval: str = "1h", limit: int = 100) -> List[CandlestickData]:
-        """Get real candlestick data for a coin from Hyperliquid API"""
+    async def get_candlestick_data(self, coin: str, interval: str = "1h", limit: int = 100,
+                                   end_time: Optional[int] = None) -> List[CandlestickData]:
+        """Get real candlestick data for a coin from Hyperliquid API.
+
+        end_time (epoch ms) ends the range in the past; ranges that end before
+        the current candle are closed and cached for longer.
+        """
+        if is_simulated():
+            return self._generate_mock_candlestick_data(coin, limit, interval, end_time)
         try:
             # Always fetch real candlestick data from Hyperliquid public API
-            import requests
-            from datetime import datetime, timedelta
-            
             # Convert interval to Hyperliquid format
             interval_map = {
                 "1m": "1m",
@@ -267,7 +519,9 @@ class HyperliquidService:
             hl_interval = interval_map.get(interval, "1h")
             
             # Get current time and calculate start time
-            end_time = int(datetime.utcnow().timestamp() * 1000)
+            now_ms = int(time.time() * 1000)
+            closed = end_time is not None and is_closed_candle_range(interval, end_time, now_ms)
+            end_time = min(end_time, now_ms) if end_time is not None else now_ms
             
             # Calculate interval duration in milliseconds
             interval_ms = {
@@ -281,9 +535,10 @@ class HyperliquidService:
             
             start_time = end_time - (limit * interval_ms.get(hl_interval, 60 * 60 * 1000))
             
-            candles_response = requests.post(
-                "https://api.hyperliquid.xyz/info",
-                json={
+            candles_data = await self._cached(
+                f"candles:{coin}:{hl_interval}:{limit}:{end_time}" if closed else f"candles:{coin}:{hl_interval}:{limit}",
+                CLOSED_CANDLE_CACHE_TTL if closed else CANDLE_CACHE_TTL,
+                lambda: self._post_info({
                     "type": "candleSnapshot",
                     "req": {
                         "coin": coin,
@@ -291,13 +546,10 @@ class HyperliquidService:
                         "startTime": start_time,
                         "endTime": end_time
                     }
-                },
-                headers={"Content-Type": "application/json"}
+                })
             )
             
-            if candles_response.status_code == 200:
-                candles_data = candles_response.json()
-                
+            if candles_data is not None:
                 candlesticks = []
                 for candle in candles_data:
                     # Hyperliquid candle format: [timestamp, open, high, low, close, volume]
@@ -324,19 +576,13 @@ class HyperliquidService:
     
     async def get_order_book(self, coin: str) -> OrderBook:
         """Get real order book for a coin from Hyperliquid API"""
+        if is_simulated():
+            return self._generate_mock_order_book(coin)
         try:
             # Always fetch real order book data from Hyperliquid public API
-            import requests
-            
-            orderbook_response = requests.post(
-                "https://api.hyperliquid.xyz/info",
-                json={"type": "l2Book", "coin": coin},
-                headers={"Content-Type": "application/json"}
-            )
+            l2_book = await self.get_l2_book(coin)
             
-            if orderbook_response.status_code == 200:
-                l2_book = orderbook_response.json()
-                
+            if l2_book:
                 bids = []
                 asks = []
                 
@@ -371,7 +617,8 @@ class HyperliquidService:
                          order_type: OrderType = OrderType.LIMIT, reduce_only: bool = False) -> Order:
         """Place a trading order"""
         if not self.is_configured:
-            return self._generate_mock_order(coin, is_buy, size, price, order_type)
+            require_single_worker()
+            return await self._place_paper_order(coin, is_buy, size, price, order_type, reduce_only)
         
         try:
             print(f"Placing order: {coin}, buy={is_buy}, size={size}, price={price}, type={order_type}")
@@ -458,12 +705,22 @@ class HyperliquidService:
                 
         except Exception as e:
             print(f"Error placing order: {e}")
-            return self._generate_mock_order(coin, is_buy, size, price, order_type)
+            return Order(
+                coin=coin,
+                side=OrderSide.BUY if is_buy else OrderSide.SELL,
+                size=size,
+                price=price,
+                order_type=order_type,
+                status=OrderStatus.REJECTED,
+                remaining_size=size,
+                reduce_only=reduce_only
+            )
     
     async def cancel_order(self, coin: str, oid: int) -> bool:
         """Cancel an order"""
         if not self.is_configured:
-            return True  # Mock success
+            require_single_worker()
+            return get_paper_exchange().cancel_order(coin, oid)
         
         try:
             response = self.exchange.cancel(coin, oid)
@@ -476,36 +733,40 @@ class HyperliquidService:
     async def get_open_orders(self) -> List[Order]:
         """Get all open orders"""
         if not self.is_configured:
-            return self._generate_mock_orders(5)
+            return [self._paper_order_model(order) for order in get_paper_exchange().open_orders()]
         
         try:
-            # Use the wallet address from settings
-            target_wallet = self.wallet_address
-            open_orders = self.info.open_orders(target_wallet)
-            
-            orders = []
-            for order_data in open_orders:
-                orders.append(Order(
-                    oid=order_data.get("oid"),
-                    coin=order_data.get("coin"),
-                    side=OrderSide.BUY if order_data.get("side") == "B" else OrderSide.SELL,
-                    size=float(order_data.get("sz", 0)),
-                    price=float(order_data.get("limitPx", 0)),
-                    order_type=OrderType.LIMIT,
-                    status=OrderStatus.PENDING,
-                    remaining_size=float(order_data.get("sz", 0))
-                ))
-            
-            return orders
+            return await self.fetch_open_orders()
             
         except Exception as e:
             print(f"Error fetching open orders: {e}")
             return self._generate_mock_orders(5)
     
+    async def fetch_open_orders(self) -> List[Order]:
+        """Real open orders of the configured wallet; raises instead of falling back to mock data"""
+        # Use the wallet address from settings
+        target_wallet = self.wallet_address
+        open_orders = await asyncio.to_thread(self.info.open_orders, target_wallet)
+        
+        orders = []
+        for order_data in open_orders:
+            orders.append(Order(
+                oid=order_data.get("oid"),
+                coin=order_data.get("coin"),
+                side=OrderSide.BUY if order_data.get("side") == "B" else OrderSide.SELL,
+                size=float(order_data.get("sz", 0)),
+                price=float(order_data.get("limitPx", 0)),
+                order_type=OrderType.LIMIT,
+                status=OrderStatus.PENDING,
+                remaining_size=float(order_data.get("sz", 0))
+            ))
+        
+        return orders
+    
     async def get_order_history(self, limit: int = 50) -> List[Order]:
         """Get order history from real Hyperliquid API"""
         if not self.is_configured:
-            return self._generate_mock_orders(limit)
+            return self._get_paper_fills(limit)
         
         try:
             import requests
@@ -524,6 +785,7 @@ class HyperliquidService:
                 for fill in fills_data[:limit]:
                     # Convert Hyperliquid fill to our Order format
                     orders.append(Order(
+                        id=fill_id(fill.get("oid"), fill.get("tid"), fill.get("time")),
                         oid=fill.get("oid"),
                         coin=fill.get("coin"),
                         side=OrderSide.BUY if fill.get("side") == "B" else OrderSide.SELL,
@@ -548,116 +810,232 @@ class HyperliquidService:
             print(f"Error fetching order history: {e}")
             return self._generate_mock_orders(limit)
     
-    # Mock data generators
+    # Paper trading, used while no trading credentials are configured
+    async def _get_paper_levels(self, coin: str) -> tuple:
+        """External book the paper engine matches against: (bids, asks) best first"""
+        if is_simulated():
+            bids, asks = get_simulator().order_book(coin)
+            return bids.tolist(), asks.tolist()
+        from paper_trading import levels_from_l2
+        return levels_from_l2(await self.get_l2_book(coin))
+    
+    async def _place_paper_order(self, coin: str, is_buy: bool, size: float, price: Optional[float],
+                                 order_type: OrderType, reduce_only: bool) -> Order:
+        bids, asks = await self._get_paper_levels(coin)
+        paper_order = get_paper_exchange().place_order(
+            coin, is_buy, size, price, order_type == OrderType.MARKET, bids, asks, reduce_only
+        )
+        if paper_order.reject_reason:
+            print(f"Paper order {paper_order.oid} {paper_order.status}: {paper_order.reject_reason}")
+        if paper_order.is_open:
+            self._ensure_paper_sweeper()
+        return self._paper_order_model(paper_order)
+    
+    def _ensure_paper_sweeper(self):
+        """Keep matching resting paper orders against fresh books while any are open"""
+        global _paper_sweeper
+        if _paper_sweeper is None or _paper_sweeper.done():
+            _paper_sweeper = asyncio.create_task(self._sweep_paper_orders())
+    
+    async def _sweep_paper_orders(self):
+        exchange = get_paper_exchange()
+        while exchange.coins_with_resting_orders():
+            await asyncio.sleep(PAPER_SWEEP_INTERVAL)
+            for coin in exchange.coins_with_resting_orders():
+                try:
+                    bids, asks = await self._get_paper_levels(coin)
+                    for fill in exchange.on_book(coin, bids, asks):
+                        print(f"Paper fill: {fill.coin} {'buy' if fill.is_buy else 'sell'} {fill.sz} @ {fill.px}")
+                except Exception as e:
+                    print(f"Error matching paper orders for {coin}: {e}")
+    
+    def _paper_order_model(self, paper_order) -> Order:
+        return Order(
+            oid=paper_order.oid,
+            coin=paper_order.coin,
+            side=OrderSide.BUY if paper_order.is_buy else OrderSide.SELL,
+            size=paper_order.size,
+            price=paper_order.price if paper_order.price is not None else paper_order.average_price,
+            order_type=OrderType.MARKET if paper_order.is_market else OrderType.LIMIT,
+            status=OrderStatus(paper_order.status),
+            filled_size=paper_order.filled,
+            remaining_size=paper_order.remaining if paper_order.is_open else 0.0,
+            average_fill_price=paper_order.average_price,
+            reduce_only=paper_order.reduce_only,
+            created_at=datetime.fromtimestamp(paper_order.created_ms / 1000),
+            updated_at=datetime.fromtimestamp(paper_order.updated_ms / 1000)
+        )
+    
+    def _get_paper_fills(self, limit: int) -> List[Order]:
+        fills = list(get_paper_exchange().fills)[-limit:]
+        return [
+            Order(
+                id=fill_id(fill.oid, fill.ts_ms, fill.px, fill.sz, fill.liquidity),
+                oid=fill.oid,
+                coin=fill.coin,
+                side=OrderSide.BUY if fill.is_buy else OrderSide.SELL,
+                size=fill.sz,
+                price=fill.px,
+                order_type=OrderType.LIMIT if fill.liquidity == "maker" else OrderType.MARKET,
+                status=OrderStatus.FILLED,
+                filled_size=fill.sz,
+                remaining_size=0.0,
+                average_fill_price=fill.px,
+                created_at=datetime.fromtimestamp(fill.ts_ms / 1000),
+                updated_at=datetime.fromtimestamp(fill.ts_ms / 1000)
+            )
+            for fill in reversed(fills)
+        ]
+    
+    async def _get_paper_portfolio(self) -> Portfolio:
+        exchange = get_paper_exchange()
+        if any(position.size for position in exchange.positions.values()):
+            try:
+                exchange.update_marks(await self.get_all_mids())
+            except Exception as e:
+                print(f"Could not mark paper positions: {e}")
+        
+        summary = exchange.summary()
+        positions = [
+            Position(
+                coin=coin,
+                size=abs(position.size),
+                entry_price=position.entry_price,
+                current_price=exchange.marks.get(coin, position.entry_price),
+                unrealized_pnl=(exchange.marks.get(coin, position.entry_price) - position.entry_price) * position.size,
+                realized_pnl=position.realized_pnl,
+                side=OrderSide.BUY if position.size > 0 else OrderSide.SELL
+            )
+            for coin, position in exchange.positions.items() if position.size
+        ]
+        return Portfolio(
+            account_value=summary["account_value"],
+            available_balance=summary["available_balance"],
+            margin_used=summary["margin_used"],
+            total_pnl=summary["total_pnl"],
+            positions=positions
+        )
+    
+    async def _get_paper_account(self) -> Account:
+        portfolio = await self._get_paper_portfolio()
+        return Account(
+            address="paper",
+            account_value=portfolio.account_value,
+            margin_summary={
+                "accountValue": portfolio.account_value,
+                "totalMarginUsed": portfolio.margin_used,
+                "totalPnl": portfolio.total_pnl
+            },
+            withdrawable=portfolio.available_balance
+        )
+    
+    # Mock data generators, backed by the seeded market simulator so every
+    # view of a coin agrees with its simulated price
     def _generate_mock_portfolio(self) -> Portfolio:
         """Generate mock portfolio data"""
+        from market_simulator import DEMO_CASH
+        demo_positions = get_simulator().demo_positions()
         positions = [
             Position(
-                coin="BTC",
-                size=0.5,
-                entry_price=45000,
-                current_price=46500,
-                unrealized_pnl=750,
-                side=OrderSide.BUY
-            ),
-            Position(
-                coin="ETH",
-                size=2.0,
-                entry_price=3200,
-                current_price=3150,
-                unrealized_pnl=-100,
-                side=OrderSide.BUY
+                coin=p["coin"],
+                size=abs(p["size"]),
+                entry_price=p["entry_price"],
+                current_price=p["current_price"],
+                unrealized_pnl=p["unrealized_pnl"],
+                side=OrderSide.BUY if p["size"] > 0 else OrderSide.SELL
             )
+            for p in demo_positions
         ]
         
+        total_pnl = sum(p["unrealized_pnl"] for p in demo_positions)
+        account_value = DEMO_CASH + total_pnl
+        # Demo positions run at 5x leverage
+        margin_used = sum(abs(p["size"]) * p["current_price"] for p in demo_positions) / 5
+        
         return Portfolio(
-            account_value=50000,
-            available_balance=25000,
-            margin_used=20000,
-            total_pnl=1250,
-            daily_pnl=350,
+            account_value=account_value,
+            available_balance=account_value - margin_used,
+            margin_used=margin_used,
+            total_pnl=total_pnl,
+            daily_pnl=total_pnl,
             positions=positions
         )
     
     def _generate_mock_account(self) -> Account:
         """Generate mock account data"""
+        portfolio = self._generate_mock_portfolio()
         return Account(
             address="0x1234567890abcdef1234567890abcdef12345678",
-            account_value=50000,
+            account_value=portfolio.account_value,
             margin_summary={
-                "accountValue": 50000,
-                "totalMarginUsed": 20000,
-                "totalPnl": 1250
+                "accountValue": portfolio.account_value,
+                "totalMarginUsed": portfolio.margin_used,
+                "totalPnl": portfolio.total_pnl
             },
-            withdrawable=25000
+            withdrawable=portfolio.available_balance
         )
     
     def _generate_mock_market_data(self, coin: str) -> MarketData:
         """Generate mock market data"""
-        base_prices = {"BTC": 45000, "ETH": 3200, "SOL": 100, "AVAX": 35}
-        base_price = base_prices.get(coin, 100)
-        
-        current_price = base_price * random.uniform(0.95, 1.05)
+        simulator = get_simulator()
+        if not simulator.has_coin(coin):
+            raise Exception(f"Could not fetch simulated market data for {coin}")
         
+        bids, asks = simulator.order_book(coin, depth=1)
+        stats = simulator.stats_24h(coin)
         return MarketData(
             coin=coin,
-            price=current_price,
-            bid=current_price * 0.999,
-            ask=current_price * 1.001,
-            volume_24h=random.uniform(100000, 1000000),
-            change_24h=random.uniform(-5, 5)
+            price=simulator.price(coin),
+            bid=float(bids[0, 0]),
+            ask=float(asks[0, 0]),
+            volume_24h=stats["volume_24h"],
+            change_24h=stats["change_24h"]
         )
     
-    def _generate_mock_candlestick_data(self, coin: str, limit: int) -> List[CandlestickData]:
+    def _generate_mock_candlestick_data(self, coin: str, limit: int, interval: str = "1h",
+                                        end_time: Optional[int] = None) -> List[CandlestickData]:
         """Generate mock candlestick data"""
-        base_prices = {"BTC": 45000, "ETH": 3200, "SOL": 100, "AVAX": 35}
-        base_price = base_prices.get(coin, 100)
-        
-        candles = []
-        current_time = datetime.utcnow() - timedelta(hours=limit)
-        current_price = base_price
-        
-        for i in range(limit):
-            open_price = current_price
-            close_price = open_price * random.uniform(0.98, 1.02)
-            high_price = max(open_price, close_price) * random.uniform(1.0, 1.01)
-            low_price = min(open_price, close_price) * random.uniform(0.99, 1.0)
-            
-            candles.append(CandlestickData(
-                coin=coin,
-                timestamp=current_time + timedelta(hours=i),
-                open=open_price,
-                high=high_price,
-                low=low_price,
-                close=close_price,
-                volume=random.uniform(1000, 10000)
-            ))
-            
-            current_price = close_price
+        simulator = get_simulator()
+        if not simulator.has_coin(coin):
+            return []
         
-        return candles
+        interval_seconds = INTERVAL_SECONDS.get(interval, 3600)
+        # Candles after end_time are generated and dropped so the history lines up
+        skip = 0
+        if end_time is not None:
+            periods_back = int(time.time() // interval_seconds) - int(end_time // 1000 // interval_seconds)
+            skip = min(MAX_SIMULATED_CANDLE_OFFSET, max(0, periods_back))
+        candles = simulator.candles(coin, interval_seconds, limit + skip)
+        if skip:
+            candles = {key: values[:-skip] for key, values in candles.items()}
+        return [
+            CandlestickData(
+                coin=coin,
+                timestamp=datetime.fromtimestamp(t / 1000),
+                open=o,
+                high=h,
+                low=l,
+                close=c,
+                volume=v
+            )
+            for t, o, h, l, c, v in zip(
+                candles["t"].tolist(), candles["o"].tolist(), candles["h"].tolist(),
+                candles["l"].tolist(), candles["c"].tolist(), candles["v"].tolist()
+            )
+        ]
     
     def _generate_mock_order_book(self, coin: str) -> OrderBook:
         """Generate mock order book"""
-        base_prices = {"BTC": 45000, "ETH": 3200, "SOL": 100, "AVAX": 35}
-        base_price = base_prices.get(coin, 100)
-        
-        bids = []
-        asks = []
-        
-        # Generate bids (descending price)
-        for i in range(10):
-            price = base_price * (1 - (i + 1) * 0.001)
-            size = random.uniform(0.1, 5.0)
-            bids.append(OrderBookLevel(price=price, size=size))
+        simulator = get_simulator()
+        if not simulator.has_coin(coin):
+            raise Exception(f"Could not fetch simulated order book for {coin}")
         
-        # Generate asks (ascending price)
-        for i in range(10):
-            price = base_price * (1 + (i + 1) * 0.001)
-            size = random.uniform(0.1, 5.0)
-            asks.append(OrderBookLevel(price=price, size=size))
-        
-        return OrderBook(coin=coin, bids=bids, asks=asks)
+        bids, asks = simulator.order_book(coin, depth=20)
+        return OrderBook(
+            coin=coin,
+            bids=[OrderBookLevel(price=price, size=size) for price, size in bids.tolist()],
+            asks=[OrderBookLevel(price=price, size=size) for price, size in asks.tolist()]
+        )
     
     def _generate_mock_order(self, coin: str, is_buy: bool, size: float, 
                            price: Optional[float], order_type: OrderType) -> Order:
@@ -676,13 +1054,15 @@ class HyperliquidService:
     def _generate_mock_orders(self, count: int) -> List[Order]:
         """Generate mock orders"""
         coins = ["BTC", "ETH", "SOL", "AVAX"]
+        mids = get_simulator().all_mids()
         orders = []
         
         for _ in range(count):
             coin = random.choice(coins)
             is_buy = random.choice([True, False])
             size = random.uniform(0.1, 2.0)
-            price = random.uniform(100, 50000)
+            # Resting limit orders a little away from the simulated price
+            price = mids[coin] * (1 - random.uniform(0.005, 0.05) if is_buy else 1 + random.uniform(0.005, 0.05))
             
             orders.append(self._generate_mock_order(
                 coin, is_buy, size, price, OrderType.LIMIT
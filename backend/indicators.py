@@ -0,0 +1,268 @@
+"""
+Vectorized technical indicators over OHLCV arrays.
+
+Every indicator takes finite NumPy float arrays and returns arrays of the
+same length, NaN where the window is not yet full. There are no per-bar Python
+loops: windows use cumulative sums, strided views or one vector operation per
+window offset, and exponential averages are evaluated in closed form over
+blocks short enough that the decay factors stay in floating-point range.
+
+Conventions (shared with the streaming versions):
+  EMA          alpha = 2 / (n + 1), seeded with the SMA of the first n values
+  RSI and ATR  Wilder smoothing (alpha = 1 / n), seeded with the first n-value mean
+  Bollinger    population standard deviation (ddof=0)
+"""
+
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+Series = np.ndarray
+Result = Union[Series, Dict[str, Series]]
+
+# A standard deviation below this fraction of the mean is rounding noise
+ZERO_STD_RELATIVE = 1e-12
+
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def _first_valid(x: np.ndarray) -> int:
+    valid = np.flatnonzero(~np.isnan(x))
+    return int(valid[0]) if len(valid) else len(x)
+
+
+# Building blocks
+
+def rolling_mean(x, n: int) -> Series:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if n <= 0 or len(x) < n:
+        return out
+    # Sum relative to the first value to limit cancellation on large prices
+    base = x[0]
+    sums = np.cumsum(np.concatenate(([0.0], x - base)))
+    out[n - 1:] = (sums[n:] - sums[:-n]) / n + base
+    return out
+
+
+def rolling_std(x, n: int, ddof: int = 0) -> Series:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if n <= ddof or len(x) < n:
+        return out
+    # Two-pass: squared deviations from each window's mean, summed one window
+    # offset at a time (n vector operations over the series)
+    count = len(x) - n + 1
+    mean = rolling_mean(x, n)[n - 1:]
+    squares = np.zeros(count)
+    for offset in range(n):
+        deviation = x[offset:offset + count] - mean
+        squares += deviation * deviation
+    std = np.sqrt(squares / (n - ddof))
+    std[std <= ZERO_STD_RELATIVE * np.abs(mean)] = 0.0
+    out[n - 1:] = std
+    return out
+
+
+def rolling_max(x, n: int) -> Series:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if n > 0 and len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).max(axis=1)
+    return out
+
+
+def rolling_min(x, n: int) -> Series:
+    x = _as_float(x)
+    out = _nan_like(x)
+    if n > 0 and len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).min(axis=1)
+    return out
+
+
+def ewm(x, alpha: float, start: int, seed: float) -> Series:
+    """y[start] = seed, then y[t] = (1 - alpha) * y[t-1] + alpha * x[t].
+
+    Solved in closed form per block: within a block y[t] = d^k * (y0 + sum
+    alpha * x[j] / d^j), with d = 1 - alpha and k the offset into the block.
+    Blocks are sized so d^k never underflows.
+    """
+    x = _as_float(x)
+    out = _nan_like(x)
+    if start >= len(x):
+        return out
+    out[start] = seed
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[start + 1:] = x[start + 1:]
+        return out
+    remaining = len(x) - start - 1
+    block = min(remaining, max(1, int(600.0 / -np.log(decay)))) if decay < 1.0 else remaining
+    # d^k for every offset in a block, shared by all blocks
+    block_powers = np.exp(np.log(decay) * np.arange(1, block + 1))
+
+    level = seed
+    position = start + 1
+    while position < len(x):
+        chunk = x[position:position + block]
+        powers = block_powers[:len(chunk)]
+        out[position:position + len(chunk)] = powers * (level + np.cumsum(alpha * chunk / powers))
+        level = out[position + len(chunk) - 1]
+        position += len(chunk)
+    return out
+
+
+# Indicators
+
+def sma(close, n: int = 20) -> Series:
+    return rolling_mean(close, n)
+
+
+def ema(close, n: int = 20) -> Series:
+    """Exponential moving average, seeded with the SMA of the first n valid values"""
+    close = _as_float(close)
+    first = _first_valid(close)
+    if len(close) - first < n:
+        return _nan_like(close)
+    start = first + n - 1
+    return ewm(close, 2.0 / (n + 1), start, float(close[first:start + 1].mean()))
+
+
+def wilder(x, n: int) -> Series:
+    """Wilder's smoothing (alpha = 1/n), seeded with the mean of the first n valid values"""
+    x = _as_float(x)
+    first = _first_valid(x)
+    if len(x) - first < n:
+        return _nan_like(x)
+    start = first + n - 1
+    return ewm(x, 1.0 / n, start, float(x[first:start + 1].mean()))
+
+
+def rsi(close, n: int = 14) -> Series:
+    close = _as_float(close)
+    change = np.diff(close, prepend=np.nan)
+    gains = np.where(change > 0, change, 0.0)
+    losses = np.where(change < 0, -change, 0.0)
+    gains[:1] = losses[:1] = np.nan
+    avg_gain = wilder(gains, n)
+    avg_loss = wilder(losses, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out = np.where(avg_loss == 0.0, np.where(avg_gain == 0.0, 50.0, 100.0), out)
+    out[np.isnan(avg_gain)] = np.nan
+    return out
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Series]:
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "signal": signal_line, "hist": line - signal_line}
+
+
+def bollinger(close, n: int = 20, k: float = 2.0) -> Dict[str, Series]:
+    mid = rolling_mean(close, n)
+    width = k * rolling_std(close, n)
+    return {"mid": mid, "upper": mid + width, "lower": mid - width}
+
+
+def true_range(high, low, close) -> Series:
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    previous = np.concatenate(([np.nan], close[:-1]))
+    ranges = np.vstack((high - low, np.abs(high - previous), np.abs(low - previous)))
+    return np.nanmax(ranges, axis=0)
+
+
+def atr(high, low, close, n: int = 14) -> Series:
+    return wilder(true_range(high, low, close), n)
+
+
+def vwap(high, low, close, volume, n: int = 0) -> Series:
+    """Volume-weighted typical price: cumulative, or over a rolling window of n bars"""
+    high, low, close, volume = _as_float(high), _as_float(low), _as_float(close), _as_float(volume)
+    typical = (high + low + close) / 3.0
+    if n:
+        weighted = rolling_mean(typical * volume, n)
+        volumes = rolling_mean(volume, n)
+    else:
+        weighted = np.cumsum(typical * volume)
+        volumes = np.cumsum(volume)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(volumes > 0, weighted / volumes, np.nan)
+
+
+def zscore(close, n: int = 20) -> Series:
+    close = _as_float(close)
+    std = rolling_std(close, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (close - rolling_mean(close, n)) / std
+    out[std == 0.0] = 0.0
+    return out
+
+
+# Name -> (function, OHLCV inputs, default parameters)
+INDICATORS: Dict[str, Tuple[Callable[..., Result], Tuple[str, ...], Tuple[float, ...]]] = {
+    "sma": (sma, ("c",), (20,)),
+    "ema": (ema, ("c",), (20,)),
+    "rsi": (rsi, ("c",), (14,)),
+    "macd": (macd, ("c",), (12, 26, 9)),
+    "bbands": (bollinger, ("c",), (20, 2.0)),
+    "atr": (atr, ("h", "l", "c"), (14,)),
+    "vwap": (vwap, ("h", "l", "c", "v"), (0,)),
+    "zscore": (zscore, ("c",), (20,)),
+    "max": (rolling_max, ("c",), (20,)),
+    "min": (rolling_min, ("c",), (20,)),
+    "std": (rolling_std, ("c",), (20,)),
+}
+
+DEFAULT_INDICATORS = ("sma:20", "ema:20", "rsi:14", "macd:12:26:9", "bbands:20:2", "atr:14", "vwap", "zscore:20")
+
+
+def parse_spec(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """'macd:12:26:9' -> ('macd', (12, 26, 9)); missing parameters take their defaults"""
+    name, *raw = spec.strip().lower().split(":")
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name}")
+    defaults = INDICATORS[name][2]
+    if len(raw) > len(defaults):
+        raise ValueError(f"{name} takes at most {len(defaults)} parameters")
+    params = []
+    for value, default in zip(raw + [None] * (len(defaults) - len(raw)), defaults):
+        if value is None or value == "":
+            params.append(default)
+        else:
+            try:
+                params.append(int(value) if isinstance(default, int) else float(value))
+            except ValueError:
+                raise ValueError(f"Invalid parameter for {name}: {value}")
+    for param, default in zip(params, defaults):
+        # Periods count bars (vwap's 0 means cumulative); float parameters scale a deviation
+        if isinstance(default, int):
+            if param < (0 if name == "vwap" else 1):
+                raise ValueError(f"Invalid period for {name}: {param}")
+        elif not param > 0:
+            raise ValueError(f"Invalid parameter for {name}: {param}")
+    return name, tuple(params)
+
+
+def compute(spec: str, ohlcv: Dict[str, np.ndarray]) -> Result:
+    name, params = parse_spec(spec)
+    function, inputs, _ = INDICATORS[name]
+    return function(*(ohlcv[column] for column in inputs), *params)
+
+
+def compute_many(specs: Sequence[str], ohlcv: Dict[str, np.ndarray]) -> Dict[str, Result]:
+    return {spec: compute(spec, ohlcv) for spec in specs}
+
+
+def to_json_series(values: Result) -> Union[List, Dict[str, List]]:
+    """Arrays to lists with NaN (warm-up bars) as None"""
+    if isinstance(values, dict):
+        return {key: to_json_series(series) for key, series in values.items()}
+    return np.where(np.isnan(values), None, values).tolist()
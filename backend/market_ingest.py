@@ -0,0 +1,181 @@
+"""
+Dedicated market-data ingest process.
+
+Owns every upstream market subscription (all mids, top of book and trades)
+and writes the ticks into the shared-memory tick ring, so API workers and
+strategy processes never spend request-serving time decoding market data.
+
+Run alongside the API:
+    python market_ingest.py
+
+Set MARKET_INGEST_SOURCE=simulator to fill the ring from the market simulator
+instead (demos and load tests without upstream access); INGEST_SIM_RATE sets
+the number of ticks written per second.
+"""
+
+import os
+import json
+import time
+import signal
+import asyncio
+import websockets
+from typing import List
+
+from tick_ring import TickRingWriter, DEFAULT_RING_NAME
+
+WS_URL = os.getenv("HYPERLIQUID_WS_MAINNET", "wss://api.hyperliquid.xyz/ws")
+DEFAULT_COINS = "BTC,ETH,SOL,AVAX,LINK,UNI,AAVE,ATOM"
+RECONNECT_DELAY = 2.0
+SIM_BATCH_INTERVAL = 0.1
+
+
+def get_ingest_coins() -> List[str]:
+    """Coins whose order book and trades are ingested (all mids are always ingested)"""
+    coins = os.getenv("INGEST_COINS", DEFAULT_COINS)
+    return [coin.strip().upper() for coin in coins.split(",") if coin.strip()]
+
+
+class MarketIngest:
+    """Streams Hyperliquid market data into the tick ring"""
+
+    def __init__(self, writer: TickRingWriter, coins: List[str], ws_url: str = WS_URL):
+        self.writer = writer
+        self.coins = coins
+        self.ws_url = ws_url
+        self.running = True
+        self.messages = 0
+
+    def subscriptions(self) -> List[dict]:
+        subscriptions = [{"type": "allMids"}]
+        for coin in self.coins:
+            subscriptions.append({"type": "l2Book", "coin": coin})
+            subscriptions.append({"type": "trades", "coin": coin})
+        return subscriptions
+
+    def handle_message(self, message: dict):
+        channel = message.get("channel")
+        data = message.get("data")
+
+        if channel == "allMids":
+            mids = data.get("mids", {})
+            ts_ms = int(time.time() * 1000)
+            for coin, mid in mids.items():
+                # Skip spot pairs such as "@107", the ring only serves perp coins
+                if not coin.startswith("@"):
+                    self.writer.write_mid(coin, float(mid), ts_ms)
+
+        elif channel == "l2Book":
+            levels = data.get("levels", [])
+            if len(levels) >= 2 and levels[0] and levels[1]:
+                best_bid, best_ask = levels[0][0], levels[1][0]
+                self.writer.write_bbo(
+                    data["coin"],
+                    float(best_bid["px"]), float(best_bid["sz"]),
+                    float(best_ask["px"]), float(best_ask["sz"]),
+                    int(data.get("time", 0)) or None
+                )
+
+        elif channel == "trades":
+            for trade in data:
+                self.writer.write_trade(
+                    trade["coin"],
+                    float(trade["px"]),
+                    float(trade["sz"]),
+                    trade.get("side") == "B",
+                    int(trade.get("time", 0)) or None
+                )
+
+        else:
+            return
+
+        self.messages += 1
+
+    async def run(self):
+        while self.running:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None) as websocket:
+                    for subscription in self.subscriptions():
+                        await websocket.send(json.dumps({"method": "subscribe", "subscription": subscription}))
+                    print(f"Market ingest connected: {len(self.coins)} coins, ring '{self.writer.name}'")
+
+                    async for raw in websocket:
+                        if not self.running:
+                            break
+                        try:
+                            self.handle_message(json.loads(raw))
+                        except Exception as e:
+                            print(f"Market ingest failed to handle message: {e}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Market ingest connection error: {e}")
+
+            if self.running:
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    def stop(self):
+        self.running = False
+
+
+class SimulatedIngest:
+    """Writes simulated ticks into the tick ring at a fixed rate"""
+
+    def __init__(self, writer: TickRingWriter, simulator, ticks_per_second: int):
+        self.writer = writer
+        self.simulator = simulator
+        self.ticks_per_second = ticks_per_second
+        self.running = True
+        self.messages = 0
+
+    async def run(self):
+        coins = self.simulator.coins
+        batch = max(len(coins), int(self.ticks_per_second * SIM_BATCH_INTERVAL))
+        dt = SIM_BATCH_INTERVAL * len(coins) / batch
+        print(f"Simulated ingest: {self.ticks_per_second} ticks/s over {len(coins)} coins, ring '{self.writer.name}'")
+
+        while self.running:
+            started = time.monotonic()
+            ticks = self.simulator.tick_stream(batch, dt)
+            # Stamp the batch with wall-clock time so readers treat it as fresh
+            ts_ms = int(time.time() * 1000)
+            for coin_id, mid, bid, ask in zip(ticks["coin_id"].tolist(), ticks["mid"].tolist(),
+                                              ticks["bid"].tolist(), ticks["ask"].tolist()):
+                coin = coins[coin_id]
+                size = 50000.0 / mid
+                self.writer.write_mid(coin, mid, ts_ms)
+                self.writer.write_bbo(coin, bid, size, ask, size, ts_ms)
+            self.messages += 1
+            await asyncio.sleep(max(0.0, SIM_BATCH_INTERVAL - (time.monotonic() - started)))
+
+    def stop(self):
+        self.running = False
+
+
+def create_ingest(writer: TickRingWriter):
+    if os.getenv("MARKET_INGEST_SOURCE", "hyperliquid").strip().lower() == "simulator":
+        from market_simulator import get_market_simulator
+        return SimulatedIngest(writer, get_market_simulator(), int(os.getenv("INGEST_SIM_RATE", "1000")))
+    return MarketIngest(writer, get_ingest_coins())
+
+
+async def main():
+    writer = TickRingWriter(os.getenv("TICK_RING_NAME", DEFAULT_RING_NAME))
+    ingest = create_ingest(writer)
+    task = asyncio.create_task(ingest.run())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: (ingest.stop(), task.cancel()))
+
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        writer.close()
+        print("Market ingest stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
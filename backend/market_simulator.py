@@ -0,0 +1,280 @@
+"""
+Vectorized synthetic market simulator.
+
+Generates correlated multi-asset price paths (geometric Brownian motion, or
+Merton jump-diffusion) with NumPy and derives order books, trades and candles
+from them, so every view of a simulated coin is consistent with its current
+price. All randomness comes from seeded generators: the same seed and the
+same sequence of calls reproduce the same tick streams, and the shape of a
+candle history is drawn from a generator keyed on (seed, coin, interval,
+period), then anchored to the live price.
+
+Used in place of the old hand-built mock data, as a full market data source
+(MARKET_DATA_SOURCE=simulator) and as a tick source for the ingest process
+(MARKET_INGEST_SOURCE=simulator) in demos and load tests.
+"""
+
+import os
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+SECONDS_PER_YEAR = 365.0 * 24 * 3600
+
+# coin: (initial price, annualized volatility)
+DEFAULT_ASSETS: Dict[str, Tuple[float, float]] = {
+    "BTC": (45000.0, 0.60),
+    "ETH": (3200.0, 0.75),
+    "SOL": (100.0, 1.00),
+    "AVAX": (35.0, 1.00),
+    "LINK": (15.0, 0.90),
+    "UNI": (7.0, 0.95),
+    "AAVE": (90.0, 0.90),
+    "ATOM": (10.0, 0.85),
+}
+DEFAULT_CORRELATION = 0.6
+
+# Demo holdings used for simulated portfolios: coin -> signed size
+DEMO_HOLDINGS = {"BTC": 0.5, "ETH": 2.0}
+DEMO_CASH = 50000.0
+
+
+class MarketSimulator:
+    """Seeded correlated price simulator with consistent books, trades and candles"""
+
+    def __init__(self, assets: Optional[Dict[str, Tuple[float, float]]] = None,
+                 correlation: Union[float, Sequence[Sequence[float]]] = DEFAULT_CORRELATION,
+                 model: str = "gbm", drift: float = 0.0,
+                 jump_intensity: float = 25.0, jump_mean: float = -0.01, jump_std: float = 0.03,
+                 spread_bps: float = 2.0, seed: Optional[int] = None):
+        assets = assets or DEFAULT_ASSETS
+        if model not in ("gbm", "jump"):
+            raise ValueError(f"Unknown simulation model: {model}")
+
+        self.coins: List[str] = list(assets)
+        self._index = {coin: i for i, coin in enumerate(self.coins)}
+        self.initial_prices = np.array([assets[c][0] for c in self.coins], dtype=np.float64)
+        self.vols = np.array([assets[c][1] for c in self.coins], dtype=np.float64)
+        self.model = model
+        self.drift = drift
+        # Jump intensity is per year; jump sizes are normal in log space
+        self.jump_intensity = jump_intensity if model == "jump" else 0.0
+        self.jump_mean = jump_mean
+        self.jump_std = jump_std
+        self.spread_bps = spread_bps
+
+        n = len(self.coins)
+        if np.isscalar(correlation):
+            matrix = np.full((n, n), float(correlation))
+            np.fill_diagonal(matrix, 1.0)
+        else:
+            matrix = np.asarray(correlation, dtype=np.float64)
+            if matrix.shape != (n, n):
+                raise ValueError(f"Correlation matrix must be {n}x{n}")
+        self.correlation = matrix
+        self._chol = np.linalg.cholesky(matrix)
+
+        # Record the entropy so an unseeded run can still be reproduced
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % (2 ** 63))
+        self.rng = np.random.default_rng(self.seed)
+
+        self.prices = self.initial_prices.copy()
+        self.clock = time.time()
+
+    # Path generation
+
+    def log_returns(self, n_steps: int, dt_seconds: float,
+                    rng: Optional[np.random.Generator] = None,
+                    coins: Optional[np.ndarray] = None) -> np.ndarray:
+        """Log returns of shape (coins, n_steps) for steps of dt_seconds.
+
+        coins selects a subset by index; a subset is simulated from its
+        marginal distributions (no cross-correlation needed).
+        """
+        rng = rng or self.rng
+        dt = dt_seconds / SECONDS_PER_YEAR
+        if coins is None:
+            vols = self.vols
+            shocks = self._chol @ rng.standard_normal((len(self.coins), n_steps))
+        else:
+            vols = self.vols[coins]
+            shocks = rng.standard_normal((len(coins), n_steps))
+
+        sigma = vols[:, None]
+        returns = (self.drift - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+
+        if self.jump_intensity > 0:
+            counts = rng.poisson(self.jump_intensity * dt, size=returns.shape)
+            jumps = counts * self.jump_mean + np.sqrt(counts) * self.jump_std * rng.standard_normal(returns.shape)
+            # Compensate the drift so jumps do not change the expected price
+            compensator = self.jump_intensity * (np.exp(self.jump_mean + 0.5 * self.jump_std ** 2) - 1) * dt
+            returns += jumps - compensator
+        return returns
+
+    def paths(self, n_steps: int, dt_seconds: float, start: Optional[np.ndarray] = None,
+              rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Price paths of shape (coins, n_steps + 1) starting at start (default: current prices)"""
+        start = self.prices if start is None else np.asarray(start, dtype=np.float64)
+        returns = self.log_returns(n_steps, dt_seconds, rng)
+        log_path = np.empty((len(self.coins), n_steps + 1))
+        log_path[:, 0] = 0.0
+        np.cumsum(returns, axis=1, out=log_path[:, 1:])
+        return start[:, None] * np.exp(log_path)
+
+    # Live state
+
+    def advance(self, now: Optional[float] = None) -> np.ndarray:
+        """Move the live prices forward to wall-clock time now"""
+        now = time.time() if now is None else now
+        elapsed = now - self.clock
+        if elapsed > 0:
+            self.prices = self.prices * np.exp(self.log_returns(1, elapsed)[:, 0])
+            self.clock = now
+        return self.prices
+
+    def has_coin(self, coin: str) -> bool:
+        return coin in self._index
+
+    def price(self, coin: str) -> float:
+        self.advance()
+        return float(self.prices[self._index[coin]])
+
+    def all_mids(self) -> Dict[str, float]:
+        prices = self.advance()
+        return {coin: float(prices[i]) for i, coin in enumerate(self.coins)}
+
+    def universe(self) -> Dict[str, list]:
+        """Universe metadata in the shape of the Hyperliquid meta response"""
+        return {"universe": [
+            {"name": coin, "szDecimals": min(5, max(0, int(np.log10(price))) + 1)}
+            for coin, price in zip(self.coins, self.initial_prices)
+        ]}
+
+    def tick_stream(self, n_ticks: int, dt_seconds: float = 0.1) -> Dict[str, np.ndarray]:
+        """Generate n_ticks mid ticks (one per coin per step) and move the live prices to the end.
+
+        Ticks are stamped dt_seconds apart from the simulator clock, which
+        moves to the last step with the prices. Returns parallel arrays:
+        ts_ms, coin_id, mid, bid, ask.
+        """
+        n = len(self.coins)
+        steps = -(-n_ticks // n)
+        path = self.paths(steps, dt_seconds)[:, 1:]
+        self.prices = path[:, -1].copy()
+
+        mids = path.T.reshape(-1)[:n_ticks]
+        half_spread = mids * (self.spread_bps / 2e4)
+        step_ms = np.arange(1, steps + 1, dtype=np.int64) * int(dt_seconds * 1000)
+        ts_ms = np.repeat(int(self.clock * 1000) + step_ms, n)[:n_ticks]
+        self.clock += steps * dt_seconds
+        return {
+            "ts_ms": ts_ms,
+            "coin_id": np.tile(np.arange(n, dtype=np.int32), steps)[:n_ticks],
+            "mid": mids,
+            "bid": mids - half_spread,
+            "ask": mids + half_spread,
+        }
+
+    # Derived views
+
+    def _rng_for(self, *key) -> np.random.Generator:
+        """Generator that is a pure function of the seed and key"""
+        parts = [zlib.crc32(str(k).encode()) if not isinstance(k, (int, np.integer)) else int(k) for k in key]
+        return np.random.default_rng([self.seed % (2 ** 32), *parts])
+
+    def candles(self, coin: str, interval_seconds: int, limit: int,
+                steps_per_candle: int = 60) -> Dict[str, np.ndarray]:
+        """OHLCV history ending in the current interval at the live price.
+
+        Returns parallel arrays: t (epoch ms of the candle open), o, h, l, c, v.
+        """
+        i = self._index[coin]
+        now = time.time()
+        period = int(now // interval_seconds)
+        current = self.price(coin)
+
+        k = steps_per_candle
+        rng = self._rng_for("candles", coin, interval_seconds, period)
+        returns = self.log_returns(limit * k, interval_seconds / k, rng, coins=np.array([i]))[0]
+
+        # Anchor the path so it ends at the live price
+        log_path = np.concatenate(([0.0], np.cumsum(returns)))
+        path = current * np.exp(log_path - log_path[-1])
+
+        windows = path[:-1].reshape(limit, k)
+        opens = windows[:, 0]
+        closes = path[k::k]
+        highs = np.maximum(windows.max(axis=1), closes)
+        lows = np.minimum(windows.min(axis=1), closes)
+
+        # Volume rises with the size of the move
+        base_volume = 2e6 / self.initial_prices[i] * (interval_seconds / 3600)
+        moves = np.abs(np.log(closes / opens)) / (self.vols[i] * np.sqrt(interval_seconds / SECONDS_PER_YEAR))
+        volumes = base_volume * rng.gamma(2.0, 0.5, size=limit) * (0.5 + moves)
+
+        starts = (period - limit + 1 + np.arange(limit, dtype=np.int64)) * interval_seconds * 1000
+        return {"t": starts, "o": opens, "h": highs, "l": lows, "c": closes, "v": volumes}
+
+    def stats_24h(self, coin: str) -> Dict[str, float]:
+        """24h change (percent) and volume from the simulated hourly history"""
+        history = self.candles(coin, 3600, 24)
+        opening = float(history["o"][0])
+        return {
+            "change_24h": (float(history["c"][-1]) - opening) / opening * 100,
+            "volume_24h": float(np.sum(history["v"] * history["c"]))
+        }
+
+    def order_book(self, coin: str, depth: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Bid and ask levels around the live price, arrays of shape (depth, 2) as [price, size]"""
+        mid = self.price(coin)
+        rng = self._rng_for("book", coin, int(self.clock))
+        offsets_bps = self.spread_bps / 2 + np.arange(depth) * max(self.spread_bps, 1.0)
+        base_size = 50000.0 / mid
+        sizes = rng.exponential(base_size * (1 + 0.15 * np.arange(depth)), size=(2, depth))
+        bids = np.column_stack((mid * (1 - offsets_bps / 1e4), sizes[0]))
+        asks = np.column_stack((mid * (1 + offsets_bps / 1e4), sizes[1]))
+        return bids, asks
+
+    def trades(self, coin: str, count: int) -> Dict[str, np.ndarray]:
+        """Recent trades at the touch: parallel arrays px, sz, is_buy"""
+        mid = self.price(coin)
+        rng = self.rng
+        is_buy = rng.random(count) < 0.5
+        half_spread = mid * self.spread_bps / 2e4
+        px = np.where(is_buy, mid + half_spread, mid - half_spread)
+        sz = rng.lognormal(np.log(5000.0 / mid), 1.0, size=count)
+        return {"px": px, "sz": sz, "is_buy": is_buy}
+
+    def demo_positions(self) -> List[Dict[str, float]]:
+        """Demo holdings marked to the live price, entered at the price 24h ago"""
+        positions = []
+        for coin, size in DEMO_HOLDINGS.items():
+            if coin not in self._index:
+                continue
+            entry = float(self.candles(coin, 3600, 24)["o"][0])
+            current = self.price(coin)
+            positions.append({
+                "coin": coin,
+                "size": size,
+                "entry_price": entry,
+                "current_price": current,
+                "unrealized_pnl": (current - entry) * size
+            })
+        return positions
+
+
+_simulator: Optional[MarketSimulator] = None
+
+
+def get_market_simulator() -> MarketSimulator:
+    """Process-wide simulator configured from SIMULATOR_SEED and SIMULATOR_MODEL"""
+    global _simulator
+    if _simulator is None:
+        seed = os.getenv("SIMULATOR_SEED")
+        _simulator = MarketSimulator(
+            model=os.getenv("SIMULATOR_MODEL", "gbm"),
+            seed=int(seed) if seed else None
+        )
+    return _simulator
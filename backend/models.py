@@ -116,6 +116,11 @@ class MarketData(BaseModel):
     ask: float
     volume_24h: float = 0.0
     change_24h: float = 0.0
+    prev_day_price: Optional[float] = None
+    mark_price: Optional[float] = None
+    oracle_price: Optional[float] = None
+    funding: Optional[float] = None  # Current hourly funding rate
+    open_interest: Optional[float] = None  # In coins
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class CandlestickData(BaseModel):
@@ -145,6 +150,42 @@ class Account(BaseModel):
     cross_margin_summary: Dict[str, float] = {}
     withdrawable: float = 0.0
 
+class AccountSnapshot(BaseModel):
+    key: str  # environment:wallet
+    label: Optional[str] = None
+    wallet_address: str
+    environment: str
+    portfolio: Optional[Portfolio] = None
+    account: Optional[Account] = None
+    error: Optional[str] = None
+
+class AccountTotals(BaseModel):
+    environment: str
+    accounts: int = 0
+    failed: int = 0
+    account_value: float = 0.0
+    available_balance: float = 0.0
+    margin_used: float = 0.0
+    total_pnl: float = 0.0
+    withdrawable: float = 0.0
+    net_positions: Dict[str, float] = {}  # Signed size per coin across accounts
+
+# Risk Models
+class RiskLimits(BaseModel):
+    """Limits in USD notional; None disables a check"""
+    max_order_notional: Optional[float] = 100000.0
+    max_position_notional: Optional[float] = 250000.0
+    max_leverage: Optional[float] = 10.0
+    daily_loss_limit: Optional[float] = 1000.0
+
+
+class RiskRejection(BaseModel):
+    code: str  # order_notional, max_position, leverage, daily_loss, no_price, no_equity
+    message: str
+    coin: str
+    limit: Optional[float] = None
+    value: Optional[float] = None
+
 # Settings Models
 class APICredentials(BaseModel):
     wallet_address: Optional[str] = None  # Main wallet address (master account)
@@ -152,10 +193,12 @@ class APICredentials(BaseModel):
     api_secret: Optional[str] = None      # API secret key
     environment: str = "testnet"          # testnet or mainnet
     is_configured: bool = False
+    label: Optional[str] = None           # Display name for additional accounts
 
 class UserSettings(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     api_credentials: APICredentials = APICredentials()
+    accounts: List[APICredentials] = []   # Additional (sub-)accounts, monitored alongside the main one
     trading_preferences: Dict[str, Any] = {}
     ui_preferences: Dict[str, Any] = {}
     created_at: datetime = Field(default_factory=datetime.utcnow)
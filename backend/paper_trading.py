@@ -0,0 +1,386 @@
+"""
+Paper-trading matching engine.
+
+Simulates order execution against external L2 books (live, cached or
+replayed) without sending anything upstream. Marketable orders take
+liquidity level by level from the external book; the remainder of a limit
+order rests in a local book with price-time priority and fills when a later
+book update trades through its price. Fees, slippage, positions, margin and
+PnL are tracked per paper account.
+
+Resting orders live in per-price FIFO queues indexed by a heap of prices, so
+adding an order is O(log levels), cancelling is O(1) (lazy removal) and a
+book update only touches the levels that actually cross.
+
+Accounts are kept in the memory of the API process, so an order, its cancel
+and its fills must reach the same process: the service refuses paper orders
+unless the API runs a single worker (WEB_CONCURRENCY=1).
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque, namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Hyperliquid base tier fees
+TAKER_FEE_BPS = 4.5
+MAKER_FEE_BPS = 1.5
+SLIPPAGE_BPS = 1.0
+DEFAULT_LEVERAGE = 5.0
+STARTING_BALANCE = 50000.0
+MAX_FILL_HISTORY = 10000
+
+# Order states (mirroring models.OrderStatus values)
+PENDING = "pending"
+PARTIALLY_FILLED = "partially_filled"
+FILLED = "filled"
+CANCELLED = "cancelled"
+REJECTED = "rejected"
+
+Fill = namedtuple("Fill", ["oid", "coin", "is_buy", "px", "sz", "fee", "liquidity", "closed_pnl", "ts_ms"])
+
+Level = Tuple[float, float]  # (price, size)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class PaperOrder:
+    __slots__ = ("oid", "coin", "is_buy", "price", "size", "filled", "notional", "is_market",
+                 "reduce_only", "seq", "status", "reject_reason", "created_ms", "updated_ms")
+
+    def __init__(self, oid: int, coin: str, is_buy: bool, size: float, price: Optional[float],
+                 is_market: bool, reduce_only: bool, seq: int):
+        self.oid = oid
+        self.coin = coin
+        self.is_buy = is_buy
+        self.price = price
+        self.size = size
+        self.filled = 0.0
+        self.notional = 0.0
+        self.is_market = is_market
+        self.reduce_only = reduce_only
+        self.seq = seq
+        self.status = PENDING
+        self.reject_reason = None
+        self.created_ms = self.updated_ms = _now_ms()
+
+    @property
+    def remaining(self) -> float:
+        return self.size - self.filled
+
+    @property
+    def average_price(self) -> float:
+        return self.notional / self.filled if self.filled else 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in (PENDING, PARTIALLY_FILLED)
+
+
+class RestingBook:
+    """Resting paper orders for one coin, price-time priority per side"""
+
+    def __init__(self):
+        self.levels = ({}, {})  # (bids, asks): price -> deque of orders
+        self._heaps = ([], [])  # bids keyed by -price, asks by price
+        self.count = 0
+
+    def add(self, order: PaperOrder):
+        side = 0 if order.is_buy else 1
+        queue = self.levels[side].get(order.price)
+        if queue is None:
+            queue = self.levels[side][order.price] = deque()
+            heapq.heappush(self._heaps[side], -order.price if order.is_buy else order.price)
+        queue.append(order)
+        self.count += 1
+
+    def removed(self):
+        """Account for an order that left the book (filled or cancelled), cleaned up lazily"""
+        self.count -= 1
+
+    def best(self, side: int) -> Optional[float]:
+        """Best price with at least one open order, dropping empty levels"""
+        heap, levels = self._heaps[side], self.levels[side]
+        while heap:
+            price = -heap[0] if side == 0 else heap[0]
+            queue = levels.get(price)
+            while queue and not queue[0].is_open:
+                queue.popleft()
+            if queue:
+                return price
+            heapq.heappop(heap)
+            levels.pop(price, None)
+        return None
+
+    def queue(self, side: int, price: float) -> deque:
+        return self.levels[side][price]
+
+
+class PaperPosition:
+    __slots__ = ("size", "entry_price", "realized_pnl")
+
+    def __init__(self):
+        self.size = 0.0  # Signed, positive is long
+        self.entry_price = 0.0
+        self.realized_pnl = 0.0
+
+    def apply(self, is_buy: bool, size: float, price: float) -> float:
+        """Apply a fill, returning the PnL it realized"""
+        signed = size if is_buy else -size
+        realized = 0.0
+        if self.size == 0 or (self.size > 0) == is_buy:
+            total = abs(self.size) + size
+            self.entry_price = (self.entry_price * abs(self.size) + price * size) / total
+            self.size += signed
+        else:
+            closing = min(size, abs(self.size))
+            direction = 1 if self.size > 0 else -1
+            realized = (price - self.entry_price) * closing * direction
+            self.size += signed
+            if abs(self.size) < 1e-12:
+                self.size = 0.0
+                self.entry_price = 0.0
+            elif (self.size > 0) != (direction > 0):
+                # Flipped: the rest opened a new position at this price
+                self.entry_price = price
+        self.realized_pnl += realized
+        return realized
+
+
+class PaperExchange:
+    """Paper account: matching, fees, positions, margin and PnL"""
+
+    def __init__(self, starting_balance: float = STARTING_BALANCE, taker_fee_bps: float = TAKER_FEE_BPS,
+                 maker_fee_bps: float = MAKER_FEE_BPS, slippage_bps: float = SLIPPAGE_BPS,
+                 leverage: float = DEFAULT_LEVERAGE):
+        self.starting_balance = starting_balance
+        self.taker_fee = taker_fee_bps / 1e4
+        self.maker_fee = maker_fee_bps / 1e4
+        self.slippage = slippage_bps / 1e4
+        self.leverage = leverage
+
+        self.cash = starting_balance  # Starting balance + realized PnL - fees
+        self.fees_paid = 0.0
+        # Open orders only; finished orders are reported through fills
+        self.orders: Dict[int, PaperOrder] = {}
+        # Notional of resting orders that would add exposure, maintained incrementally
+        self._reserved_notional = 0.0
+        self.books: Dict[str, RestingBook] = {}
+        self.positions: Dict[str, PaperPosition] = {}
+        self.marks: Dict[str, float] = {}
+        self.fills = deque(maxlen=MAX_FILL_HISTORY)
+        self._oids = itertools.count(1)
+        self._seq = itertools.count(1)
+
+    # Account state
+
+    def position(self, coin: str) -> PaperPosition:
+        position = self.positions.get(coin)
+        if position is None:
+            position = self.positions[coin] = PaperPosition()
+        return position
+
+    def unrealized_pnl(self) -> float:
+        return sum(
+            (self.marks.get(coin, p.entry_price) - p.entry_price) * p.size
+            for coin, p in self.positions.items() if p.size
+        )
+
+    def margin_used(self) -> float:
+        return sum(
+            abs(p.size) * self.marks.get(coin, p.entry_price)
+            for coin, p in self.positions.items() if p.size
+        ) / self.leverage
+
+    def order_margin(self) -> float:
+        """Margin reserved by resting orders that would add exposure"""
+        return max(self._reserved_notional, 0.0) / self.leverage
+
+    def equity(self) -> float:
+        return self.cash + self.unrealized_pnl()
+
+    def available_balance(self) -> float:
+        return self.equity() - self.margin_used() - self.order_margin()
+
+    def summary(self) -> Dict[str, float]:
+        realized = sum(p.realized_pnl for p in self.positions.values())
+        unrealized = self.unrealized_pnl()
+        return {
+            "account_value": self.equity(),
+            "available_balance": self.available_balance(),
+            "margin_used": self.margin_used(),
+            "realized_pnl": realized,
+            "unrealized_pnl": unrealized,
+            "total_pnl": realized + unrealized - self.fees_paid,
+            "fees_paid": self.fees_paid
+        }
+
+    def update_marks(self, prices: Dict[str, float]):
+        """Mark open positions to the given prices"""
+        for coin, position in self.positions.items():
+            if position.size and prices.get(coin):
+                self.marks[coin] = float(prices[coin])
+
+    def open_orders(self, coin: Optional[str] = None) -> List[PaperOrder]:
+        return [o for o in self.orders.values() if coin is None or o.coin == coin]
+
+    def coins_with_resting_orders(self) -> List[str]:
+        return [coin for coin, book in self.books.items() if book.count > 0]
+
+    # Orders
+
+    def _reject(self, order: PaperOrder, reason: str) -> PaperOrder:
+        order.status = REJECTED
+        order.reject_reason = reason
+        return order
+
+    def _reserve(self, order: PaperOrder, size: float):
+        if not order.reduce_only:
+            self._reserved_notional += size * order.price
+
+    def place_order(self, coin: str, is_buy: bool, size: float, price: Optional[float], is_market: bool,
+                    bids: Sequence[Level], asks: Sequence[Level], reduce_only: bool = False) -> PaperOrder:
+        """Match an order against the external book; a limit remainder rests locally.
+
+        bids/asks are the external levels best first. Market orders fill what
+        the book offers (plus slippage) and cancel the rest.
+        """
+        order = PaperOrder(next(self._oids), coin, is_buy, size, None if is_market else price,
+                           is_market, reduce_only, next(self._seq))
+        self._mark_from_book(coin, bids, asks)
+
+        if size <= 0:
+            return self._reject(order, "Order size must be positive")
+        if not is_market and (price is None or price <= 0):
+            return self._reject(order, "Limit orders need a positive price")
+
+        position = self.position(coin)
+        if reduce_only:
+            reducible = -position.size if is_buy else position.size
+            if reducible <= 0:
+                return self._reject(order, "Reduce-only order would increase the position")
+            order.size = min(size, reducible)
+        else:
+            reference = price if price else (asks[0][0] if is_buy and asks else bids[0][0] if bids else 0.0)
+            if reference and size * reference / self.leverage > self.available_balance():
+                return self._reject(order, "Insufficient margin")
+
+        levels = asks if is_buy else bids
+        for level_price, level_size in levels:
+            if order.remaining <= 0:
+                break
+            if not is_market and (level_price > price if is_buy else level_price < price):
+                break
+            fill_price = level_price
+            if is_market:
+                fill_price *= (1 + self.slippage) if is_buy else (1 - self.slippage)
+            self._fill(order, min(order.remaining, level_size), fill_price, "taker")
+
+        if order.remaining > 1e-12:
+            if is_market:
+                # Whatever the book could not absorb is cancelled (IOC)
+                order.status = CANCELLED
+                order.reject_reason = "Not enough liquidity"
+            else:
+                self._book(coin).add(order)
+                self.orders[order.oid] = order
+                self._reserve(order, order.remaining)
+        return order
+
+    def cancel_order(self, coin: str, oid: int) -> bool:
+        order = self.orders.get(oid)
+        if order is None or order.coin != coin:
+            return False
+        order.status = CANCELLED
+        order.updated_ms = _now_ms()
+        self._reserve(order, -order.remaining)
+        del self.orders[oid]
+        self._book(coin).removed()
+        return True
+
+    def on_book(self, coin: str, bids: Sequence[Level], asks: Sequence[Level]) -> List[Fill]:
+        """Fill resting orders the new book trades through, in price-time priority"""
+        self._mark_from_book(coin, bids, asks)
+        book = self.books.get(coin)
+        if book is None or book.count == 0:
+            return []
+
+        fills_before = len(self.fills)
+        # Resting bids against external asks, then resting asks against external bids
+        for side, external in ((0, asks), (1, bids)):
+            for level_price, level_size in external:
+                best = book.best(side)
+                if best is None:
+                    break
+                crosses = best >= level_price if side == 0 else best <= level_price
+                if not crosses:
+                    break
+                available = level_size
+                while available > 1e-12:
+                    best = book.best(side)
+                    if best is None or not (best >= level_price if side == 0 else best <= level_price):
+                        break
+                    queue = book.queue(side, best)
+                    order = queue[0]
+                    size = min(order.remaining, available)
+                    # Resting orders are makers and fill at their own limit price
+                    self._fill(order, size, order.price, "maker")
+                    self._reserve(order, -size)
+                    available -= size
+                    if not order.is_open:
+                        queue.popleft()
+                        book.removed()
+                        del self.orders[order.oid]
+
+        return list(itertools.islice(self.fills, fills_before, None))
+
+    # Internals
+
+    def _book(self, coin: str) -> RestingBook:
+        book = self.books.get(coin)
+        if book is None:
+            book = self.books[coin] = RestingBook()
+        return book
+
+    def _mark_from_book(self, coin: str, bids: Sequence[Level], asks: Sequence[Level]):
+        if bids and asks:
+            self.marks[coin] = (bids[0][0] + asks[0][0]) / 2
+        elif bids or asks:
+            self.marks[coin] = (bids or asks)[0][0]
+
+    def _fill(self, order: PaperOrder, size: float, price: float, liquidity: str):
+        fee = size * price * (self.taker_fee if liquidity == "taker" else self.maker_fee)
+        realized = self.position(order.coin).apply(order.is_buy, size, price)
+        self.cash += realized - fee
+        self.fees_paid += fee
+
+        order.filled += size
+        order.notional += size * price
+        order.status = FILLED if order.remaining <= 1e-12 else PARTIALLY_FILLED
+        order.updated_ms = _now_ms()
+        self.fills.append(Fill(order.oid, order.coin, order.is_buy, price, size, fee,
+                               liquidity, realized, order.updated_ms))
+
+
+def levels_from_l2(l2_book: dict) -> Tuple[List[Level], List[Level]]:
+    """Convert a Hyperliquid l2Book snapshot into (bids, asks) float levels, best first"""
+    levels = l2_book.get("levels", []) if l2_book else []
+    if len(levels) < 2:
+        return [], []
+    bids = sorted(((float(l["px"]), float(l["sz"])) for l in levels[0]), reverse=True)
+    asks = sorted((float(l["px"]), float(l["sz"])) for l in levels[1])
+    return bids, asks
+
+
+_paper_exchange: Optional[PaperExchange] = None
+
+
+def get_paper_exchange() -> PaperExchange:
+    """Process-wide paper account used while no trading credentials are configured"""
+    global _paper_exchange
+    if _paper_exchange is None:
+        _paper_exchange = PaperExchange()
+    return _paper_exchange
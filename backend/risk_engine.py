@@ -0,0 +1,260 @@
+"""
+Pre-trade risk engine.
+
+Keeps an exposure index per account and coin (signed position, resting buy
+and sell size, mark price) together with running per-account totals (gross
+position notional, resting order notional, equity and the equity at the start
+of the UTC day). Positions, orders and marks update the totals by the
+difference they make, so checking an order never scans positions or orders:
+every check is a handful of dictionary lookups and arithmetic.
+
+A rejected order comes back as a RiskRejection naming the limit it broke,
+the limit value and the value the order would have reached. An order that
+passes is reserved as resting until the exchange answers, so concurrent
+orders on the account are checked against its exposure too.
+"""
+
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+from models import RiskLimits, RiskRejection
+
+# Account snapshots older than this are refreshed before checking an order
+SNAPSHOT_MAX_AGE = 5.0
+
+
+class CoinExposure:
+    __slots__ = ("position", "open_buy", "open_sell", "position_notional")
+
+    def __init__(self):
+        self.position = 0.0  # Signed size
+        self.open_buy = 0.0
+        self.open_sell = 0.0
+        self.position_notional = 0.0  # |position| * mark, as counted in the account total
+
+
+class AccountExposure:
+    def __init__(self):
+        self.coins: Dict[str, CoinExposure] = {}
+        self.orders: Dict[Any, tuple] = {}  # oid -> (coin, is_buy, size, price)
+        self.reserved: Set[Any] = set()  # Keys of orders still on their way to the exchange
+        self.gross_notional = 0.0
+        self.order_notional = 0.0
+        self.equity: Optional[float] = None
+        self.day_start_equity: Optional[float] = None
+        self.day = None
+        self.synced_at = 0.0
+
+    def coin(self, coin: str) -> CoinExposure:
+        exposure = self.coins.get(coin)
+        if exposure is None:
+            exposure = self.coins[coin] = CoinExposure()
+        return exposure
+
+    @property
+    def daily_loss(self) -> float:
+        if self.equity is None or self.day_start_equity is None:
+            return 0.0
+        return max(0.0, self.day_start_equity - self.equity)
+
+
+def _utc_day():
+    return datetime.now(timezone.utc).date()
+
+
+class RiskEngine:
+    """Incrementally maintained exposure index and constant-time pre-trade checks"""
+
+    def __init__(self, limits: Optional[RiskLimits] = None):
+        self.limits = limits or RiskLimits()
+        self.accounts: Dict[str, AccountExposure] = {}
+        self.marks: Dict[str, float] = {}
+        # Accounts holding a position per coin, so a mark change only touches them
+        self._holders: Dict[str, Set[str]] = {}
+        self._reservations = itertools.count(1)
+
+    def account(self, account: str) -> AccountExposure:
+        exposure = self.accounts.get(account)
+        if exposure is None:
+            exposure = self.accounts[account] = AccountExposure()
+        return exposure
+
+    def is_stale(self, account: str, max_age: float = SNAPSHOT_MAX_AGE) -> bool:
+        exposure = self.accounts.get(account)
+        return exposure is None or time.monotonic() - exposure.synced_at > max_age
+
+    # Index maintenance
+
+    def update_mark(self, coin: str, price: float):
+        if not price or price <= 0:
+            return
+        self.marks[coin] = price
+        for account in self._holders.get(coin, ()):
+            self._reprice(self.accounts[account], coin)
+
+    def update_marks(self, prices: Dict[str, Any]):
+        for coin, price in prices.items():
+            self.update_mark(coin, float(price))
+
+    def _reprice(self, exposure: AccountExposure, coin: str):
+        coin_exposure = exposure.coins[coin]
+        notional = abs(coin_exposure.position) * self.marks.get(coin, 0.0)
+        exposure.gross_notional += notional - coin_exposure.position_notional
+        coin_exposure.position_notional = notional
+
+    def set_position(self, account: str, coin: str, size: float, mark: Optional[float] = None):
+        exposure = self.account(account)
+        exposure.coin(coin).position = size
+        if mark and coin not in self.marks:
+            self.marks[coin] = mark
+        holders = self._holders.setdefault(coin, set())
+        if size:
+            holders.add(account)
+        else:
+            holders.discard(account)
+        self._reprice(exposure, coin)
+
+    def apply_fill(self, account: str, coin: str, is_buy: bool, size: float):
+        position = self.account(account).coin(coin).position
+        self.set_position(account, coin, position + (size if is_buy else -size))
+
+    def set_equity(self, account: str, equity: float):
+        exposure = self.account(account)
+        today = _utc_day()
+        if exposure.day != today or exposure.day_start_equity is None:
+            exposure.day = today
+            exposure.day_start_equity = equity
+        exposure.equity = equity
+
+    def order_added(self, account: str, oid: Any, coin: str, is_buy: bool, size: float, price: float):
+        exposure = self.account(account)
+        if oid in exposure.orders:
+            self.order_removed(account, oid)
+        exposure.orders[oid] = (coin, is_buy, size, price)
+        coin_exposure = exposure.coin(coin)
+        if is_buy:
+            coin_exposure.open_buy += size
+        else:
+            coin_exposure.open_sell += size
+        exposure.order_notional += size * price
+
+    def reserve(self, account: str, coin: str, is_buy: bool, size: float, price: Optional[float] = None) -> Any:
+        """Count an order that passed its check as resting until the exchange answers;
+        returns the key to release it with order_removed"""
+        key = ("reserved", next(self._reservations))
+        self.order_added(account, key, coin, is_buy, size, price or self.marks.get(coin, 0.0))
+        self.accounts[account].reserved.add(key)
+        return key
+
+    def order_removed(self, account: str, oid: Any):
+        exposure = self.accounts.get(account)
+        entry = exposure.orders.pop(oid, None) if exposure else None
+        if entry is None:
+            return
+        exposure.reserved.discard(oid)
+        coin, is_buy, size, price = entry
+        coin_exposure = exposure.coins[coin]
+        if is_buy:
+            coin_exposure.open_buy = max(0.0, coin_exposure.open_buy - size)
+        else:
+            coin_exposure.open_sell = max(0.0, coin_exposure.open_sell - size)
+        exposure.order_notional = max(0.0, exposure.order_notional - size * price)
+
+    def sync(self, account: str, portfolio, open_orders: Iterable):
+        """Rebuild an account from a portfolio snapshot and its open orders"""
+        exposure = self.account(account)
+        held = {p.coin: (p.size if p.side == "buy" else -p.size, p.current_price) for p in portfolio.positions}
+        for coin in list(exposure.coins):
+            if coin not in held:
+                self.set_position(account, coin, 0.0)
+        for coin, (size, mark) in held.items():
+            self.set_position(account, coin, size, mark)
+
+        # Reservations are not on the exchange yet, so the snapshot cannot account for them
+        for oid in list(exposure.orders):
+            if oid not in exposure.reserved:
+                self.order_removed(account, oid)
+        for order in open_orders:
+            size = order.remaining_size or order.size
+            if size and order.price:
+                self.order_added(account, order.oid, order.coin, order.side == "buy", size, order.price)
+
+        self.set_equity(account, portfolio.account_value)
+        exposure.synced_at = time.monotonic()
+
+    # Checks
+
+    def check(self, account: str, coin: str, is_buy: bool, size: float,
+              price: Optional[float] = None, reduce_only: bool = False) -> Optional[RiskRejection]:
+        """Return the first limit the order would break, or None if it may be sent"""
+        limits = self.limits
+        price = price or self.marks.get(coin)
+        if not price:
+            return RiskRejection(code="no_price", coin=coin,
+                                 message=f"No price available to value the {coin} order")
+
+        exposure = self.account(account)
+        coin_exposure = exposure.coins.get(coin) or CoinExposure()
+        position = coin_exposure.position
+        new_position = position + (size if is_buy else -size)
+        # Orders that only shrink the position are always allowed through
+        if reduce_only or abs(new_position) <= abs(position):
+            return None
+
+        notional = size * price
+        if limits.max_order_notional is not None and notional > limits.max_order_notional:
+            return RiskRejection(code="order_notional", coin=coin, limit=limits.max_order_notional, value=notional,
+                                 message=f"Order notional ${notional:,.2f} exceeds the ${limits.max_order_notional:,.2f} limit")
+
+        if limits.daily_loss_limit is not None and exposure.daily_loss >= limits.daily_loss_limit:
+            return RiskRejection(code="daily_loss", coin=coin, limit=limits.daily_loss_limit, value=exposure.daily_loss,
+                                 message=f"Daily loss ${exposure.daily_loss:,.2f} reached the ${limits.daily_loss_limit:,.2f} limit")
+
+        if limits.max_position_notional is not None:
+            # Worst case: every resting order on the same side fills too
+            pending = coin_exposure.open_buy if is_buy else -coin_exposure.open_sell
+            worst = abs(new_position + pending) * price
+            if worst > limits.max_position_notional:
+                return RiskRejection(code="max_position", coin=coin, limit=limits.max_position_notional, value=worst,
+                                     message=f"{coin} position would reach ${worst:,.2f}, above the ${limits.max_position_notional:,.2f} limit")
+
+        if limits.max_leverage is not None:
+            if not exposure.equity or exposure.equity <= 0:
+                return RiskRejection(code="no_equity", coin=coin, limit=limits.max_leverage,
+                                     message="Account has no equity to support new exposure")
+            leverage = (exposure.gross_notional + exposure.order_notional + notional) / exposure.equity
+            if leverage > limits.max_leverage:
+                return RiskRejection(code="leverage", coin=coin, limit=limits.max_leverage, value=leverage,
+                                     message=f"Account leverage would reach {leverage:.2f}x, above the {limits.max_leverage:.2f}x limit")
+
+        return None
+
+    def snapshot(self, account: str) -> Dict[str, Any]:
+        exposure = self.account(account)
+        return {
+            "limits": self.limits.dict(),
+            "equity": exposure.equity,
+            "day_start_equity": exposure.day_start_equity,
+            "daily_loss": exposure.daily_loss,
+            "gross_notional": exposure.gross_notional,
+            "order_notional": exposure.order_notional,
+            "leverage": (exposure.gross_notional + exposure.order_notional) / exposure.equity
+            if exposure.equity else None,
+            "coins": {
+                coin: {
+                    "position": e.position,
+                    "open_buy": e.open_buy,
+                    "open_sell": e.open_sell,
+                    "mark": self.marks.get(coin),
+                    "position_notional": e.position_notional
+                }
+                for coin, e in exposure.coins.items()
+                if e.position or e.open_buy or e.open_sell
+            }
+        }
+
+
+# Global risk engine instance
+risk_engine = RiskEngine()
@@ -0,0 +1,127 @@
+"""
+Compact encodings for candle and fill series.
+
+The default JSON response is an array of objects that repeats every key and
+carries ISO datetime strings. Two opt-in formats send the same rows as
+parallel arrays instead:
+
+columnar  JSON object of arrays: epoch-ms integer timestamps and floats;
+          fill coins are dictionary-encoded and sides are booleans.
+binary    Little-endian typed arrays a client can view without parsing:
+
+            magic      4 bytes   b"HTS1"
+            length     uint32    size of the header in bytes
+            header     JSON      {"rows": n, "columns": [{"name", "dtype", "offset"}], ...}
+            columns    each at its offset, aligned to 8 bytes
+
+          dtype is one of f64, u32, u8 (Float64Array, Uint32Array, Uint8Array).
+          Timestamps are f64 epoch milliseconds, which is exact.
+"""
+
+import json
+import struct
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from models import CandlestickData, Order
+
+SERIES_FORMATS = ("json", "columnar", "binary")
+SERIES_FORMAT_PATTERN = "^(" + "|".join(SERIES_FORMATS) + ")$"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BINARY_MAGIC = b"HTS1"
+
+_DTYPES = {"f64": "<f8", "u32": "<u4", "u8": "u1"}
+
+
+def epoch_ms(value: datetime) -> int:
+    # Naive datetimes come from datetime.fromtimestamp, so they are local time
+    return int(round(value.timestamp() * 1000))
+
+
+def candle_columns(candles: Sequence[CandlestickData]) -> Dict[str, np.ndarray]:
+    """Candles as parallel arrays: t (epoch ms), o, h, l, c, v"""
+    return {
+        "t": np.array([epoch_ms(c.timestamp) for c in candles], dtype=np.int64),
+        "o": np.array([c.open for c in candles], dtype=np.float64),
+        "h": np.array([c.high for c in candles], dtype=np.float64),
+        "l": np.array([c.low for c in candles], dtype=np.float64),
+        "c": np.array([c.close for c in candles], dtype=np.float64),
+        "v": np.array([c.volume for c in candles], dtype=np.float64),
+    }
+
+
+def fill_columns(fills: Sequence[Order]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Fills as parallel arrays: t, oid, coin (index into the returned coin list), is_buy, px, sz"""
+    coins: List[str] = []
+    coin_ids: Dict[str, int] = {}
+    for fill in fills:
+        if fill.coin not in coin_ids:
+            coin_ids[fill.coin] = len(coins)
+            coins.append(fill.coin)
+
+    columns = {
+        "t": np.array([epoch_ms(f.updated_at) for f in fills], dtype=np.int64),
+        "oid": np.array([f.oid or 0 for f in fills], dtype=np.int64),
+        "coin": np.array([coin_ids[f.coin] for f in fills], dtype=np.uint32),
+        "is_buy": np.array([f.side == "buy" for f in fills], dtype=np.uint8),
+        "px": np.array([f.average_fill_price or f.price or 0.0 for f in fills], dtype=np.float64),
+        "sz": np.array([f.filled_size or f.size for f in fills], dtype=np.float64),
+    }
+    return columns, coins
+
+
+def to_columnar(columns: Dict[str, np.ndarray], **extra) -> Dict[str, object]:
+    """JSON-ready columnar payload"""
+    payload = dict(extra)
+    for name, values in columns.items():
+        payload[name] = values.tolist() if values.dtype != np.uint8 else values.astype(bool).tolist()
+    return payload
+
+
+def _binary_dtype(values: np.ndarray) -> str:
+    if values.dtype == np.uint8:
+        return "u8"
+    if values.dtype == np.uint32:
+        return "u32"
+    # Timestamps and ids are sent as doubles so they map to Float64Array
+    return "f64"
+
+
+def to_binary(columns: Dict[str, np.ndarray], **extra) -> bytes:
+    """Encode columns as little-endian typed arrays behind a JSON header"""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    layout = [(name, _binary_dtype(values)) for name, values in columns.items()]
+
+    def header_bytes(offsets):
+        header = {"rows": rows, **extra, "columns": [
+            {"name": name, "dtype": dtype, "offset": offset}
+            for (name, dtype), offset in zip(layout, offsets)
+        ]}
+        return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    # Offsets depend on the header size, which depends on the offsets' digits;
+    # lay out with a provisional header, then pad the real one to the same size
+    provisional = header_bytes([0] * len(layout))
+    header_size = len(provisional) + 16 * len(layout)
+
+    offsets = []
+    position = _align(len(BINARY_MAGIC) + 4 + header_size)
+    for name, dtype in layout:
+        offsets.append(position)
+        position = _align(position + rows * np.dtype(_DTYPES[dtype]).itemsize)
+
+    header = header_bytes(offsets).ljust(header_size)
+    buffer = bytearray(position)
+    buffer[:4] = BINARY_MAGIC
+    buffer[4:8] = struct.pack("<I", len(header))
+    buffer[8:8 + len(header)] = header
+    for (name, dtype), offset in zip(layout, offsets):
+        data = columns[name].astype(_DTYPES[dtype]).tobytes()
+        buffer[offset:offset + len(data)] = data
+    return bytes(buffer)
+
+
+def _align(position: int, alignment: int = 8) -> int:
+    return -(-position // alignment) * alignment
@@ -1,14 +1,13 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import motor.motor_asyncio
+from fastapi.responses import JSONResponse, StreamingResponse
 import os
+import time
 from dotenv import load_dotenv
 import json
 import asyncio
-import websockets
 from typing import List, Dict, Optional, Any
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Load environment variables
 load_dotenv()
@@ -21,9 +20,19 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from models import (
     Portfolio, Position, Order, Trade, MarketData, CandlestickData, 
     OrderBook, Account, Strategy, UserSettings, APICredentials,
-    OrderRequest, APIResponse, OrderType, OrderSide, OrderStatus
+    OrderRequest, APIResponse, OrderType, OrderSide, OrderStatus,
+    AccountSnapshot, AccountTotals, RiskLimits, RiskRejection
 )
-from hyperliquid_service import hyperliquid_service
+from hyperliquid_service import hyperliquid_service, is_simulated, is_closed_candle_range, INTERVAL_SECONDS
+from http_caching import CompressionMiddleware, cacheable_response, IMMUTABLE, REVALIDATE
+import indicators
+from series_format import (
+    SERIES_FORMAT_PATTERN, BINARY_MEDIA_TYPE, candle_columns, fill_columns, to_columnar, to_binary
+)
+from service_pool import ServiceSlot, ServicePool, account_key
+from risk_engine import risk_engine
+from shared_state import shared_store, SERVICE_CONFIG_CHANNEL, WORKER_ID
+from ws_sessions import SessionManager
 
 app = FastAPI(title="Hypertrader 1.5 API", version="1.5.0")
 
@@ -36,35 +45,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (candles, history, the coin list)
+app.add_middleware(CompressionMiddleware)
+
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL")
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
-db = client.hypertrader
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.market_data_tasks: Dict[str, asyncio.Task] = {}
+class LazyDatabase:
+    """Defers importing motor and creating the client until the database is first used"""
+    
+    def __init__(self, url: str, name: str):
+        self._url = url
+        self._name = name
+        self._database = None
+    
+    def __getattr__(self, collection: str):
+        if self._database is None:
+            import motor.motor_asyncio
+            client = motor.motor_asyncio.AsyncIOMotorClient(self._url)
+            self._database = client[self._name]
+        return getattr(self._database, collection)
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+db = LazyDatabase(MONGO_URL, "hypertrader")
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# WebSocket session manager
+manager = SessionManager()
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_text(json.dumps(message))
+# Active Hyperliquid service; requests lease it so credential changes can swap it safely
+services = ServiceSlot(hyperliquid_service)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                pass
-
-manager = ConnectionManager()
+# One service per configured account (main and additional), for the aggregate endpoints
+account_pool = ServicePool(lambda credentials, donor: build_hyperliquid_service(credentials, donor or services.current))
 
 # Helper functions
 async def get_user_settings() -> UserSettings:
@@ -79,30 +90,123 @@ async def get_user_settings() -> UserSettings:
         await db.user_settings.insert_one(default_settings.dict())
         return default_settings
 
+def build_hyperliquid_service(credentials: APICredentials, previous=None):
+    """Create a Hyperliquid service for the given credentials (blocking, run off-loop).
+    
+    The previous service's public Info client is reused when the environment matches.
+    """
+    from hyperliquid_service import HyperliquidService
+    return HyperliquidService(
+        wallet_address=credentials.wallet_address,
+        api_key=credentials.api_key,
+        api_secret=credentials.api_secret,
+        environment=credentials.environment,
+        info=getattr(previous, "info", None)
+    )
+
+async def swap_hyperliquid_service(credentials: APICredentials):
+    """Build a service for new credentials and swap it in; in-flight calls finish on the old one"""
+    service = await services.swap(lambda previous: build_hyperliquid_service(credentials, previous))
+    print(f"Hyperliquid service swapped in (generation {services.generation}). Configured: {service.is_configured}")
+    return service
+
+def configured_accounts(settings: UserSettings) -> List[APICredentials]:
+    """Main and additional accounts that have a wallet address"""
+    accounts = [settings.api_credentials] + list(settings.accounts)
+    return [account for account in accounts if account.wallet_address]
+
+def apply_risk_limits(settings: UserSettings):
+    """Load the pre-trade risk limits stored in the trading preferences"""
+    try:
+        risk_engine.limits = RiskLimits(**settings.trading_preferences.get("risk_limits", {}))
+    except Exception as e:
+        print(f"Invalid risk limits in settings, keeping the current ones: {e}")
+
 async def initialize_hyperliquid_service():
     """Initialize Hyperliquid service with credentials from database"""
     try:
         settings = await get_user_settings()
+        apply_risk_limits(settings)
         if settings.api_credentials.wallet_address and settings.api_credentials.api_key and settings.api_credentials.api_secret:
             print("Initializing Hyperliquid service with saved credentials...")
-            global hyperliquid_service
-            from hyperliquid_service import HyperliquidService
-            hyperliquid_service = HyperliquidService(
-                wallet_address=settings.api_credentials.wallet_address,
-                api_key=settings.api_credentials.api_key,
-                api_secret=settings.api_credentials.api_secret,
-                environment=settings.api_credentials.environment
-            )
-            print(f"Hyperliquid service initialized. Configured: {hyperliquid_service.is_configured}")
+            await swap_hyperliquid_service(settings.api_credentials)
         else:
             print("No saved credentials found. Using unconfigured service.")
+        await account_pool.sync(configured_accounts(settings))
     except Exception as e:
         print(f"Failed to initialize Hyperliquid service with saved credentials: {e}")
 
-# Initialize service with saved credentials on startup
+async def publish_service_config_change():
+    """Tell the other workers that the service credentials changed"""
+    try:
+        version = await shared_store.incr("service:config_version")
+        await shared_store.publish(SERVICE_CONFIG_CHANNEL, {"origin": WORKER_ID, "version": version})
+    except Exception as e:
+        print(f"Failed to publish service configuration change: {e}")
+
+async def on_service_config_changed(message: dict):
+    """Reload the service when another worker saved new credentials"""
+    if message.get("origin") == WORKER_ID:
+        return
+    print(f"Service configuration changed by worker {message.get('origin')}, reloading...")
+    await initialize_hyperliquid_service()
+
+# Startup warm-up state reported by /api/ready
+WARMUP_COINS = ["BTC", "ETH", "SOL", "AVAX"]
+WARMUP_CANDLES = ("1h", 50)  # MarketChart's default request
+
+warmup_state = {
+    "started_at": time.time(),
+    "service_ready": False,
+    "caches_ready": False,
+    "ready_at": None,
+    "errors": []
+}
+
+async def warm_caches():
+    """Load the universe, mids, asset contexts and default chart candles into the shared cache"""
+    interval, limit = WARMUP_CANDLES
+    async with services.lease() as service:
+        results = await asyncio.gather(
+            service.get_universe(),
+            service.get_all_mids(),
+            *([] if is_simulated() else [service.get_asset_contexts()]),
+            *[service.get_candlestick_data(coin, interval, limit) for coin in WARMUP_COINS],
+            return_exceptions=True
+        )
+    for result in results:
+        if isinstance(result, Exception):
+            warmup_state["errors"].append(str(result))
+
+async def warm_up():
+    """Build the service and fill the caches without holding up startup"""
+    try:
+        await initialize_hyperliquid_service()
+    except Exception as e:
+        warmup_state["errors"].append(str(e))
+    warmup_state["service_ready"] = True
+    
+    try:
+        await warm_caches()
+    except Exception as e:
+        warmup_state["errors"].append(str(e))
+    warmup_state["caches_ready"] = True
+    warmup_state["ready_at"] = time.time()
+    print(f"Warm-up finished in {warmup_state['ready_at'] - warmup_state['started_at']:.2f}s")
+
+# Initialize service with saved credentials in the background on startup
 @app.on_event("startup")
 async def startup_event():
-    await initialize_hyperliquid_service()
+    await shared_store.subscribe(SERVICE_CONFIG_CHANNEL, on_service_config_changed)
+    app.state.warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.warmup_task.cancel()
+    await manager.shutdown()
+    await services.close()
+    await account_pool.close()
+    await shared_store.close()
 
 # Root endpoint
 @app.get("/api/")
@@ -113,12 +217,29 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the service is built and the caches are warm"""
+    ready = warmup_state["service_ready"] and warmup_state["caches_ready"]
+    ready_at = warmup_state["ready_at"]
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "service_ready": warmup_state["service_ready"],
+            "caches_ready": warmup_state["caches_ready"],
+            "warmup_seconds": round(ready_at - warmup_state["started_at"], 3) if ready_at else None,
+            "errors": warmup_state["errors"][-10:]
+        }
+    )
+
 # Portfolio endpoints
 @app.get("/api/portfolio", response_model=APIResponse)
 async def get_portfolio():
     """Get user portfolio with positions and account value"""
     try:
-        portfolio = await hyperliquid_service.get_portfolio()
+        async with services.lease() as service:
+            portfolio = await service.get_portfolio()
         return APIResponse(
             success=True,
             message="Portfolio retrieved successfully",
@@ -131,7 +252,8 @@ async def get_portfolio():
 async def get_account_info():
     """Get account information"""
     try:
-        account = await hyperliquid_service.get_account_info()
+        async with services.lease() as service:
+            account = await service.get_account_info()
         return APIResponse(
             success=True,
             message="Account info retrieved successfully",
@@ -140,12 +262,104 @@ async def get_account_info():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Multi-account endpoints
+def summarize_accounts(results: Dict[str, Any], field: str) -> Dict[str, Any]:
+    """Per-account snapshots plus totals per environment (testnet and mainnet are never summed)"""
+    snapshots = []
+    totals: Dict[str, AccountTotals] = {}
+    for key, result in results.items():
+        credentials = account_pool.credentials(key)
+        snapshot = AccountSnapshot(
+            key=key,
+            label=credentials.label,
+            wallet_address=credentials.wallet_address,
+            environment=credentials.environment
+        )
+        total = totals.setdefault(credentials.environment, AccountTotals(environment=credentials.environment))
+        total.accounts += 1
+        
+        if isinstance(result, Exception):
+            # Timeouts carry no message
+            snapshot.error = str(result) or type(result).__name__
+            total.failed += 1
+        elif field == "portfolio":
+            snapshot.portfolio = result
+            total.account_value += result.account_value
+            total.available_balance += result.available_balance
+            total.margin_used += result.margin_used
+            total.total_pnl += result.total_pnl
+            for position in result.positions:
+                signed = position.size if position.side == OrderSide.BUY else -position.size
+                total.net_positions[position.coin] = total.net_positions.get(position.coin, 0.0) + signed
+        else:
+            snapshot.account = result
+            total.account_value += result.account_value
+            total.withdrawable += result.withdrawable
+        snapshots.append(snapshot)
+    
+    return {
+        "accounts": [snapshot.dict() for snapshot in snapshots],
+        "totals": {environment: total.dict() for environment, total in totals.items()}
+    }
+
+@app.get("/api/accounts", response_model=APIResponse)
+async def list_accounts():
+    """Accounts in the service pool (no secrets)"""
+    accounts = []
+    for key in account_pool.keys():
+        credentials = account_pool.credentials(key)
+        accounts.append({
+            "key": key,
+            "label": credentials.label,
+            "wallet_address": credentials.wallet_address,
+            "environment": credentials.environment,
+            "can_trade": account_pool.slot(key).current.is_configured
+        })
+    return APIResponse(
+        success=True,
+        message=f"{len(accounts)} account(s) configured",
+        data=accounts
+    )
+
+@app.get("/api/accounts/portfolio", response_model=APIResponse)
+async def get_accounts_portfolio():
+    """Portfolios of every account, queried concurrently, with per-environment totals"""
+    try:
+        results = await account_pool.gather(lambda service: service.fetch_portfolio())
+        data = summarize_accounts(results, "portfolio")
+        failed = [a for a in data["accounts"] if a["error"]]
+        return APIResponse(
+            success=True,
+            message="Account portfolios retrieved successfully",
+            data=data,
+            error="; ".join(f"{a['key']}: {a['error']}" for a in failed) or None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/accounts/info", response_model=APIResponse)
+async def get_accounts_info():
+    """Account information of every account, queried concurrently, with per-environment totals"""
+    try:
+        results = await account_pool.gather(lambda service: service.fetch_account_info())
+        data = summarize_accounts(results, "account")
+        failed = [a for a in data["accounts"] if a["error"]]
+        return APIResponse(
+            success=True,
+            message="Account info retrieved successfully",
+            data=data,
+            error="; ".join(f"{a['key']}: {a['error']}" for a in failed) or None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Market data endpoints
 @app.get("/api/market/{coin}", response_model=APIResponse)
 async def get_market_data(coin: str):
     """Get current market data for a coin"""
     try:
-        market_data = await hyperliquid_service.get_market_data(coin.upper())
+        async with services.lease() as service:
+            market_data = await service.get_market_data(coin.upper())
         return APIResponse(
             success=True,
             message="Market data retrieved successfully",
@@ -155,16 +369,75 @@ async def get_market_data(coin: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/candlesticks/{coin}", response_model=APIResponse)
-async def get_candlestick_data(coin: str, interval: str = "1h", limit: int = 100):
-    """Get candlestick data for a coin"""
+async def get_candlestick_data(request: Request, coin: str, interval: str = "1h", limit: int = 100,
+                               end_time: Optional[int] = None,
+                               format: str = Query("json", pattern=SERIES_FORMAT_PATTERN)):
+    """Get candlestick data for a coin, optionally ending at end_time (epoch ms).
+
+    format=columnar returns parallel arrays, format=binary little-endian typed arrays.
+    """
     try:
-        candlesticks = await hyperliquid_service.get_candlestick_data(
-            coin.upper(), interval, limit
-        )
+        coin = coin.upper()
+        async with services.lease() as service:
+            candlesticks = await service.get_candlestick_data(
+                coin, interval, limit, end_time
+            )
+        if format == "binary":
+            content = to_binary(candle_columns(candlesticks), coin=coin, interval=interval)
+        else:
+            content = APIResponse(
+                success=True,
+                message="Candlestick data retrieved successfully",
+                data=to_columnar(candle_columns(candlesticks), coin=coin, interval=interval)
+                if format == "columnar" else [c.dict() for c in candlesticks]
+            )
+        media_type = BINARY_MEDIA_TYPE if format == "binary" else "application/json"
+
+        # A range of closed candles never changes; simulated history is re-anchored to the live price
+        if candlesticks and end_time is not None and is_closed_candle_range(interval, end_time) and not is_simulated():
+            interval_ms = INTERVAL_SECONDS.get(interval, 3600) * 1000
+            closed_at = (end_time // interval_ms + 1) * interval_ms
+            return cacheable_response(
+                request, content,
+                last_modified=datetime.fromtimestamp(closed_at / 1000, timezone.utc),
+                cache_control=IMMUTABLE, media_type=media_type
+            )
+        return cacheable_response(request, content, media_type=media_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/indicators/{coin}", response_model=APIResponse)
+async def get_indicators(coin: str, interval: str = "1h", limit: int = 500,
+                         indicators_spec: str = Query(",".join(indicators.DEFAULT_INDICATORS), alias="indicators"),
+                         end_time: Optional[int] = None):
+    """Technical indicators over a coin's candles.
+
+    indicators is a comma-separated list of name[:param...] specs, e.g.
+    sma:50,ema:20,rsi:14,macd:12:26:9,bbands:20:2,atr:14,vwap,zscore:20.
+    Series are aligned with t (epoch ms); warm-up bars are null.
+    """
+    specs = [spec.strip() for spec in indicators_spec.split(",") if spec.strip()]
+    try:
+        for spec in specs:
+            indicators.parse_spec(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        coin = coin.upper()
+        async with services.lease() as service:
+            candlesticks = await service.get_candlestick_data(coin, interval, limit, end_time)
+        ohlcv = candle_columns(candlesticks)
+        values = await asyncio.to_thread(indicators.compute_many, specs, ohlcv)
         return APIResponse(
             success=True,
-            message="Candlestick data retrieved successfully",
-            data=[c.dict() for c in candlesticks]
+            message="Indicators calculated successfully",
+            data={
+                "coin": coin,
+                "interval": interval,
+                "t": ohlcv["t"].tolist(),
+                "indicators": {spec: indicators.to_json_series(series) for spec, series in values.items()}
+            }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -173,7 +446,8 @@ async def get_candlestick_data(coin: str, interval: str = "1h", limit: int = 100
 async def get_order_book(coin: str):
     """Get order book for a coin"""
     try:
-        order_book = await hyperliquid_service.get_order_book(coin.upper())
+        async with services.lease() as service:
+            order_book = await service.get_order_book(coin.upper())
         return APIResponse(
             success=True,
             message="Order book retrieved successfully",
@@ -182,19 +456,89 @@ async def get_order_book(coin: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Pre-trade risk checks
+def risk_account(service) -> str:
+    """Risk engine account of a service (the paper account when it is not configured)"""
+    return account_key(service.environment, service.wallet_address) if service.is_configured else "paper"
+
+async def refresh_risk_state(service, account: str, coin: Optional[str] = None):
+    """Update marks (the order's coin, or every coin the account holds), and resync
+    the account's positions and orders when its snapshot is stale"""
+    mids = await service.get_all_mids()
+    for marked in ([coin] if coin else list(risk_engine.account(account).coins)):
+        if mids.get(marked):
+            risk_engine.update_mark(marked, float(mids[marked]))
+    
+    if risk_engine.is_stale(account):
+        # Mock fallbacks must never feed the risk engine, so configured accounts use the raising fetches
+        if service.is_configured:
+            portfolio, open_orders = await asyncio.gather(service.fetch_portfolio(), service.fetch_open_orders())
+        else:
+            portfolio, open_orders = await asyncio.gather(service.get_portfolio(), service.get_open_orders())
+        risk_engine.sync(account, portfolio, open_orders)
+
+def record_order(account: str, order: Order):
+    """Apply an accepted order to the exposure index"""
+    if order.filled_size:
+        risk_engine.apply_fill(account, order.coin, order.side == OrderSide.BUY, order.filled_size)
+    if order.status in (OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED) and order.oid and order.price:
+        risk_engine.order_added(
+            account, order.oid, order.coin, order.side == OrderSide.BUY,
+            order.remaining_size or order.size, order.price
+        )
+
+def risk_rejection_response(rejection: RiskRejection) -> JSONResponse:
+    return JSONResponse(
+        status_code=422,
+        content=APIResponse(
+            success=False,
+            message=f"Order rejected by risk checks: {rejection.message}",
+            data=rejection.dict(),
+            error=rejection.code
+        ).dict()
+    )
+
 # Trading endpoints
 @app.post("/api/orders", response_model=APIResponse)
 async def place_order(order_request: OrderRequest):
     """Place a trading order"""
     try:
-        order = await hyperliquid_service.place_order(
-            coin=order_request.coin.upper(),
-            is_buy=order_request.is_buy,
-            size=order_request.sz,
-            price=order_request.limit_px,
-            order_type=order_request.order_type,
-            reduce_only=order_request.reduce_only
-        )
+        coin = order_request.coin.upper()
+        async with services.lease() as service:
+            account = risk_account(service)
+            try:
+                await refresh_risk_state(service, account, coin)
+            except Exception as e:
+                # Fail closed: without a current exposure picture nothing is sent
+                return risk_rejection_response(RiskRejection(
+                    code="risk_state_unavailable",
+                    coin=coin,
+                    message=f"Could not load account exposure: {e}"
+                ))
+            
+            rejection = risk_engine.check(
+                account, coin, order_request.is_buy, order_request.sz,
+                order_request.limit_px, order_request.reduce_only
+            )
+            if rejection:
+                return risk_rejection_response(rejection)
+            
+            # Held until the exchange answers, so orders checked meanwhile count this one
+            reservation = risk_engine.reserve(
+                account, coin, order_request.is_buy, order_request.sz, order_request.limit_px
+            )
+            try:
+                order = await service.place_order(
+                    coin=coin,
+                    is_buy=order_request.is_buy,
+                    size=order_request.sz,
+                    price=order_request.limit_px,
+                    order_type=order_request.order_type,
+                    reduce_only=order_request.reduce_only
+                )
+            finally:
+                risk_engine.order_removed(account, reservation)
+            record_order(account, order)
         
         # Store order in database
         await db.orders.insert_one(order.dict())
@@ -211,7 +555,10 @@ async def place_order(order_request: OrderRequest):
 async def cancel_order(coin: str, oid: int):
     """Cancel an order"""
     try:
-        success = await hyperliquid_service.cancel_order(coin.upper(), oid)
+        async with services.lease() as service:
+            success = await service.cancel_order(coin.upper(), oid)
+            if success:
+                risk_engine.order_removed(risk_account(service), oid)
         
         if success:
             # Update order status in database
@@ -231,7 +578,8 @@ async def cancel_order(coin: str, oid: int):
 async def get_open_orders():
     """Get all open orders"""
     try:
-        orders = await hyperliquid_service.get_open_orders()
+        async with services.lease() as service:
+            orders = await service.get_open_orders()
         return APIResponse(
             success=True,
             message="Open orders retrieved successfully",
@@ -241,15 +589,29 @@ async def get_open_orders():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/orders/history", response_model=APIResponse)
-async def get_order_history(limit: int = 50):
-    """Get order history"""
+async def get_order_history(request: Request, limit: int = 50,
+                            format: str = Query("json", pattern=SERIES_FORMAT_PATTERN)):
+    """Get order history (fills); format=columnar or binary returns parallel arrays"""
     try:
-        orders = await hyperliquid_service.get_order_history(limit)
-        return APIResponse(
-            success=True,
-            message="Order history retrieved successfully",
-            data=[order.dict() for order in orders]
-        )
+        async with services.lease() as service:
+            orders = await service.get_order_history(limit)
+        if format == "json":
+            content = APIResponse(
+                success=True,
+                message="Order history retrieved successfully",
+                data=[order.dict() for order in orders]
+            )
+        else:
+            columns, coins = fill_columns(orders)
+            content = to_binary(columns, coins=coins) if format == "binary" else APIResponse(
+                success=True,
+                message="Order history retrieved successfully",
+                data=to_columnar(columns, coins=coins)
+            )
+        last_modified = max((order.updated_at for order in orders), default=None)
+        return cacheable_response(request, content, last_modified=last_modified,
+                                  cache_control=f"private, {REVALIDATE}",
+                                  media_type=BINARY_MEDIA_TYPE if format == "binary" else "application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -355,17 +717,18 @@ async def update_settings(settings: UserSettings):
                 os.environ["HYPERLIQUID_API_SECRET"] = settings.api_credentials.api_secret.strip()
             os.environ["HYPERLIQUID_ENV"] = settings.api_credentials.environment
             
-            # Reinitialize service with new credentials from database
+            # Swap in a service for the new credentials without interrupting running requests
             print("Reinitializing Hyperliquid service with new credentials...")
-            global hyperliquid_service
-            from hyperliquid_service import HyperliquidService
-            hyperliquid_service = HyperliquidService(
-                wallet_address=settings.api_credentials.wallet_address,
-                api_key=settings.api_credentials.api_key,
-                api_secret=settings.api_credentials.api_secret,
-                environment=settings.api_credentials.environment
-            )
-            print(f"Service reinitialized. Configured: {hyperliquid_service.is_configured}")
+            await swap_hyperliquid_service(settings.api_credentials)
+        
+        # Unchanged accounts keep their services, only new or edited ones are rebuilt
+        await account_pool.sync(configured_accounts(settings))
+        apply_risk_limits(settings)
+        
+        if settings.api_credentials.wallet_address or settings.api_credentials.api_key or \
+                settings.api_credentials.api_secret or settings.accounts:
+            # Other workers reload the saved credentials from the database
+            await publish_service_config_change()
         
         return APIResponse(
             success=True,
@@ -375,6 +738,41 @@ async def update_settings(settings: UserSettings):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/risk", response_model=APIResponse)
+async def get_risk_state():
+    """Risk limits and the current account's exposure index"""
+    try:
+        async with services.lease() as service:
+            account = risk_account(service)
+            await refresh_risk_state(service, account)
+        return APIResponse(
+            success=True,
+            message="Risk state retrieved successfully",
+            data={"account": account, **risk_engine.snapshot(account)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/risk/limits", response_model=APIResponse)
+async def update_risk_limits(limits: RiskLimits):
+    """Save new pre-trade risk limits"""
+    try:
+        await db.user_settings.update_one(
+            {},
+            {"$set": {"trading_preferences.risk_limits": limits.dict(), "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        risk_engine.limits = limits
+        # Other workers reload their limits from the database
+        await publish_service_config_change()
+        return APIResponse(
+            success=True,
+            message="Risk limits updated successfully",
+            data=limits.dict()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/settings/api-status", response_model=APIResponse)
 async def get_api_status():
     """Check if Hyperliquid API is configured and working"""
@@ -447,51 +845,123 @@ async def get_api_status():
         )
 
 # WebSocket endpoint for real-time data
+def market_topic_producer(coin: str):
+    async def produce():
+        async with services.lease() as service:
+            market_data = await service.get_market_data(coin)
+        return {
+            "type": "market_update",
+            "coin": coin,
+            "data": market_data.dict()
+        }
+    return produce
+
+def portfolio_topic_producer(_: str):
+    async def produce():
+        async with services.lease() as service:
+            portfolio = await service.get_portfolio()
+        return {
+            "type": "portfolio_update",
+            "data": portfolio.dict()
+        }
+    return produce
+
+def orders_topic_producer(_: str):
+    async def produce():
+        async with services.lease() as service:
+            orders = await service.get_open_orders()
+        return {
+            "type": "orders_update",
+            "data": [order.dict() for order in orders]
+        }
+    return produce
+
+manager.register_topic("market", market_topic_producer, interval=5)  # Update every 5 seconds
+manager.register_topic("portfolio", portfolio_topic_producer, interval=10)  # Update every 10 seconds
+manager.register_topic("orders", orders_topic_producer, interval=5)
+
 @app.websocket("/api/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    session = await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = json.loads(data)
+            except ValueError:
+                session.send({"type": "error", "message": "Invalid JSON"})
+                continue
+            
+            message_type = message.get("type")
+            if "encoding" in message or "compression" in message:
+                session.configure(message.get("encoding"), message.get("compression"))
             
-            if message.get("type") == "subscribe_market":
-                coin = message.get("coin", "BTC")
-                # Start sending market data updates
-                asyncio.create_task(send_market_updates(websocket, coin))
-            elif message.get("type") == "subscribe_portfolio":
-                # Start sending portfolio updates
-                asyncio.create_task(send_portfolio_updates(websocket))
+            if message_type == "subscribe_market":
+                coin = message.get("coin", "BTC").upper()
+                manager.subscribe(session, f"market:{coin}")
+            elif message_type == "unsubscribe_market":
+                coin = message.get("coin", "BTC").upper()
+                manager.unsubscribe(session, f"market:{coin}")
+            elif message_type == "subscribe_portfolio":
+                manager.subscribe(session, "portfolio")
+            elif message_type == "unsubscribe_portfolio":
+                manager.unsubscribe(session, "portfolio")
+            elif message_type == "subscribe_orders":
+                manager.subscribe(session, "orders")
+            elif message_type == "unsubscribe_orders":
+                manager.unsubscribe(session, "orders")
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    except RuntimeError:
+        # Socket was closed by the server, e.g. after evicting a slow client
+        pass
+    finally:
+        await manager.disconnect(session)
 
-async def send_market_updates(websocket: WebSocket, coin: str):
-    """Send periodic market data updates"""
-    while True:
+# Server-Sent Events endpoints (same topics as the WebSocket)
+def stream_topic(request: Request, topic_name: str) -> StreamingResponse:
+    """Stream one topic as text/event-stream, resuming from Last-Event-ID"""
+    subscriber = manager.open_stream()
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    manager.subscribe(subscriber, topic_name, last_event_id)
+    
+    async def event_stream():
         try:
-            market_data = await hyperliquid_service.get_market_data(coin)
-            await manager.send_personal_message({
-                "type": "market_update",
-                "coin": coin,
-                "data": market_data.dict()
-            }, websocket)
-            await asyncio.sleep(5)  # Update every 5 seconds
-        except:
-            break
-
-async def send_portfolio_updates(websocket: WebSocket):
-    """Send periodic portfolio updates"""
-    while True:
-        try:
-            portfolio = await hyperliquid_service.get_portfolio()
-            await manager.send_personal_message({
-                "type": "portfolio_update",
-                "data": portfolio.dict()
-            }, websocket)
-            await asyncio.sleep(10)  # Update every 10 seconds
-        except:
-            break
+            async for frame in subscriber.frames():
+                yield frame
+        finally:
+            await manager.disconnect(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/stream/market/{coin}")
+async def stream_market(coin: str, request: Request):
+    """Push market data updates for a coin"""
+    return stream_topic(request, f"market:{coin.upper()}")
+
+@app.get("/api/stream/portfolio")
+async def stream_portfolio(request: Request):
+    """Push portfolio updates"""
+    return stream_topic(request, "portfolio")
+
+@app.get("/api/stream/orders")
+async def stream_open_orders(request: Request):
+    """Push open order updates"""
+    return stream_topic(request, "orders")
+
+@app.get("/api/ws/stats", response_model=APIResponse)
+async def websocket_stats():
+    """WebSocket session and topic statistics"""
+    return APIResponse(
+        success=True,
+        message="WebSocket stats retrieved successfully",
+        data=manager.stats()
+    )
 
 @app.get("/api/debug/wallet-info", response_model=APIResponse)
 async def debug_wallet_info():
@@ -507,12 +977,13 @@ async def debug_wallet_info():
             "hyperliquid_spot_balance": 0
         }
         
-        if hyperliquid_service.is_configured:
-            debug_info["derived_wallet_from_private_key"] = hyperliquid_service.exchange.wallet.address
+        service = services.current
+        if service.is_configured:
+            debug_info["derived_wallet_from_private_key"] = service.exchange.wallet.address
             
             # Get perp balance
             try:
-                user_state = hyperliquid_service.info.user_state(hyperliquid_service.exchange.wallet.address)
+                user_state = service.info.user_state(service.exchange.wallet.address)
                 debug_info["hyperliquid_perp_balance"] = float(user_state.get("marginSummary", {}).get("accountValue", 0))
             except Exception as e:
                 debug_info["perp_error"] = str(e)
@@ -522,7 +993,7 @@ async def debug_wallet_info():
                 import requests
                 spot_response = requests.post(
                     "https://api.hyperliquid.xyz/info",
-                    json={"type": "spotClearinghouseState", "user": hyperliquid_service.exchange.wallet.address},
+                    json={"type": "spotClearinghouseState", "user": service.exchange.wallet.address},
                     headers={"Content-Type": "application/json"}
                 )
                 if spot_response.status_code == 200:
@@ -545,81 +1016,159 @@ async def debug_wallet_info():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/coins", response_model=APIResponse)
-async def get_available_coins():
-    """Get list of available coins for trading from real Hyperliquid API"""
+# Display names based on common knowledge
+COIN_DISPLAY_NAMES = {
+    "BTC": "Bitcoin",
+    "ETH": "Ethereum", 
+    "SOL": "Solana",
+    "AVAX": "Avalanche",
+    "MATIC": "Polygon",
+    "LINK": "Chainlink",
+    "UNI": "Uniswap",
+    "AAVE": "Aave",
+    "ATOM": "Cosmos",
+    "DOT": "Polkadot",
+    "ADA": "Cardano",
+    "NEAR": "Near Protocol",
+    "FIL": "Filecoin",
+    "DOGE": "Dogecoin",
+    "LTC": "Litecoin"
+}
+
+# Fallback to a basic list of major coins
+FALLBACK_COINS = [
+    {"symbol": "BTC", "name": "Bitcoin", "maxLeverage": 40},
+    {"symbol": "ETH", "name": "Ethereum", "maxLeverage": 25},
+    {"symbol": "SOL", "name": "Solana", "maxLeverage": 20},
+    {"symbol": "AVAX", "name": "Avalanche", "maxLeverage": 10},
+    {"symbol": "LINK", "name": "Chainlink", "maxLeverage": 10},
+    {"symbol": "UNI", "name": "Uniswap", "maxLeverage": 10},
+    {"symbol": "AAVE", "name": "Aave", "maxLeverage": 10},
+    {"symbol": "ATOM", "name": "Cosmos", "maxLeverage": 5},
+]
+
+async def get_coin_list() -> tuple:
+    """Tradable coins from the shared universe cache, and whether the fallback list was used"""
     try:
-        import requests
-        
-        # Get real coin list from Hyperliquid meta endpoint
-        meta_response = requests.post(
-            "https://api.hyperliquid.xyz/info",
-            json={"type": "meta"},
-            headers={"Content-Type": "application/json"}
-        )
+        async with services.lease() as service:
+            meta_data = await service.get_universe()
         
-        if meta_response.status_code == 200:
-            meta_data = meta_response.json()
-            
+        if meta_data:
             coins = []
             for universe_item in meta_data.get("universe", []):
                 coin_name = universe_item.get("name", "")
                 if coin_name and not universe_item.get("isDelisted", False):
-                    # Add display name based on common knowledge
-                    display_names = {
-                        "BTC": "Bitcoin",
-                        "ETH": "Ethereum", 
-                        "SOL": "Solana",
-                        "AVAX": "Avalanche",
-                        "MATIC": "Polygon",
-                        "LINK": "Chainlink",
-                        "UNI": "Uniswap",
-                        "AAVE": "Aave",
-                        "ATOM": "Cosmos",
-                        "DOT": "Polkadot",
-                        "ADA": "Cardano",
-                        "NEAR": "Near Protocol",
-                        "FIL": "Filecoin",
-                        "DOGE": "Dogecoin",
-                        "LTC": "Litecoin"
-                    }
-                    
                     coins.append({
                         "symbol": coin_name,
-                        "name": display_names.get(coin_name, coin_name),
+                        "name": COIN_DISPLAY_NAMES.get(coin_name, coin_name),
                         "maxLeverage": universe_item.get("maxLeverage", 1)
                     })
             
             # Sort by symbol for better UX
             coins.sort(key=lambda x: x["symbol"])
-            
-            return APIResponse(
-                success=True,
-                message="Available coins retrieved successfully",
-                data=coins
-            )
+            return coins, False
         
         raise Exception("Could not fetch real coin list")
         
     except Exception as e:
         print(f"Error fetching real coin list: {e}")
-        # Fallback to a basic list of major coins
-        fallback_coins = [
-            {"symbol": "BTC", "name": "Bitcoin", "maxLeverage": 40},
-            {"symbol": "ETH", "name": "Ethereum", "maxLeverage": 25},
-            {"symbol": "SOL", "name": "Solana", "maxLeverage": 20},
-            {"symbol": "AVAX", "name": "Avalanche", "maxLeverage": 10},
-            {"symbol": "LINK", "name": "Chainlink", "maxLeverage": 10},
-            {"symbol": "UNI", "name": "Uniswap", "maxLeverage": 10},
-            {"symbol": "AAVE", "name": "Aave", "maxLeverage": 10},
-            {"symbol": "ATOM", "name": "Cosmos", "maxLeverage": 5},
-        ]
+        return FALLBACK_COINS, True
+
+@app.get("/api/coins", response_model=APIResponse)
+async def get_available_coins(request: Request):
+    """Get list of available coins for trading from real Hyperliquid API"""
+    coins, is_fallback = await get_coin_list()
+    return cacheable_response(request, APIResponse(
+        success=True,
+        message="Available coins retrieved successfully" + (" (fallback)" if is_fallback else ""),
+        data=coins
+    ))
+
+# Composite view endpoints
+DASHBOARD_COINS = ["BTC", "ETH", "SOL", "AVAX"]
+
+async def gather_view(parts: Dict[str, Any]) -> tuple:
+    """Await the named view parts concurrently; failed parts become None with an error"""
+    names = list(parts.keys())
+    results = await asyncio.gather(*parts.values(), return_exceptions=True)
+    data = {}
+    errors = {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            print(f"View part {name} failed: {result}")
+            data[name] = None
+            errors[name] = str(result)
+        else:
+            data[name] = result
+    return data, errors
+
+async def get_market_snapshots(service, coins: List[str]) -> Dict[str, Any]:
+    """Market data for several coins; they share one mids snapshot"""
+    data, _ = await gather_view({coin: service.get_market_data(coin) for coin in coins})
+    return {coin: market.dict() for coin, market in data.items() if market is not None}
+
+@app.get("/api/views/dashboard", response_model=APIResponse)
+async def get_dashboard_view(coins: Optional[str] = None):
+    """Portfolio plus market data for the watched coins and every held coin, in one request"""
+    watched = [c.strip().upper() for c in coins.split(",") if c.strip()] if coins else list(DASHBOARD_COINS)
+    
+    # One lease for the whole view so every part comes from the same account
+    async with services.lease() as service:
+        data, errors = await gather_view({
+            "portfolio": service.get_portfolio(),
+            "market": get_market_snapshots(service, watched)
+        })
         
-        return APIResponse(
-            success=True,
-            message="Available coins retrieved successfully (fallback)",
-            data=fallback_coins
-        )
+        # Held coins are only known once the portfolio is in; their lookups
+        # reuse the mids snapshot the watched coins just loaded
+        market = data["market"] or {}
+        if data["portfolio"] is not None:
+            held = [p.coin for p in data["portfolio"].positions if p.coin not in market]
+            if held:
+                market.update(await get_market_snapshots(service, held))
+            data["portfolio"] = data["portfolio"].dict()
+    data["market"] = market
+    
+    return APIResponse(
+        success=True,
+        message="Dashboard view retrieved successfully",
+        data=data,
+        error="; ".join(f"{name}: {error}" for name, error in errors.items()) or None
+    )
+
+@app.get("/api/views/trading", response_model=APIResponse)
+async def get_trading_view(coin: str = "BTC", include_coins: bool = True):
+    """Market data, order book, open orders and (optionally) the coin list, in one request"""
+    coin = coin.upper()
+    
+    async def market(service):
+        return (await service.get_market_data(coin)).dict()
+    
+    async def order_book(service):
+        return (await service.get_order_book(coin)).dict()
+    
+    async def open_orders(service):
+        return [order.dict() for order in await service.get_open_orders()]
+    
+    async def coin_list():
+        return (await get_coin_list())[0]
+    
+    async with services.lease() as service:
+        parts = {
+            "market": market(service),
+            "orderbook": order_book(service),
+            "open_orders": open_orders(service)
+        }
+        if include_coins:
+            parts["coins"] = coin_list()
+        
+        data, errors = await gather_view(parts)
+    return APIResponse(
+        success=True,
+        message="Trading view retrieved successfully",
+        data={"coin": coin, **data},
+        error="; ".join(f"{name}: {error}" for name, error in errors.items()) or None
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,216 @@
+"""
+Hot-swappable Hyperliquid service slots and the multi-account pool.
+
+Request handlers lease the current service for the duration of a call. A swap
+builds the replacement off the event loop, then switches the slot in a single
+assignment: leases taken before the switch keep running on the old instance,
+which is closed once they have drained. Market, universe and candle caches
+live in the shared store under credential-independent keys, so they survive
+the swap untouched; the old instance's public Info client is handed to the
+replacement when both talk to the same environment.
+
+ServicePool keeps one slot per account, keyed by environment and wallet. All
+of its services share the process-wide info connection pool, one Info client
+per environment and the shared market caches, and fan-out queries run every
+account concurrently.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+DRAIN_TIMEOUT = 30.0
+ACCOUNT_QUERY_TIMEOUT = 10.0
+
+
+def account_key(environment: str, wallet_address: str) -> str:
+    return f"{environment}:{wallet_address.strip().lower()}"
+
+
+class ServiceSlot:
+    """Holds the active service and swaps it without disturbing in-flight calls"""
+
+    def __init__(self, service, drain_timeout: float = DRAIN_TIMEOUT):
+        self._service = service
+        self.generation = 0
+        self.drain_timeout = drain_timeout
+        self._leases: Dict[int, int] = {}
+        self._drained: Dict[int, asyncio.Event] = {}
+        self._swap_lock = asyncio.Lock()
+        self._retiring = set()
+
+    @property
+    def current(self):
+        return self._service
+
+    @asynccontextmanager
+    async def lease(self):
+        """Pin the current service for the duration of a request"""
+        generation, service = self.generation, self._service
+        self._leases[generation] = self._leases.get(generation, 0) + 1
+        try:
+            yield service
+        finally:
+            remaining = self._leases[generation] - 1
+            if remaining:
+                self._leases[generation] = remaining
+            else:
+                del self._leases[generation]
+                drained = self._drained.pop(generation, None)
+                if drained:
+                    drained.set()
+
+    async def swap(self, build: Callable[[Optional[object]], object]):
+        """Build a replacement off-loop and make it current.
+
+        build receives the outgoing service so it can reuse what does not
+        depend on credentials. Concurrent swaps are applied in order.
+        """
+        async with self._swap_lock:
+            old, old_generation = self._service, self.generation
+            new = await asyncio.to_thread(build, old)
+            prefetch = getattr(new, "prefetch", None)
+            if prefetch:
+                # Load the new account's state before it takes traffic
+                try:
+                    await prefetch()
+                except Exception as e:
+                    print(f"Prefetch for the new service failed: {e}")
+
+            self._service, self.generation = new, old_generation + 1
+
+        task = asyncio.create_task(self._retire(old, old_generation))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+        return new
+
+    def retire(self):
+        """Close the current service once its in-flight calls drain (the slot is being dropped)"""
+        task = asyncio.create_task(self._retire(self._service, self.generation))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def _retire(self, service, generation: int):
+        if self._leases.get(generation):
+            drained = self._drained.setdefault(generation, asyncio.Event())
+            try:
+                await asyncio.wait_for(drained.wait(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"Service generation {generation} still had "
+                      f"{self._leases.get(generation, 0)} call(s) in flight after {self.drain_timeout}s")
+
+        close = getattr(service, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                print(f"Failed to close retired service: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "generation": self.generation,
+            "in_flight": sum(self._leases.values()),
+            "draining": len(self._retiring)
+        }
+
+    async def close(self):
+        for task in list(self._retiring):
+            task.cancel()
+        await asyncio.gather(*self._retiring, return_exceptions=True)
+
+
+class ServicePool:
+    """Service slots for every configured account, keyed by environment and wallet"""
+
+    def __init__(self, build: Callable[[Any, Optional[object]], object]):
+        # build(credentials, donor) runs off-loop; donor is a service whose
+        # credential-independent parts may be reused
+        self._build = build
+        self._slots: Dict[str, ServiceSlot] = {}
+        self._credentials: Dict[str, Any] = {}
+        self._sync_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def keys(self) -> List[str]:
+        return list(self._slots)
+
+    def credentials(self, key: str):
+        return self._credentials.get(key)
+
+    def slot(self, key: str) -> Optional[ServiceSlot]:
+        return self._slots.get(key)
+
+    def _donor(self, environment: str):
+        for key, slot in self._slots.items():
+            if key.startswith(f"{environment}:") and getattr(slot.current, "info", None) is not None:
+                return slot.current
+        return None
+
+    async def sync(self, accounts: List[Any]):
+        """Bring the pool in line with the configured accounts.
+
+        New accounts are built, changed ones swapped and removed ones retired.
+        Builds run concurrently, except that the first service of an
+        environment is built before the others so they can share its Info client.
+        """
+        async with self._sync_lock:
+            wanted = {}
+            for credentials in accounts:
+                if credentials.wallet_address:
+                    wanted[account_key(credentials.environment, credentials.wallet_address)] = credentials
+
+            for key in [key for key in self._slots if key not in wanted]:
+                self._slots.pop(key).retire()
+                self._credentials.pop(key, None)
+
+            changed: Dict[str, List[str]] = {}
+            for key, credentials in wanted.items():
+                if self._credentials.get(key) != credentials:
+                    changed.setdefault(credentials.environment, []).append(key)
+
+            async def apply(key: str):
+                credentials = wanted[key]
+                slot = self._slots.get(key)
+                if slot is None:
+                    donor = self._donor(credentials.environment)
+                    service = await asyncio.to_thread(self._build, credentials, donor)
+                    self._slots[key] = ServiceSlot(service)
+                else:
+                    await slot.swap(lambda previous: self._build(credentials, previous))
+                self._credentials[key] = credentials
+
+            async def apply_environment(environment: str, keys: List[str]):
+                if self._donor(environment) is None:
+                    await apply(keys[0])
+                    keys = keys[1:]
+                await asyncio.gather(*[apply(key) for key in keys])
+
+            results = await asyncio.gather(
+                *[apply_environment(environment, keys) for environment, keys in changed.items()],
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Failed to build account service: {result}")
+
+    async def gather(self, call: Callable[[object], Awaitable[Any]],
+                     timeout: float = ACCOUNT_QUERY_TIMEOUT) -> Dict[str, Any]:
+        """Run call against every account concurrently.
+
+        Returns results by account key; a failed or timed-out account maps to its exception.
+        """
+        async def run(slot: ServiceSlot):
+            async with slot.lease() as service:
+                return await asyncio.wait_for(call(service), timeout)
+
+        keys = list(self._slots)
+        results = await asyncio.gather(*[run(self._slots[key]) for key in keys], return_exceptions=True)
+        return dict(zip(keys, results))
+
+    async def close(self):
+        slots = list(self._slots.values())
+        self._slots.clear()
+        self._credentials.clear()
+        await asyncio.gather(*[slot.close() for slot in slots], return_exceptions=True)
@@ -0,0 +1,166 @@
+"""
+Cross-process shared state for multi-worker deployments.
+
+When REDIS_URL is set, caches and service configuration change notifications
+are shared by every uvicorn worker through a Redis-compatible server. Without
+it a process-local store is used, which is only correct for a single worker.
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+KEY_PREFIX = "hypertrader:"
+SERVICE_CONFIG_CHANNEL = "hypertrader:service-config"
+
+# Identifies this worker in published messages so it can ignore its own
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+MessageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LocalStore:
+    """Process-local store used when no shared server is configured"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._subscribers: Dict[str, List[MessageHandler]] = {}
+
+    @property
+    def is_shared(self) -> bool:
+        return False
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set_json(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = (await self.get_json(key) or 0) + 1
+        self._data[key] = (value, None)
+        return value
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        for handler in list(self._subscribers.get(channel, [])):
+            try:
+                await handler(message)
+            except Exception as e:
+                print(f"Error handling {channel} message: {e}")
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        self._subscribers.setdefault(channel, []).append(handler)
+
+    async def close(self):
+        self._subscribers.clear()
+
+
+class RedisStore:
+    """Store backed by a Redis-compatible server shared by all workers"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as aioredis
+
+        self.url = url
+        self._redis = aioredis.from_url(url)
+        self._listeners: List[asyncio.Task] = []
+
+    @property
+    def is_shared(self) -> bool:
+        return True
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        # A cache outage must never fail a request, it only costs an upstream call
+        try:
+            raw = await self._redis.get(KEY_PREFIX + key)
+        except Exception as e:
+            print(f"Shared store read failed for {key}: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    async def set_json(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            await self._redis.set(
+                KEY_PREFIX + key,
+                json.dumps(value),
+                px=int(ttl * 1000) if ttl else None
+            )
+        except Exception as e:
+            print(f"Shared store write failed for {key}: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self._redis.delete(KEY_PREFIX + key)
+        except Exception as e:
+            print(f"Shared store delete failed for {key}: {e}")
+
+    async def incr(self, key: str) -> int:
+        return int(await self._redis.incr(KEY_PREFIX + key))
+
+    async def publish(self, channel: str, message: Dict[str, Any]):
+        await self._redis.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+        self._listeners.append(asyncio.create_task(self._listen(channel, pubsub, handler)))
+
+    async def _listen(self, channel: str, pubsub, handler: MessageHandler):
+        while True:
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        await handler(json.loads(message["data"]))
+                    except Exception as e:
+                        print(f"Error handling {channel} message: {e}")
+            except asyncio.CancelledError:
+                await pubsub.close()
+                raise
+            except Exception as e:
+                print(f"Lost subscription to {channel}, retrying: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await pubsub.subscribe(channel)
+                except Exception:
+                    pass
+
+    async def close(self):
+        for task in self._listeners:
+            task.cancel()
+        await asyncio.gather(*self._listeners, return_exceptions=True)
+        self._listeners.clear()
+        await self._redis.close()
+
+
+def create_shared_store():
+    """Create the shared store configured for this deployment"""
+    redis_url = os.getenv("REDIS_URL", "").strip()
+    if redis_url:
+        try:
+            store = RedisStore(redis_url)
+            print(f"Shared store: Redis at {redis_url}")
+            return store
+        except ImportError:
+            print("REDIS_URL is set but the redis package is not installed, using local store")
+    print("Shared store: process-local (single worker only)")
+    return LocalStore()
+
+
+# Global store instance
+shared_store = create_shared_store()
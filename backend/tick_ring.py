@@ -0,0 +1,300 @@
+"""
+Shared-memory tick ring buffer.
+
+The market ingest process is the single writer; API workers and strategy
+processes attach as readers. Nothing is locked: every ring slot and every
+latest-quote entry carries a sequence counter that readers check before and
+after copying the fields out, so a torn read is detected and retried (or,
+for a lapped ring slot, reported as dropped). Fields are read straight out
+of the shared buffer with struct, no JSON decoding is involved.
+
+Layout (little-endian):
+    header      64 bytes
+    directory   max_coins * 16 bytes     coin names, index = coin id
+    latest      max_coins * 88 bytes     seqlocked latest quote per coin
+    ring        capacity * 56 bytes      tick records
+"""
+
+import os
+import time
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_RING_NAME = os.getenv("TICK_RING_NAME", "hypertrader_ticks")
+DEFAULT_CAPACITY = 65536
+DEFAULT_MAX_COINS = 1024
+
+MAGIC = 0x42525448  # "HTRB"
+VERSION = 2
+
+# Tick kinds
+KIND_MID = 1
+KIND_BBO = 2
+KIND_TRADE = 3
+
+# magic, version, capacity, max_coins, write_seq, coin_count
+_HEADER = struct.Struct("<IIIIQI")
+_HEADER_SIZE = 64
+_WRITE_SEQ_OFFSET = 16
+_COIN_COUNT_OFFSET = 24
+
+_COIN_NAME_SIZE = 16
+
+# seq, ts_ms, mid, bid, bid_sz, ask, ask_sz, last_px, last_sz, mid_ts_ms, bbo_ts_ms
+# ts_ms is the last update of any kind; mids and quotes go stale on their own clocks
+_LATEST = struct.Struct("<Qqdddddddqq")
+_LATEST_FIELDS = struct.Struct("<qdddddddqq")
+
+# seq, kind, side, coin_id, pad, ts_ms, px, sz, px2, sz2
+_RECORD = struct.Struct("<QBBHIqdddd")
+_RECORD_BODY = struct.Struct("<BBHIqdddd")
+
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+
+Tick = namedtuple("Tick", ["seq", "kind", "coin", "ts_ms", "px", "sz", "px2", "sz2", "side"])
+Quote = namedtuple("Quote", ["coin", "ts_ms", "mid", "bid", "bid_sz", "ask", "ask_sz", "last_px", "last_sz",
+                             "mid_ts_ms", "bbo_ts_ms"])
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _layout(capacity: int, max_coins: int) -> Tuple[int, int, int, int]:
+    directory = _HEADER_SIZE
+    latest = directory + max_coins * _COIN_NAME_SIZE
+    ring = latest + max_coins * _LATEST.size
+    total = ring + capacity * _RECORD.size
+    return directory, latest, ring, total
+
+
+class TickRingWriter:
+    """Single writer owning the shared-memory segment"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, capacity: int = DEFAULT_CAPACITY,
+                 max_coins: int = DEFAULT_MAX_COINS):
+        self.name = name
+        self.capacity = capacity
+        self.max_coins = max_coins
+        self._directory, self._latest, self._ring, size = _layout(capacity, max_coins)
+
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a crashed ingest process
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self._buf = self._shm.buf
+        self._buf[:size] = bytes(size)
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, capacity, max_coins, 0, 0)
+
+        self._seq = 0
+        self._coin_ids: Dict[str, int] = {}
+        self._latest_state: List[list] = []
+
+    def coin_id(self, coin: str) -> int:
+        """Return the directory index of a coin, registering it on first use"""
+        coin_id = self._coin_ids.get(coin)
+        if coin_id is not None:
+            return coin_id
+
+        coin_id = len(self._coin_ids)
+        if coin_id >= self.max_coins:
+            raise ValueError(f"Tick ring directory is full ({self.max_coins} coins)")
+
+        encoded = coin.encode("ascii")[:_COIN_NAME_SIZE].ljust(_COIN_NAME_SIZE, b"\0")
+        offset = self._directory + coin_id * _COIN_NAME_SIZE
+        self._buf[offset:offset + _COIN_NAME_SIZE] = encoded
+        # Publish the name before the count so readers never see an empty slot
+        _U32.pack_into(self._buf, _COIN_COUNT_OFFSET, coin_id + 1)
+
+        self._coin_ids[coin] = coin_id
+        # ts_ms, mid, bid, bid_sz, ask, ask_sz, last_px, last_sz, mid_ts_ms, bbo_ts_ms
+        self._latest_state.append([0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0])
+        return coin_id
+
+    def write_mid(self, coin: str, mid: float, ts_ms: Optional[int] = None):
+        ts_ms = ts_ms or _now_ms()
+        coin_id = self.coin_id(coin)
+        state = self._latest_state[coin_id]
+        state[0], state[1], state[8] = ts_ms, mid, ts_ms
+        self._append(KIND_MID, 0, coin_id, ts_ms, mid, 0.0, 0.0, 0.0)
+        self._publish_latest(coin_id)
+
+    def write_mids(self, mids: Dict[str, float], ts_ms: Optional[int] = None):
+        ts_ms = ts_ms or _now_ms()
+        for coin, mid in mids.items():
+            self.write_mid(coin, mid, ts_ms)
+
+    def write_bbo(self, coin: str, bid: float, bid_sz: float, ask: float, ask_sz: float,
+                  ts_ms: Optional[int] = None):
+        ts_ms = ts_ms or _now_ms()
+        coin_id = self.coin_id(coin)
+        state = self._latest_state[coin_id]
+        state[0], state[9] = ts_ms, ts_ms
+        state[2:6] = [bid, bid_sz, ask, ask_sz]
+        self._append(KIND_BBO, 0, coin_id, ts_ms, bid, bid_sz, ask, ask_sz)
+        self._publish_latest(coin_id)
+
+    def write_trade(self, coin: str, px: float, sz: float, is_buy: bool, ts_ms: Optional[int] = None):
+        ts_ms = ts_ms or _now_ms()
+        coin_id = self.coin_id(coin)
+        state = self._latest_state[coin_id]
+        state[0] = ts_ms
+        state[6:8] = [px, sz]
+        self._append(KIND_TRADE, ord("B") if is_buy else ord("A"), coin_id, ts_ms, px, sz, 0.0, 0.0)
+        self._publish_latest(coin_id)
+
+    def _append(self, kind: int, side: int, coin_id: int, ts_ms: int,
+                px: float, sz: float, px2: float, sz2: float):
+        seq = self._seq + 1
+        offset = self._ring + ((seq - 1) % self.capacity) * _RECORD.size
+
+        # Invalidate the slot, write the body, then stamp it with its sequence
+        _U64.pack_into(self._buf, offset, 0)
+        _RECORD_BODY.pack_into(self._buf, offset + 8, kind, side, coin_id, 0, ts_ms, px, sz, px2, sz2)
+        _U64.pack_into(self._buf, offset, seq)
+        _U64.pack_into(self._buf, _WRITE_SEQ_OFFSET, seq)
+        self._seq = seq
+
+    def _publish_latest(self, coin_id: int):
+        offset = self._latest + coin_id * _LATEST.size
+        version = _U64.unpack_from(self._buf, offset)[0]
+        # Odd version marks the entry as being written
+        _U64.pack_into(self._buf, offset, version + 1)
+        _LATEST_FIELDS.pack_into(self._buf, offset + 8, *self._latest_state[coin_id])
+        _U64.pack_into(self._buf, offset, version + 2)
+
+    def close(self, unlink: bool = True):
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TickRingReader:
+    """Lock-free reader attached to a ring created by the ingest process"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME):
+        self.name = name
+        self._shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment when they exit
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        self._buf = self._shm.buf
+        magic, version, capacity, max_coins, _, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._shm.close()
+            raise ValueError(f"Shared memory segment {name} is not a tick ring")
+
+        self.capacity = capacity
+        self.max_coins = max_coins
+        self._directory, self._latest, self._ring, _ = _layout(capacity, max_coins)
+        self._coin_names: List[str] = []
+        self._coin_ids: Dict[str, int] = {}
+
+    @classmethod
+    def attach(cls, name: str = DEFAULT_RING_NAME) -> Optional["TickRingReader"]:
+        """Attach to a running ingest process, or return None if there is none"""
+        try:
+            return cls(name)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @property
+    def write_seq(self) -> int:
+        return _U64.unpack_from(self._buf, _WRITE_SEQ_OFFSET)[0]
+
+    def _refresh_directory(self):
+        count = _U32.unpack_from(self._buf, _COIN_COUNT_OFFSET)[0]
+        for coin_id in range(len(self._coin_names), count):
+            offset = self._directory + coin_id * _COIN_NAME_SIZE
+            name = bytes(self._buf[offset:offset + _COIN_NAME_SIZE]).rstrip(b"\0").decode("ascii")
+            self._coin_names.append(name)
+            self._coin_ids[name] = coin_id
+
+    def _coin_name(self, coin_id: int) -> str:
+        if coin_id >= len(self._coin_names):
+            self._refresh_directory()
+        return self._coin_names[coin_id]
+
+    def read(self, since_seq: int, limit: int = 10000) -> Tuple[List[Tick], int, int]:
+        """Read ticks written after since_seq.
+
+        Returns (ticks, next_seq, dropped) where dropped counts records that
+        were overwritten before this reader got to them.
+        """
+        head = self.write_seq
+        dropped = 0
+        start = since_seq + 1
+        oldest = max(1, head - self.capacity + 1)
+        if start < oldest:
+            dropped += oldest - start
+            start = oldest
+
+        ticks = []
+        end = min(head, start + limit - 1)
+        for seq in range(start, end + 1):
+            offset = self._ring + ((seq - 1) % self.capacity) * _RECORD.size
+            if _U64.unpack_from(self._buf, offset)[0] != seq:
+                dropped += 1
+                continue
+            kind, side, coin_id, _, ts_ms, px, sz, px2, sz2 = _RECORD_BODY.unpack_from(self._buf, offset + 8)
+            # The writer lapped us while we were copying the body
+            if _U64.unpack_from(self._buf, offset)[0] != seq:
+                dropped += 1
+                continue
+            ticks.append(Tick(seq, kind, self._coin_name(coin_id), ts_ms, px, sz, px2, sz2,
+                              chr(side) if side else ""))
+
+        return ticks, end if end >= start else since_seq, dropped
+
+    def _read_latest(self, coin_id: int) -> Optional[tuple]:
+        offset = self._latest + coin_id * _LATEST.size
+        for _ in range(100):
+            before = _U64.unpack_from(self._buf, offset)[0]
+            if before & 1:
+                continue
+            fields = _LATEST_FIELDS.unpack_from(self._buf, offset + 8)
+            if _U64.unpack_from(self._buf, offset)[0] == before:
+                return fields if before else None
+        return None
+
+    def latest(self, coin: str) -> Optional[Quote]:
+        """Latest quote for a coin, or None if the ingest process has not seen it"""
+        coin_id = self._coin_ids.get(coin)
+        if coin_id is None:
+            self._refresh_directory()
+            coin_id = self._coin_ids.get(coin)
+            if coin_id is None:
+                return None
+        fields = self._read_latest(coin_id)
+        return Quote(coin, *fields) if fields else None
+
+    def all_mids(self, max_age_ms: Optional[int] = None) -> Dict[str, float]:
+        """Latest mid price of every coin, skipping mids older than max_age_ms"""
+        self._refresh_directory()
+        cutoff = _now_ms() - max_age_ms if max_age_ms else 0
+        mids = {}
+        for coin_id, coin in enumerate(self._coin_names):
+            fields = self._read_latest(coin_id)
+            if fields and fields[1] > 0 and fields[8] >= cutoff:
+                mids[coin] = fields[1]
+        return mids
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
@@ -0,0 +1,453 @@
+"""
+Push session management for WebSocket and Server-Sent Events clients.
+
+Every connection gets a subscriber on the internal topic bus. Topic updates
+are conflated to the latest value per topic, so a slow consumer only ever
+holds one pending message per subscription, and direct messages go through a
+bounded queue. Clients that stop draining are evicted instead of slowing down
+everyone else.
+
+Each topic has a single producer task shared by all of its subscribers. It
+is started by the first subscription and stopped a short while after the
+last subscriber leaves, so N clients watching BTC cost one upstream poll,
+not N, and a reconnecting client finds its topic (and replay history) still
+there.
+
+Every update is encoded at most once per wire format and the same frame is
+sent to all subscribers using that format. WebSocket clients choose the
+format when they connect (``/api/ws?encoding=msgpack&compression=deflate``)
+or in a subscribe message: JSON text frames by default, MessagePack binary
+frames, and optionally zlib-deflated binary frames. Compression is done here
+rather than with per-connection permessage-deflate so it is paid once per
+update instead of once per client. SSE clients get text/event-stream frames
+with event ids they can resume from with Last-Event-ID.
+"""
+
+import json
+import time
+import zlib
+import asyncio
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple, Union
+
+from fastapi import WebSocket
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAX_QUEUE_SIZE = 64           # direct messages waiting for a slow client
+MAX_TOPICS_PER_SESSION = 50
+SEND_TIMEOUT = 5.0            # seconds a single send may take
+SLOW_CLIENT_TIMEOUT = 30.0    # seconds a client may stay behind before eviction
+EVICT_CLOSE_CODE = 1013       # "try again later"
+TOPIC_LINGER = 30.0           # seconds a topic outlives its last subscriber
+REPLAY_SIZE = 32              # updates kept per topic for Last-Event-ID resume
+SSE_HEARTBEAT = 15.0
+SSE_RETRY_MS = 3000
+
+ENCODINGS = ("json", "msgpack")
+COMPRESSIONS = ("none", "deflate")
+DEFLATE_LEVEL = 6
+
+Producer = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+Codec = Tuple[str, str]
+Frame = Union[str, bytes]
+
+DEFAULT_CODEC: Codec = ("json", "none")
+SSE_CODEC: Codec = ("sse", "none")
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ENCODINGS if msgpack is not None else ("json",)
+
+
+class EncodedMessage:
+    """A message plus its wire frames, each built at most once and shared"""
+
+    __slots__ = ("message", "event_id", "_frames")
+
+    def __init__(self, message: Dict[str, Any], event_id: Optional[str] = None):
+        self.message = message
+        self.event_id = event_id
+        self._frames: Dict[Codec, Frame] = {}
+
+    def frame(self, codec: Codec) -> Frame:
+        frame = self._frames.get(codec)
+        if frame is None:
+            encoding, compression = codec
+            if encoding == "sse":
+                payload = self._sse_frame()
+            elif encoding == "msgpack":
+                payload = msgpack.packb(self.message, default=_encode_default)
+            else:
+                payload = json.dumps(self.message, default=_encode_default)
+            if compression == "deflate":
+                if isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                payload = zlib.compress(payload, DEFLATE_LEVEL)
+            frame = payload
+            self._frames[codec] = frame
+        return frame
+
+    def _sse_frame(self) -> str:
+        lines = []
+        if self.event_id:
+            lines.append(f"id: {self.event_id}")
+        lines.append(f"event: {self.message.get('type', 'message')}")
+        lines.append(f"data: {json.dumps(self.message, default=_encode_default)}")
+        return "\n".join(lines) + "\n\n"
+
+
+class Subscriber:
+    """A client on the topic bus with conflated topic updates and a direct queue"""
+
+    kind = "subscriber"
+
+    def __init__(self, manager: "SessionManager", codec: Codec = DEFAULT_CODEC):
+        self.manager = manager
+        self.topics: Set[str] = set()
+        self.codec: Codec = codec
+        self.conflated = 0
+        self.closed = False
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        self._pending: "OrderedDict[str, EncodedMessage]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._behind_since: Optional[float] = None
+
+    def send(self, message: Union[Dict[str, Any], EncodedMessage]) -> bool:
+        """Queue a direct message; evicts the client if its queue is full"""
+        if self.closed:
+            return False
+        if not isinstance(message, EncodedMessage):
+            message = EncodedMessage(message)
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.evict("send queue full")
+            return False
+        self._wakeup.set()
+        return True
+
+    def offer(self, topic: str, message: EncodedMessage):
+        """Queue a topic update, replacing any unsent update for the same topic"""
+        if self.closed:
+            return
+        if topic in self._pending:
+            self.conflated += 1
+            if self._behind_since is None:
+                self._behind_since = time.monotonic()
+            elif time.monotonic() - self._behind_since > SLOW_CLIENT_TIMEOUT:
+                self.evict("client too slow")
+                return
+        self._pending[topic] = message
+        self._wakeup.set()
+
+    def _next_message(self) -> Optional[EncodedMessage]:
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if self._pending:
+            _, message = self._pending.popitem(last=False)
+            return message
+        return None
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        print(f"Evicting {self.kind} client: {reason}")
+        self.closed = True
+        self._wakeup.set()
+
+    async def close(self):
+        """Drop all subscriptions"""
+        self.closed = True
+        self._wakeup.set()
+        for topic in list(self.topics):
+            self.manager.unsubscribe(self, topic)
+        self._pending.clear()
+
+
+class ClientSession(Subscriber):
+    """One WebSocket connection with its own writer task"""
+
+    kind = "WebSocket"
+
+    def __init__(self, websocket: WebSocket, manager: "SessionManager"):
+        super().__init__(manager)
+        self.websocket = websocket
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer_task = asyncio.create_task(self._writer())
+
+    def configure(self, encoding: Optional[str] = None, compression: Optional[str] = None) -> bool:
+        """Switch the wire format for all following frames"""
+        encoding = encoding or self.codec[0]
+        compression = compression or self.codec[1]
+        if encoding not in available_encodings() or compression not in COMPRESSIONS:
+            self.send({
+                "type": "error",
+                "message": f"Unsupported format {encoding}/{compression}",
+                "encodings": list(available_encodings()),
+                "compressions": list(COMPRESSIONS)
+            })
+            return False
+        if (encoding, compression) != self.codec:
+            self.codec = (encoding, compression)
+            self.send({"type": "format", "encoding": encoding, "compression": compression})
+        return True
+
+    async def _writer(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                message = self._next_message()
+                while message is not None and not self.closed:
+                    frame = message.frame(self.codec)
+                    if isinstance(frame, str):
+                        send = self.websocket.send_text(frame)
+                    else:
+                        send = self.websocket.send_bytes(frame)
+                    await asyncio.wait_for(send, SEND_TIMEOUT)
+                    message = self._next_message()
+                self._behind_since = None
+
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.evict("send timed out")
+        except Exception:
+            # Connection went away; the endpoint's receive loop cleans up
+            self.closed = True
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        super().evict(reason)
+        asyncio.create_task(self._close_socket(reason))
+
+    async def _close_socket(self, reason: str):
+        try:
+            await self.websocket.close(code=EVICT_CLOSE_CODE, reason=reason)
+        except Exception:
+            pass
+
+    async def close(self):
+        """Stop the writer and drop all subscriptions"""
+        self.closed = True
+        if self._writer_task:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+        await super().close()
+
+
+class StreamSubscriber(Subscriber):
+    """One Server-Sent Events response"""
+
+    kind = "SSE"
+
+    def __init__(self, manager: "SessionManager"):
+        super().__init__(manager, SSE_CODEC)
+
+    async def frames(self) -> AsyncIterator[str]:
+        """Yield SSE frames until the client goes away or is evicted"""
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from timing out an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            self._wakeup.clear()
+
+            message = self._next_message()
+            while message is not None and not self.closed:
+                yield message.frame(self.codec)
+                message = self._next_message()
+            self._behind_since = None
+
+
+class Topic:
+    """A stream of updates shared by every subscriber of it"""
+
+    def __init__(self, name: str, producer: Producer, interval: float):
+        self.name = name
+        self.producer = producer
+        self.interval = interval
+        self.subscribers: Set[Subscriber] = set()
+        self.last_message: Optional[EncodedMessage] = None
+        self.task: Optional[asyncio.Task] = None
+        self.retire_handle: Optional[asyncio.TimerHandle] = None
+
+        # Event ids are "<epoch>-<sequence>"; the epoch changes whenever the
+        # topic is recreated so stale ids are never matched against new history
+        self.epoch = str(int(time.time() * 1000))
+        self.sequence = 0
+        self.history: Deque[Tuple[int, EncodedMessage]] = deque(maxlen=REPLAY_SIZE)
+
+    def publish(self, message: Dict[str, Any]):
+        # Encoded lazily by the first writer per format, then reused by the rest
+        self.sequence += 1
+        message = EncodedMessage(message, f"{self.epoch}-{self.sequence}")
+        self.last_message = message
+        self.history.append((self.sequence, message))
+        for subscriber in list(self.subscribers):
+            subscriber.offer(self.name, message)
+
+    def replay_after(self, event_id: str) -> Optional[list]:
+        """Updates published after event_id, or None if it cannot be resumed"""
+        epoch, _, sequence = event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if not self.history or sequence < self.history[0][0] - 1:
+            return None
+        return [message for seq, message in self.history if seq > sequence]
+
+    async def run(self):
+        while True:
+            try:
+                message = await self.producer()
+                if message is not None:
+                    self.publish(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error producing {self.name} update: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class SessionManager:
+    """Tracks subscribers and the topic producers they subscribe to"""
+
+    def __init__(self):
+        self.sessions: Set[Subscriber] = set()
+        self.topics: Dict[str, Topic] = {}
+        self._factories: Dict[str, Callable[[str], Producer]] = {}
+        self._intervals: Dict[str, float] = {}
+
+    def register_topic(self, kind: str, factory: Callable[[str], Producer], interval: float):
+        """Register how to produce topics named "<kind>" or "<kind>:<arg>\""""
+        self._factories[kind] = factory
+        self._intervals[kind] = interval
+
+    async def connect(self, websocket: WebSocket) -> ClientSession:
+        await websocket.accept()
+        session = ClientSession(websocket, self)
+        session.start()
+        self.sessions.add(session)
+        encoding = websocket.query_params.get("encoding")
+        compression = websocket.query_params.get("compression")
+        if encoding or compression:
+            session.configure(encoding, compression)
+        return session
+
+    def open_stream(self) -> StreamSubscriber:
+        subscriber = StreamSubscriber(self)
+        self.sessions.add(subscriber)
+        return subscriber
+
+    async def disconnect(self, session: Subscriber):
+        self.sessions.discard(session)
+        await session.close()
+
+    def subscribe(self, session: Subscriber, topic_name: str, last_event_id: Optional[str] = None) -> bool:
+        """Subscribe to a topic; subscribing twice is a no-op.
+
+        With last_event_id the updates missed since that event are replayed
+        when the topic still has them, otherwise the current value is sent.
+        """
+        if topic_name in session.topics:
+            return True
+        if len(session.topics) >= MAX_TOPICS_PER_SESSION:
+            session.send({"type": "error", "message": "Too many subscriptions"})
+            return False
+
+        topic = self.topics.get(topic_name)
+        if topic is None:
+            kind, _, arg = topic_name.partition(":")
+            factory = self._factories.get(kind)
+            if factory is None:
+                session.send({"type": "error", "message": f"Unknown topic {topic_name}"})
+                return False
+            topic = Topic(topic_name, factory(arg), self._intervals[kind])
+            self.topics[topic_name] = topic
+
+        if topic.retire_handle is not None:
+            topic.retire_handle.cancel()
+            topic.retire_handle = None
+
+        topic.subscribers.add(session)
+        session.topics.add(topic_name)
+
+        if topic.task is None:
+            topic.task = asyncio.create_task(topic.run())
+            return True
+
+        missed = topic.replay_after(last_event_id) if last_event_id else None
+        if missed is not None:
+            for message in missed:
+                session.send(message)
+        elif topic.last_message is not None:
+            # Late joiners get the current value without waiting a full interval
+            session.offer(topic_name, topic.last_message)
+        return True
+
+    def unsubscribe(self, session: Subscriber, topic_name: str):
+        """Remove a subscription; the producer stops soon after its last subscriber"""
+        session.topics.discard(topic_name)
+        topic = self.topics.get(topic_name)
+        if topic is None:
+            return
+        topic.subscribers.discard(session)
+        if not topic.subscribers and topic.retire_handle is None:
+            loop = asyncio.get_running_loop()
+            topic.retire_handle = loop.call_later(TOPIC_LINGER, self._retire_topic, topic_name)
+
+    def _retire_topic(self, topic_name: str):
+        topic = self.topics.get(topic_name)
+        if topic is None or topic.subscribers:
+            return
+        if topic.task:
+            topic.task.cancel()
+        del self.topics[topic_name]
+
+    def broadcast(self, message: Dict[str, Any]):
+        """Queue a message for every subscriber without waiting on any of them"""
+        message = EncodedMessage(message)
+        for session in list(self.sessions):
+            session.send(message)
+
+    def stats(self) -> Dict[str, Any]:
+        formats: Dict[str, int] = {}
+        for session in self.sessions:
+            key = "/".join(session.codec)
+            formats[key] = formats.get(key, 0) + 1
+        return {
+            "sessions": len(self.sessions),
+            "formats": formats,
+            "topics": {name: len(topic.subscribers) for name, topic in self.topics.items()},
+            "conflated": sum(session.conflated for session in self.sessions)
+        }
+
+    async def shutdown(self):
+        for session in list(self.sessions):
+            await self.disconnect(session)
+        for topic_name in list(self.topics):
+            topic = self.topics.pop(topic_name)
+            if topic.retire_handle is not None:
+                topic.retire_handle.cancel()
+            if topic.task:
+                topic.task.cancel()
@@ -4,25 +4,48 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
-echo "Starting FastAPI backend"
+INGEST_PID=""
+if [ "${MARKET_INGEST:-1}" = "1" ]; then
+    echo "Starting market data ingest process"
+    # Writes market ticks to shared memory for all API workers
+    python3 market_ingest.py &
+    INGEST_PID=$!
+fi
+
+echo "Starting FastAPI backend with ${WEB_CONCURRENCY:-1} worker(s)"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+# Multiple workers share caches and credential changes through REDIS_URL;
+# paper trading (no credentials configured) keeps its account in one process
+# and refuses orders unless WEB_CONCURRENCY is 1
+uvicorn server:app --host 0.0.0.0 --port 8001 --workers "${WEB_CONCURRENCY:-1}" &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Poll the health endpoint instead of sleeping a fixed time; cache warm-up
+# continues in the background and is reported by /api/ready
+STARTUP_TIMEOUT=${STARTUP_TIMEOUT:-60}
+WAITED=0
+until wget -q -O /dev/null http://127.0.0.1:8001/api/health 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ $WAITED -ge $((STARTUP_TIMEOUT * 2)) ]; then
+        echo "Backend did not become healthy within ${STARTUP_TIMEOUT}s, exiting"
+        kill $BACKEND_PID $INGEST_PID 2>/dev/null
+        exit 1
+    fi
+    sleep 0.5
+    WAITED=$((WAITED + 1))
+done
+echo "Backend is up"
 
 # Start Nginx
 nginx -g 'daemon off;' &
 NGINX_PID=$!
 
 # Handle termination signals
-trap 'kill $BACKEND_PID $NGINX_PID; exit 0' SIGTERM SIGINT
+trap 'kill $BACKEND_PID $NGINX_PID $INGEST_PID; exit 0' SIGTERM SIGINT
 
 # Check if processes are still running
 while kill -0 $BACKEND_PID 2>/dev/null && kill -0 $NGINX_PID 2>/dev/null; do
@@ -23,35 +23,16 @@ const Dashboard = () => {
     try {
       setLoading(true);
       
-      // Fetch portfolio data
-      const portfolioResponse = await axios.get('/api/portfolio');
-      if (portfolioResponse.data.success) {
-        setPortfolio(portfolioResponse.data.data);
-      }
-
-      // Fetch market data for multiple coins
-      try {
-        const marketDataPromises = coins.map(async coin => {
-          try {
-            const res = await axios.get(`/api/market/${coin}`);
-            return { coin, data: res.data.success ? res.data.data : null };
-          } catch (error) {
-            console.warn(`Failed to fetch market data for ${coin}:`, error);
-            return { coin, data: null };
-          }
-        });
-        
-        const marketResults = await Promise.all(marketDataPromises);
-        const marketDataMap = {};
-        marketResults.forEach(result => {
-          if (result.data) {
-            marketDataMap[result.coin] = result.data;
-          }
-        });
-        setMarketData(marketDataMap);
-      } catch (error) {
-        console.warn('Error fetching market data:', error);
-        // Don't fail the entire component if market data fails
+      // Portfolio and market data for all watched coins in one request
+      const response = await axios.get('/api/views/dashboard', {
+        params: { coins: coins.join(',') }
+      });
+      if (response.data.success) {
+        const view = response.data.data;
+        if (view.portfolio) {
+          setPortfolio(view.portfolio);
+        }
+        setMarketData(view.market || {});
       }
 
     } catch (error) {
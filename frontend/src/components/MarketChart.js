@@ -15,18 +15,20 @@ const MarketChart = ({ coin = 'BTC' }) => {
   const fetchChartData = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`/api/candlesticks/${coin}?interval=${timeframe}&limit=50`);
+      const response = await axios.get(`/api/candlesticks/${coin}?interval=${timeframe}&limit=50&format=columnar`);
       
       if (response.data.success) {
-        const formattedData = response.data.data.map(candle => ({
-          time: new Date(candle.timestamp).toLocaleTimeString('en-US', {
+        // Columnar series: parallel arrays of epoch-ms times and OHLCV values
+        const { t, h, l, c, v } = response.data.data;
+        const formattedData = t.map((time, i) => ({
+          time: new Date(time).toLocaleTimeString('en-US', {
             hour: '2-digit',
             minute: '2-digit'
           }),
-          price: candle.close,
-          high: candle.high,
-          low: candle.low,
-          volume: candle.volume
+          price: c[i],
+          high: h[i],
+          low: l[i],
+          volume: v[i]
         }));
         setChartData(formattedData);
       }
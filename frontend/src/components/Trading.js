@@ -47,43 +47,33 @@ const Trading = () => {
     try {
       setLoading(true);
       
-      // Fetch market data (most important for trading)
-      try {
-        const marketResponse = await axios.get(`/api/market/${orderForm.coin}`);
-        if (marketResponse.data.success) {
-          setMarketData(marketResponse.data.data);
-          
+      // Market data, order book and open orders in one request
+      const response = await axios.get('/api/views/trading', {
+        params: { coin: orderForm.coin, include_coins: false }
+      });
+      if (response.data.success) {
+        const view = response.data.data;
+
+        if (view.market) {
+          setMarketData(view.market);
+
           // Auto-fill price for market orders
           if (orderForm.orderType === 'market') {
-            const price = orderForm.side === 'long' ? marketResponse.data.data.ask : marketResponse.data.data.bid;
+            const price = orderForm.side === 'long' ? view.market.ask : view.market.bid;
             setOrderForm(prev => ({
               ...prev,
               price: price?.toFixed(2) || ''
             }));
           }
         }
-      } catch (error) {
-        console.warn('Error fetching market data:', error);
-      }
 
-      // Fetch order book (second priority)
-      try {
-        const orderBookResponse = await axios.get(`/api/orderbook/${orderForm.coin}`);
-        if (orderBookResponse.data.success) {
-          setOrderBook(orderBookResponse.data.data);
+        if (view.orderbook) {
+          setOrderBook(view.orderbook);
         }
-      } catch (error) {
-        console.warn('Error fetching order book:', error);
-      }
 
-      // Fetch open orders (lowest priority)
-      try {
-        const ordersResponse = await axios.get('/api/orders/open');
-        if (ordersResponse.data.success) {
-          setOpenOrders(ordersResponse.data.data);
+        if (view.open_orders) {
+          setOpenOrders(view.open_orders);
         }
-      } catch (error) {
-        console.warn('Error fetching open orders:', error);
       }
 
     } catch (error) {
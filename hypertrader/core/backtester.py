@@ -0,0 +1,354 @@
+"""
+Vectorized strategy backtester
+
+Runs a Strategy's configuration over candle arrays (t, o, h, l, c, v). Entry
+signals and indicators are computed for the whole history at once; the
+simulation then steps from trade to trade rather than bar to bar, finding
+each exit with array scans over the bars the trade is open. The Python work
+grows with the number of trades, not the number of bars, so years of 1m bars
+run in seconds.
+
+Execution model:
+  - Signals are read at a bar's close and filled at the next bar's open
+  - Stops (stop loss, trailing stop, liquidation) are checked before the take
+    profit within a bar; a bar that gaps through a level fills at its open
+  - The trailing stop follows the best price of the bars before the current one
+  - An opposite signal closes the position at the next open and reverses it
+  - Market fills pay slippage, every fill pays the fee rate
+  - One position at a time: scale in/out and hedging are not simulated, and
+    limit/stop entries are filled like market entries
+
+Position size (entry_size_type):
+  fixed       entry_size_value coins
+  percentage  entry_size_value percent of equity, times leverage, in notional
+  risk_based  loses max_risk_per_trade percent of equity at the stop loss
+Sizes are capped at max_position_size coins and equity times leverage.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.signal_compiler import compile_signal
+from models.strategy import Strategy, StrategyConfig, StrategyPerformance
+
+DEFAULT_INITIAL_EQUITY = 10000.0
+DEFAULT_FEE_RATE = 0.00045   # Taker fee per fill
+DEFAULT_SLIPPAGE = 0.0002    # Fraction of price on market fills
+
+DAY_MS = 86_400_000
+YEAR_MS = 365 * DAY_MS
+
+# Exit reasons, as stored in the trades' reason column
+EXIT_REASONS = ("stop_loss", "trailing_stop", "take_profit", "signal", "duration", "liquidation", "end")
+STOP_LOSS, TRAILING_STOP, TAKE_PROFIT, SIGNAL, DURATION, LIQUIDATION, END = range(len(EXIT_REASONS))
+
+# Bars scanned for an exit at a time; grows for long trades
+_FIRST_SCAN = 64
+_MAX_SCAN = 65536
+
+
+@dataclass
+class BacktestResult:
+    """Outcome of one backtest run"""
+    performance: StrategyPerformance
+    # Parallel arrays: entry_time, exit_time (epoch ms), side (+1/-1), size,
+    # entry_price, exit_price, pnl (after fees), fees, reason (index into EXIT_REASONS)
+    trades: Dict[str, np.ndarray]
+    equity: np.ndarray  # Marked to each bar's close
+    initial_equity: float
+    halted: bool = False  # Stopped early by max_drawdown or a wiped-out account
+
+    def to_dict(self) -> Dict:
+        return {
+            "performance": self.performance.to_dict(),
+            "trades": {name: values.tolist() for name, values in self.trades.items()},
+            "exit_reasons": list(EXIT_REASONS),
+            "final_equity": float(self.equity[-1]) if len(self.equity) else self.initial_equity,
+            "halted": self.halted
+        }
+
+
+# Entry signals
+
+def entry_signals(config: StrategyConfig, candles: Dict[str, np.ndarray]) -> np.ndarray:
+    """Direction of the entry signal at each bar's close: +1 long, -1 short, 0 none.
+
+    config.entry_signal is compiled by core.signal_compiler (parsed once per
+    distinct signal), e.g. "long: rsi(14) < 30 and close > ema(200); short: rsi(14) > 70".
+    """
+    return compile_signal(config.entry_signal).evaluate(candles)
+
+
+# Simulation
+
+def backtest(config: StrategyConfig, candles: Dict[str, np.ndarray],
+             signal: Optional[np.ndarray] = None,
+             initial_equity: float = DEFAULT_INITIAL_EQUITY,
+             fee_rate: float = DEFAULT_FEE_RATE,
+             slippage: float = DEFAULT_SLIPPAGE) -> BacktestResult:
+    """Backtest a configuration over candles; signal overrides config.entry_signal"""
+    t = np.asarray(candles["t"], dtype=np.int64)
+    bars = len(t)
+    if signal is None:
+        signal = entry_signals(config, candles) if bars else np.zeros(0, dtype=np.int8)
+    signal = np.sign(np.asarray(signal)).astype(np.int8)
+
+    if bars < 2:
+        performance = StrategyPerformance()
+        return BacktestResult(performance, trade_columns([]), np.full(bars, initial_equity), initial_equity)
+
+    high, low = np.asarray(candles["h"], dtype=np.float64), np.asarray(candles["l"], dtype=np.float64)
+    open_, close = np.asarray(candles["o"], dtype=np.float64), np.asarray(candles["c"], dtype=np.float64)
+    # Prices seen from each side: a short is a long on negated prices with high and low swapped
+    prices = {
+        1: (open_, high, low, close),
+        -1: (-open_, -low, -high, -close),
+    }
+
+    bar_ms = int(np.median(np.diff(t)))
+    max_bars = -(-config.max_trade_duration * 60_000 // bar_ms) if config.max_trade_duration else 0
+
+    # Entry at bar i's open on the signal at bar i-1's close, inside trading hours
+    entry_bars = np.flatnonzero(signal[:-1] != 0) + 1
+    entry_bars = entry_bars[within_trading_hours(t[entry_bars], config)]
+    # Bars whose open follows a long / short signal, for opposite-signal exits
+    signal_bars = {1: np.flatnonzero(signal[:-1] > 0) + 1, -1: np.flatnonzero(signal[:-1] < 0) + 1}
+
+    stop_loss = config.stop_loss_percent / 100.0 if config.stop_loss_enabled else 0.0
+    take_profit = config.take_profit_percent / 100.0 if config.take_profit_enabled else 0.0
+    trail = config.trailing_stop_percent / 100.0 if config.trailing_stop_enabled else 0.0
+
+    equity = initial_equity
+    peak = initial_equity
+    day, day_start_equity = None, initial_equity
+    halted = False
+    trades: List[Tuple] = []
+
+    position = 0  # Earliest bar a new position may open on
+    while True:
+        k = np.searchsorted(entry_bars, position)
+        if k >= len(entry_bars):
+            break
+        entry = int(entry_bars[k])
+        side = int(signal[entry - 1])
+        o, h, l, c = prices[side]
+
+        # Daily loss limit: no new entries until the next UTC day
+        entry_day = int(t[entry]) // DAY_MS
+        if entry_day != day:
+            day, day_start_equity = entry_day, equity
+        if config.daily_loss_limit and equity <= day_start_equity * (1 - config.daily_loss_limit / 100.0):
+            position = int(np.searchsorted(t, (entry_day + 1) * DAY_MS))
+            continue
+
+        entry_price = o[entry] + slippage * abs(o[entry])
+        size = position_size(config, equity, abs(entry_price), stop_loss)
+        if size <= 0:
+            break
+        entry_fee = size * abs(entry_price) * fee_rate
+
+        # Levels in the side's price space (stops below, take profit above)
+        levels = []
+        if stop_loss:
+            levels.append((entry_price - stop_loss * abs(entry_price), STOP_LOSS))
+        # Liquidation when the loss would exceed the remaining equity
+        levels.append((entry_price - (equity - entry_fee) / size, LIQUIDATION))
+        stop_price, stop_reason = max(levels)
+        target = entry_price + take_profit * abs(entry_price) if take_profit else np.inf
+
+        # Exits known without scanning: opposite signal, duration, end of data
+        last = bars - 1
+        forced_reason = END
+        opposite = signal_bars[-side]
+        i = np.searchsorted(opposite, entry + 1)
+        if i < len(opposite) and opposite[i] <= last:
+            last, forced_reason = int(opposite[i]), SIGNAL
+        if max_bars and entry + max_bars - 1 < last:
+            last, forced_reason = entry + max_bars - 1, DURATION
+
+        # A signal exit fills at the open of its bar, before anything else in it can trade
+        scan_last = last - 1 if forced_reason == SIGNAL else last
+        exit_bar, exit_price, reason = find_exit(
+            o, h, l, entry, scan_last, entry_price, stop_price, stop_reason, target, trail
+        )
+        if exit_bar is None:
+            exit_bar, reason = last, forced_reason
+            exit_price = o[last] if reason == SIGNAL else c[last]
+        if reason != TAKE_PROFIT:
+            exit_price -= slippage * abs(exit_price)
+
+        exit_fee = size * abs(exit_price) * fee_rate
+        pnl = max(size * (exit_price - entry_price) - entry_fee - exit_fee, -equity)
+        equity += pnl
+        trades.append((entry, exit_bar, side, size, side * entry_price, side * exit_price,
+                       pnl, entry_fee + exit_fee, reason))
+
+        peak = max(peak, equity)
+        if equity <= 0 or (config.max_drawdown and equity <= peak * (1 - config.max_drawdown / 100.0)):
+            halted = True
+            break
+        # A signal exit happens at the open, so the reverse entry can use the same bar
+        position = exit_bar if reason == SIGNAL else exit_bar + 1
+
+    curve = _equity_curve(trades, close, initial_equity, fee_rate)
+    performance = performance_from(np.array([trade[6] for trade in trades]), curve, t, initial_equity, bar_ms)
+    return BacktestResult(performance, trade_columns(trades, t), curve, initial_equity, halted)
+
+
+def backtest_strategy(strategy: Strategy, candles: Dict[str, np.ndarray], **kwargs) -> BacktestResult:
+    """Backtest a strategy, marking it BACKTESTING while it runs if it is stopped"""
+    from models.strategy import StrategyStatus
+
+    status = strategy.status
+    if status == StrategyStatus.STOPPED:
+        strategy.status = StrategyStatus.BACKTESTING
+    try:
+        return backtest(strategy.config, candles, **kwargs)
+    finally:
+        strategy.status = status
+
+
+def find_exit(o, h, l, entry: int, last: int, entry_price: float, stop_price: float,
+              stop_reason: int, target: float, trail: float):
+    """First bar in [entry, last] that hits a stop or the target, in the side's price space"""
+    start = entry
+    best = entry_price  # Best price of the bars before the scan window
+    width = _FIRST_SCAN
+    while start <= last:
+        end = min(last + 1, start + width)
+        lows = l[start:end]
+        stops = stop_price
+        if trail:
+            # Best price before each bar: entry price, then the running high
+            highs_before = np.maximum.accumulate(np.concatenate(([best], h[start:end - 1])))
+            trailing = highs_before - trail * np.abs(highs_before)
+            stops = np.maximum(trailing, stop_price)
+        stopped = lows <= stops
+        hit_target = h[start:end] >= target
+        hits = stopped | hit_target
+        if hits.any():
+            offset = int(np.argmax(hits))
+            bar = start + offset
+            if stopped[offset]:
+                level = stops[offset] if trail else stop_price
+                reason = TRAILING_STOP if trail and level > stop_price else stop_reason
+                return bar, min(o[bar], level), reason
+            return bar, max(o[bar], target), TAKE_PROFIT
+        if trail:
+            best = max(best, float(h[start:end].max()))
+        start = end
+        width = min(width * 2, _MAX_SCAN)
+    return None, None, None
+
+
+def position_size(config: StrategyConfig, equity: float, price: float, stop_loss: float) -> float:
+    if equity <= 0 or price <= 0:
+        return 0.0
+    if config.entry_size_type == "percentage":
+        size = equity * config.entry_size_value / 100.0 * config.leverage / price
+    elif config.entry_size_type == "risk_based" and stop_loss:
+        size = equity * config.max_risk_per_trade / 100.0 / (stop_loss * price)
+    else:
+        size = config.entry_size_value
+    size = min(size, equity * config.leverage / price)
+    if config.max_position_size:
+        size = min(size, config.max_position_size)
+    return max(size, 0.0)
+
+
+def within_trading_hours(times: np.ndarray, config: StrategyConfig) -> np.ndarray:
+    """UTC time of day within [trading_hours_start, trading_hours_end], wrapping past midnight"""
+    start = _minute_of_day(config.trading_hours_start)
+    end = _minute_of_day(config.trading_hours_end)
+    if start == 0 and end >= 23 * 60 + 59:
+        return np.ones(len(times), dtype=bool)
+    minutes = times % DAY_MS // 60_000
+    if start <= end:
+        return (minutes >= start) & (minutes <= end)
+    return (minutes >= start) | (minutes <= end)
+
+
+def _minute_of_day(value: str) -> int:
+    hours, _, minutes = value.partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+# Results
+
+def _equity_curve(trades: List[Tuple], close: np.ndarray, initial_equity: float, fee_rate: float) -> np.ndarray:
+    """Equity at each bar's close: realized PnL plus the open position marked to the close"""
+    realized = np.zeros(len(close))
+    unrealized = np.zeros(len(close))
+    for entry, exit_bar, side, size, entry_price, _, pnl, _, _ in trades:
+        realized[exit_bar] += pnl
+        if exit_bar > entry:
+            entry_fee = size * abs(entry_price) * fee_rate
+            unrealized[entry:exit_bar] = side * size * (close[entry:exit_bar] - entry_price) - entry_fee
+    return initial_equity + np.cumsum(realized) + unrealized
+
+
+def trade_columns(trades: List[Tuple], t: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    if not trades:
+        empty = np.empty(0)
+        return {
+            "entry_time": np.empty(0, dtype=np.int64), "exit_time": np.empty(0, dtype=np.int64),
+            "side": np.empty(0, dtype=np.int8), "size": empty, "entry_price": empty,
+            "exit_price": empty, "pnl": empty, "fees": empty, "reason": np.empty(0, dtype=np.uint8)
+        }
+    entry, exit_bar, side, size, entry_price, exit_price, pnl, fees, reason = (np.array(column) for column in zip(*trades))
+    return {
+        "entry_time": t[entry], "exit_time": t[exit_bar], "side": side.astype(np.int8),
+        "size": size, "entry_price": entry_price, "exit_price": exit_price,
+        "pnl": pnl, "fees": fees, "reason": reason.astype(np.uint8)
+    }
+
+
+def performance_from(pnl: np.ndarray, equity: np.ndarray, t: np.ndarray,
+                     initial_equity: float, bar_ms: int) -> StrategyPerformance:
+    """Every StrategyPerformance field from trade PnLs and the equity curve at each bar"""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    wins, losses = pnl[pnl > 0], pnl[pnl <= 0]  # Break-even trades count as losses, as in update_trade
+
+    peaks = np.maximum.accumulate(equity)
+    drawdown = peaks - equity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(equity) / equity[:-1]
+    returns = returns[np.isfinite(returns)]
+    deviation = returns.std() if len(returns) > 1 else 0.0
+    sharpe = returns.mean() / deviation * np.sqrt(YEAR_MS / bar_ms) if deviation > 0 else 0.0
+
+    gross_loss = -losses.sum()
+    if gross_loss > 0:
+        profit_factor = wins.sum() / gross_loss
+    else:
+        profit_factor = float("inf") if len(wins) else 0.0
+
+    return StrategyPerformance(
+        total_trades=len(pnl),
+        winning_trades=len(wins),
+        losing_trades=len(losses),
+        total_pnl=float(pnl.sum()),
+        total_return_percent=float((equity[-1] - initial_equity) / initial_equity * 100),
+        max_drawdown=float(drawdown.max()),
+        max_drawdown_percent=float((drawdown / peaks).max() * 100),
+        sharpe_ratio=float(sharpe),
+        profit_factor=float(profit_factor),
+        avg_win=float(wins.mean()) if len(wins) else 0.0,
+        avg_loss=float(losses.mean()) if len(losses) else 0.0,
+        largest_win=float(wins.max()) if len(wins) else 0.0,
+        largest_loss=float(losses.min()) if len(losses) else 0.0,
+        consecutive_wins=_longest_run(pnl > 0),
+        consecutive_losses=_longest_run(pnl <= 0),
+        start_date=datetime.utcfromtimestamp(t[0] / 1000),
+        end_date=datetime.utcfromtimestamp(t[-1] / 1000)
+    )
+
+
+def _longest_run(mask: np.ndarray) -> int:
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
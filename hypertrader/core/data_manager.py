@@ -9,6 +9,8 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+import numpy as np
+
 from models.account import Account, Portfolio
 from models.position import Position
 from models.order import Order
@@ -105,7 +107,31 @@ class DataManager:
                         data_json TEXT
                     )
                 ''')
-                
+
+                # Streaming indicator snapshots table
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS indicator_state (
+                        state_key TEXT PRIMARY KEY,
+                        snapshot_json TEXT NOT NULL,
+                        updated_at TEXT NOT NULL
+                    )
+                ''')
+
+                # Candle history table (epoch-ms open times, for backtests)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS candles (
+                        coin TEXT NOT NULL,
+                        interval TEXT NOT NULL,
+                        t INTEGER NOT NULL,
+                        o REAL NOT NULL,
+                        h REAL NOT NULL,
+                        l REAL NOT NULL,
+                        c REAL NOT NULL,
+                        v REAL NOT NULL,
+                        PRIMARY KEY (coin, interval, t)
+                    ) WITHOUT ROWID
+                ''')
+
                 conn.commit()
                 self.logger.info("Database initialized successfully")
                 
@@ -311,6 +337,75 @@ class DataManager:
             self.logger.error(f"Failed to delete strategy: {e}")
             return False
             
+    def save_indicator_states(self, states: Dict[str, Dict[str, Any]]):
+        """Save streaming indicator snapshots by key"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                updated_at = datetime.utcnow().isoformat()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO indicator_state (state_key, snapshot_json, updated_at)
+                    VALUES (?, ?, ?)
+                ''', [(key, json.dumps(snapshot), updated_at) for key, snapshot in states.items()])
+                conn.commit()
+                self.logger.info(f"Saved {len(states)} indicator snapshots")
+        except Exception as e:
+            self.logger.error(f"Failed to save indicator states: {e}")
+
+    def get_indicator_states(self) -> Dict[str, Dict[str, Any]]:
+        """Get streaming indicator snapshots by key"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT state_key, snapshot_json FROM indicator_state')
+                return {key: json.loads(snapshot) for key, snapshot in cursor.fetchall()}
+
+        except Exception as e:
+            self.logger.error(f"Failed to get indicator states: {e}")
+            return {}
+
+    def save_candles(self, coin: str, interval: str, candles: List[Dict[str, Any]]):
+        """Save candles ({t, o, h, l, c, v} with t the open time in epoch ms)"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO candles (coin, interval, t, o, h, l, c, v)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (coin, interval, int(candle["t"]), float(candle["o"]), float(candle["h"]),
+                     float(candle["l"]), float(candle["c"]), float(candle["v"]))
+                    for candle in candles
+                ])
+                conn.commit()
+                self.logger.info(f"Saved {len(candles)} {coin} {interval} candles")
+        except Exception as e:
+            self.logger.error(f"Failed to save candles: {e}")
+
+    def get_candles(self, coin: str, interval: str, start_ms: Optional[int] = None,
+                    end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Stored candles as parallel arrays t (int64 epoch ms), o, h, l, c, v in time order"""
+        columns = {"t": np.empty(0, dtype=np.int64), **{key: np.empty(0) for key in "ohlcv"}}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT t, o, h, l, c, v FROM candles
+                    WHERE coin = ? AND interval = ? AND t >= ? AND t <= ?
+                    ORDER BY t
+                ''', (coin, interval, start_ms if start_ms is not None else 0,
+                      end_ms if end_ms is not None else 2 ** 62))
+                rows = cursor.fetchall()
+                if rows:
+                    table = np.array(rows, dtype=np.float64)
+                    columns = {"t": table[:, 0].astype(np.int64)}
+                    columns.update({key: np.ascontiguousarray(table[:, i + 1]) for i, key in enumerate("ohlcv")})
+                return columns
+
+        except Exception as e:
+            self.logger.error(f"Failed to get candles: {e}")
+            return columns
+
     def cleanup_old_data(self, days_to_keep: int = 30):
         """Cleanup old data from database"""
         try:
@@ -345,7 +440,7 @@ class DataManager:
                 stats = {}
                 
                 # Count records in each table
-                tables = ['account_history', 'orders', 'strategies', 'trades']
+                tables = ['account_history', 'orders', 'strategies', 'trades', 'indicator_state', 'candles']
                 for table in tables:
                     cursor.execute(f'SELECT COUNT(*) FROM {table}')
                     stats[table] = cursor.fetchone()[0]
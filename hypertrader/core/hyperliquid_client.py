@@ -197,14 +197,32 @@ class HyperliquidClient:
                 
             current_price = float(all_mids[coin])
             
-            # Get 24h data (simplified)
+            # 24h stats from the universe-wide asset contexts
+            context = self.get_asset_contexts().get(coin, {})
+            prev_day_price = float(context["prevDayPx"]) if context.get("prevDayPx") else None
+            
+            # Real top of book, falling back to the impact prices
+            bid, ask = current_price, current_price
+            try:
+                bids, asks = self.info.l2_snapshot(coin)["levels"]
+                if bids and asks:
+                    bid, ask = float(bids[0]["px"]), float(asks[0]["px"])
+            except Exception as e:
+                self.logger.warning(f"Failed to get top of book for {coin}: {e}")
+                if context.get("impactPxs"):
+                    bid, ask = (float(px) for px in context["impactPxs"])
+            
             market_data = {
                 "coin": coin,
                 "price": current_price,
-                "bid": current_price * 0.999,  # Approximate
-                "ask": current_price * 1.001,  # Approximate
-                "volume_24h": 0.0,  # Would need separate API call
-                "change_24h": 0.0,  # Would need historical data
+                "bid": bid,
+                "ask": ask,
+                "volume_24h": float(context.get("dayNtlVlm", 0.0)),
+                "change_24h": (current_price - prev_day_price) / prev_day_price * 100 if prev_day_price else 0.0,
+                "mark_price": float(context["markPx"]) if context.get("markPx") else None,
+                "oracle_price": float(context["oraclePx"]) if context.get("oraclePx") else None,
+                "funding": float(context["funding"]) if context.get("funding") else None,
+                "open_interest": float(context["openInterest"]) if context.get("openInterest") else None,
                 "timestamp": datetime.utcnow().isoformat()
             }
             
@@ -217,6 +235,50 @@ class HyperliquidClient:
             self.logger.error(f"Failed to get market data for {coin}: {e}")
             return None
             
+    def get_asset_contexts(self) -> Dict[str, Dict]:
+        """Asset contexts (24h volume, previous day price, funding, OI, mark/oracle) by coin"""
+        try:
+            if not self.info:
+                return {}
+                
+            # One request covers the whole universe
+            if self._is_cached("asset_ctxs", timeout=5):
+                return self.last_update["asset_ctxs"]["data"]
+                
+            meta, contexts = self.info.meta_and_asset_ctxs()
+            asset_contexts = {
+                asset["name"]: context for asset, context in zip(meta.get("universe", []), contexts)
+            }
+            self._cache_data("asset_ctxs", asset_contexts)
+            return asset_contexts
+            
+        except Exception as e:
+            self.logger.error(f"Failed to get asset contexts: {e}")
+            return {}
+            
+    def get_candles(self, coin: str, interval: str, start_ms: int, end_ms: int) -> List[Dict]:
+        """Candles ({t, o, h, l, c, v}, t the open time in epoch ms) between two times"""
+        try:
+            if not self.info:
+                return []
+
+            snapshot = self.info.candles_snapshot(coin, interval, start_ms, end_ms)
+            return [
+                {
+                    "t": int(candle["t"]),
+                    "o": float(candle["o"]),
+                    "h": float(candle["h"]),
+                    "l": float(candle["l"]),
+                    "c": float(candle["c"]),
+                    "v": float(candle["v"])
+                }
+                for candle in snapshot
+            ]
+
+        except Exception as e:
+            self.logger.error(f"Failed to get candles for {coin}: {e}")
+            return []
+
     def get_order_book(self, coin: str, depth: int = 10) -> Optional[Dict]:
         """Get order book for a coin"""
         try:
@@ -0,0 +1,289 @@
+"""
+Shared indicator computation graph
+
+Strategies declare the indicators they need for a coin and interval; the
+graph keeps one node per distinct (coin, interval, indicator, parameters)
+and updates it once per bar no matter how many strategies read it. Composite
+indicators are built from shared nodes too: MACD reads the same EMA nodes a
+strategy asking for ema:12 gets, and Bollinger bands, z-score and rolling
+std share one sliding-window mean/variance node.
+
+A new bar for a coin and interval only touches the nodes of that source, in
+dependency order, so the cost of a bar grows with the number of distinct
+indicators rather than the number of strategies. Nodes added while the
+source is live are warmed up by replaying a bounded bar history, reading
+their dependencies' recorded values, so they agree with nodes that saw every
+bar (exactly for windowed indicators; EMAs converge within the history).
+"""
+
+import math
+from collections import deque
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from core.indicators import parse_spec
+from core.streaming_indicators import (
+    StreamingIndicator, STREAMING_INDICATORS, EMA, RollingStats, NAN
+)
+
+# Bars kept per source (and values per node) to warm up nodes added later
+HISTORY_BARS = 1000
+
+SourceKey = Tuple[str, str]
+
+
+def canonical_spec(spec: str) -> str:
+    """'MACD' -> 'macd:12:26:9', 'bbands:20:2.0' -> 'bbands:20:2'"""
+    name, params = parse_spec(spec)
+    return ":".join([name, *(f"{p:g}" if isinstance(p, float) else str(p) for p in params)])
+
+
+class IndicatorNode:
+    """One shared indicator value on a source; state holds any streaming state to snapshot"""
+
+    def __init__(self, spec: str, deps: List["IndicatorNode"], state: Optional[StreamingIndicator] = None):
+        self.spec = spec
+        self.deps = deps
+        self.state = state
+        self.refs = 0
+        self.value: Any = NAN
+        self.history: deque = deque(maxlen=HISTORY_BARS)
+
+    def compute(self, bar: Mapping[str, float], inputs: List[Any]) -> Any:
+        return self.state.update_bar(bar)
+
+    def restored_value(self) -> Any:
+        return self.state.value if self.state is not None else NAN
+
+
+class StatsNode(IndicatorNode):
+    def compute(self, bar, inputs):
+        self.state.update(bar["c"])
+        return self.restored_value()
+
+    def restored_value(self):
+        stats = self.state
+        return {"mean": stats.mean if stats.full else NAN, "std": stats.std}
+
+
+class MACDNode(IndicatorNode):
+    def compute(self, bar, inputs):
+        line = inputs[0] - inputs[1]
+        if not math.isnan(line):
+            self.state.update(line)
+        signal = self.state.value
+        return {"macd": line, "signal": signal, "hist": line - signal}
+
+    def restored_value(self):
+        line = self.deps[0].value - self.deps[1].value
+        signal = self.state.value
+        return {"macd": line, "signal": signal, "hist": line - signal}
+
+
+class BollingerNode(IndicatorNode):
+    def __init__(self, spec, deps, k: float):
+        super().__init__(spec, deps)
+        self.k = k
+
+    def compute(self, bar, inputs):
+        stats = inputs[0]
+        width = self.k * stats["std"]
+        return {"mid": stats["mean"], "upper": stats["mean"] + width, "lower": stats["mean"] - width}
+
+    def restored_value(self):
+        return self.compute(None, [self.deps[0].value])
+
+
+class ZScoreNode(IndicatorNode):
+    def compute(self, bar, inputs):
+        stats = inputs[0]
+        if math.isnan(stats["std"]):
+            return NAN
+        return 0.0 if stats["std"] == 0.0 else (bar["c"] - stats["mean"]) / stats["std"]
+
+    def restored_value(self):
+        # Needs the bar's close; the next bar fills it in
+        return NAN
+
+
+class StdNode(IndicatorNode):
+    def compute(self, bar, inputs):
+        return inputs[0]["std"]
+
+    def restored_value(self):
+        return self.deps[0].value["std"]
+
+
+class Source:
+    """Nodes of one coin and interval, kept in dependency order"""
+
+    def __init__(self):
+        self.nodes: Dict[str, IndicatorNode] = {}
+        self.order: List[IndicatorNode] = []
+        self.history: deque = deque(maxlen=HISTORY_BARS)
+        self.strategies: Set[str] = set()
+
+
+class IndicatorGraph:
+    """Indicator nodes shared by every strategy, updated once per bar"""
+
+    def __init__(self):
+        self.sources: Dict[SourceKey, Source] = {}
+        # strategy_id -> (source key, requested spec -> canonical spec)
+        self.subscriptions: Dict[str, Tuple[SourceKey, Dict[str, str]]] = {}
+        # Snapshots waiting for their node to be created (after a restart)
+        self._pending_snapshots: Dict[str, Dict[str, Any]] = {}
+        self.node_updates = 0
+
+    # Subscriptions
+
+    def subscribe(self, strategy_id: str, coin: str, interval: str, specs: Iterable[str]) -> Dict[str, str]:
+        """Register the indicators a strategy reads; replaces any earlier subscription"""
+        key = (coin, interval)
+        source = self.sources.setdefault(key, Source())
+
+        requested = {spec: canonical_spec(spec) for spec in specs}
+        created: List[IndicatorNode] = []
+        for canonical in dict.fromkeys(requested.values()):
+            self._acquire(source, key, canonical, created)
+        if created and source.history:
+            self._replay(source, created)
+
+        # The earlier subscription is released only now, so the nodes it shares with
+        # the new one stay warm; the source is kept even if this was its only strategy
+        self.unsubscribe(strategy_id)
+        self.sources[key] = source
+        source.strategies.add(strategy_id)
+        self.subscriptions[strategy_id] = (key, requested)
+        return requested
+
+    def unsubscribe(self, strategy_id: str):
+        subscription = self.subscriptions.pop(strategy_id, None)
+        if subscription is None:
+            return
+        key, requested = subscription
+        source = self.sources[key]
+        for canonical in dict.fromkeys(requested.values()):
+            self._release(source, source.nodes[canonical])
+        source.strategies.discard(strategy_id)
+        if not source.strategies:
+            del self.sources[key]
+
+    def _acquire(self, source: Source, key: SourceKey, spec: str, created: List[IndicatorNode]) -> IndicatorNode:
+        node = source.nodes.get(spec)
+        if node is None:
+            node = self._build(source, key, spec, created)
+            source.nodes[spec] = node
+            source.order.append(node)
+            created.append(node)
+        node.refs += 1
+        return node
+
+    def _release(self, source: Source, node: IndicatorNode):
+        node.refs -= 1
+        if node.refs > 0:
+            return
+        del source.nodes[node.spec]
+        source.order.remove(node)
+        for dep in node.deps:
+            self._release(source, dep)
+
+    def _build(self, source: Source, key: SourceKey, spec: str, created: List[IndicatorNode]) -> IndicatorNode:
+        name, *params = spec.split(":")
+        acquire = lambda dep_spec: self._acquire(source, key, dep_spec, created)
+
+        if name == "macd":
+            fast, slow, signal = (int(p) for p in params)
+            node = MACDNode(spec, [acquire(f"ema:{fast}"), acquire(f"ema:{slow}")], EMA(signal))
+        elif name == "_stats":
+            node = StatsNode(spec, [], RollingStats(int(params[0])))
+        elif name == "bbands":
+            node = BollingerNode(spec, [acquire(f"_stats:{params[0]}")], float(params[1]))
+        elif name == "zscore":
+            node = ZScoreNode(spec, [acquire(f"_stats:{params[0]}")])
+        elif name == "std":
+            node = StdNode(spec, [acquire(f"_stats:{params[0]}")])
+        else:
+            _, typed_params = parse_spec(spec)
+            node = IndicatorNode(spec, [], STREAMING_INDICATORS[name](*typed_params))
+
+        # After a restart a fresh source resumes from the saved state
+        snapshot = self._pending_snapshots.pop(self._state_key(key, spec), None)
+        if snapshot is not None and node.state is not None and not source.history:
+            try:
+                node.state.restore(snapshot)
+                node.value = node.restored_value()
+            except (KeyError, ValueError):
+                # Saved with different parameters; start cold
+                node.state = type(node.state)(*node.state.params)
+        return node
+
+    # Updates
+
+    def on_bar(self, coin: str, interval: str, bar: Mapping[str, float]) -> Set[str]:
+        """Feed a closed bar (o/h/l/c/v) and return the strategies reading this source"""
+        source = self.sources.get((coin, interval))
+        if source is None:
+            return set()
+        for node in source.order:
+            node.value = node.compute(bar, [dep.value for dep in node.deps])
+            node.history.append(node.value)
+        self.node_updates += len(source.order)
+        source.history.append(dict(bar))
+        return set(source.strategies)
+
+    def _replay(self, source: Source, created: List[IndicatorNode]):
+        """Warm up new nodes over the source's history, reading existing deps' recorded values"""
+        new = set(map(id, created))
+        offset = len(source.history)
+        for step, bar in enumerate(source.history):
+            for node in created:
+                inputs = [
+                    dep.value if id(dep) in new else dep.history[step - offset]
+                    for dep in node.deps
+                ]
+                node.value = node.compute(bar, inputs)
+                node.history.append(node.value)
+        self.node_updates += len(created) * offset
+
+    # Reads
+
+    def value(self, coin: str, interval: str, spec: str) -> Any:
+        source = self.sources.get((coin, interval))
+        node = source.nodes.get(canonical_spec(spec)) if source else None
+        return node.value if node else NAN
+
+    def values_for(self, strategy_id: str) -> Dict[str, Any]:
+        """Current values of a strategy's indicators, keyed by the specs it asked for"""
+        subscription = self.subscriptions.get(strategy_id)
+        if subscription is None:
+            return {}
+        key, requested = subscription
+        nodes = self.sources[key].nodes
+        return {spec: nodes[canonical].value for spec, canonical in requested.items()}
+
+    # Persistence
+
+    @staticmethod
+    def _state_key(key: SourceKey, spec: str) -> str:
+        return f"{key[0]}|{key[1]}|{spec}"
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Streaming state of every node, by coin|interval|spec"""
+        states = {}
+        for key, source in self.sources.items():
+            for node in source.order:
+                if node.state is not None:
+                    states[self._state_key(key, node.spec)] = node.state.snapshot()
+        return states
+
+    def restore(self, states: Dict[str, Dict[str, Any]]):
+        """Resume nodes from saved state as they are created (call before subscribing)"""
+        self._pending_snapshots = dict(states)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sources": len(self.sources),
+            "nodes": sum(len(source.order) for source in self.sources.values()),
+            "strategies": len(self.subscriptions),
+            "node_updates": self.node_updates
+        }
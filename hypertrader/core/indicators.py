@@ -0,0 +1,50 @@
+"""
+Vectorized technical indicators, shared with the backend.
+
+The library lives in backend/indicators.py and this module re-exports it, so
+the API and the desktop app compute the same values from one source. The
+file is loaded by path rather than by putting backend/ on sys.path, where its
+models module would shadow the desktop app's models package; it only
+depends on NumPy.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+_PATH = Path(__file__).resolve().parents[2] / "backend" / "indicators.py"
+_NAME = "hypertrader_shared_indicators"
+
+_module = sys.modules.get(_NAME)
+if _module is None:
+    _spec = importlib.util.spec_from_file_location(_NAME, _PATH)
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules[_NAME] = _module
+    _spec.loader.exec_module(_module)
+
+Series = _module.Series
+Result = _module.Result
+ZERO_STD_RELATIVE = _module.ZERO_STD_RELATIVE
+
+rolling_mean = _module.rolling_mean
+rolling_std = _module.rolling_std
+rolling_max = _module.rolling_max
+rolling_min = _module.rolling_min
+ewm = _module.ewm
+sma = _module.sma
+ema = _module.ema
+wilder = _module.wilder
+rsi = _module.rsi
+macd = _module.macd
+bollinger = _module.bollinger
+true_range = _module.true_range
+atr = _module.atr
+vwap = _module.vwap
+zscore = _module.zscore
+
+INDICATORS = _module.INDICATORS
+DEFAULT_INDICATORS = _module.DEFAULT_INDICATORS
+parse_spec = _module.parse_spec
+compute = _module.compute
+compute_many = _module.compute_many
+to_json_series = _module.to_json_series
@@ -0,0 +1,162 @@
+"""
+Monte Carlo robustness of trade results
+
+A backtest or live record is one ordering of its trades. Resampling the
+trade sequence shows the range of outcomes the same edge could have
+produced: each path draws trades with replacement (or blocks of consecutive
+trades, which keeps streaks and volatility clusters), and the paths give
+confidence intervals for total return and max drawdown and a risk of ruin.
+
+By default trades compound: each trade's PnL becomes a return on the equity
+before it, and paths are sums of log returns, so drawdowns come from running
+maxima of the log-equity curve. With compounding off, PnL is added in
+dollars. All paths are evaluated as (paths x trades) arrays in chunks.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from core.backtester import BacktestResult, DEFAULT_INITIAL_EQUITY
+
+DEFAULT_PATHS = 10000
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+# Equity at or below this fraction of the initial equity counts as ruin
+DEFAULT_RUIN_LEVEL = 0.5
+
+# Elements per (paths x trades) chunk, to bound memory
+_CHUNK_ELEMENTS = 4_000_000
+
+
+@dataclass
+class MonteCarloResult:
+    """Per-path outcomes of resampled trade sequences"""
+    total_return_percent: np.ndarray
+    max_drawdown_percent: np.ndarray
+    ruined: np.ndarray                  # Path touched the ruin level
+    observed_return_percent: float      # The original ordering
+    observed_drawdown_percent: float
+    trades: int
+    block_size: int
+    ruin_level: float
+
+    @property
+    def paths(self) -> int:
+        return len(self.total_return_percent)
+
+    @property
+    def risk_of_ruin(self) -> float:
+        return float(self.ruined.mean()) if self.paths else 0.0
+
+    @property
+    def probability_of_loss(self) -> float:
+        return float((self.total_return_percent < 0).mean()) if self.paths else 0.0
+
+    def intervals(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Dict[str, float]]:
+        """Percentiles of return and drawdown across paths"""
+        result = {}
+        for name, values in (("total_return_percent", self.total_return_percent),
+                             ("max_drawdown_percent", self.max_drawdown_percent)):
+            points = np.percentile(values, percentiles) if self.paths else np.zeros(len(percentiles))
+            result[name] = {f"p{p:g}": float(value) for p, value in zip(percentiles, points)}
+        return result
+
+    def to_dict(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict:
+        return {
+            "paths": self.paths,
+            "trades": self.trades,
+            "block_size": self.block_size,
+            "intervals": self.intervals(percentiles),
+            "risk_of_ruin": self.risk_of_ruin,
+            "ruin_level": self.ruin_level,
+            "probability_of_loss": self.probability_of_loss,
+            "observed_return_percent": self.observed_return_percent,
+            "observed_drawdown_percent": self.observed_drawdown_percent,
+            # Share of paths doing worse than the original ordering
+            "observed_return_rank": float((self.total_return_percent < self.observed_return_percent).mean())
+            if self.paths else 0.0,
+            "observed_drawdown_rank": float((self.max_drawdown_percent > self.observed_drawdown_percent).mean())
+            if self.paths else 0.0
+        }
+
+
+def monte_carlo(pnl: Union[Sequence[float], np.ndarray], initial_equity: float = DEFAULT_INITIAL_EQUITY,
+                paths: int = DEFAULT_PATHS, block_size: int = 1, compounding: bool = True,
+                ruin_level: float = DEFAULT_RUIN_LEVEL, seed: Optional[int] = None) -> MonteCarloResult:
+    """Bootstrap (block_size 1) or circular block bootstrap a trade PnL sequence"""
+    pnl = np.asarray(pnl, dtype=np.float64)
+    trades = len(pnl)
+    if initial_equity <= 0:
+        raise ValueError("initial_equity must be positive")
+    block_size = max(1, min(block_size, trades or 1))
+
+    if compounding:
+        equity_before = initial_equity + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.where(equity_before > 0, pnl / equity_before, -1.0)
+        # A trade losing the whole account ends the path at zero (log equity -inf)
+        with np.errstate(divide="ignore"):
+            steps = np.log1p(np.maximum(returns, -1.0))
+    else:
+        steps = pnl
+
+    observed = _path_stats(steps[None, :], initial_equity, compounding, ruin_level) if trades else ([0.0], [0.0], [False])
+    total_return = np.empty(paths)
+    drawdown = np.empty(paths)
+    ruined = np.empty(paths, dtype=bool)
+    if trades:
+        rng = np.random.default_rng(seed)
+        chunk = max(1, _CHUNK_ELEMENTS // trades)
+        for start in range(0, paths, chunk):
+            count = min(chunk, paths - start)
+            sampled = steps[_resample_indices(rng, trades, count, block_size)]
+            stats = _path_stats(sampled, initial_equity, compounding, ruin_level)
+            total_return[start:start + count], drawdown[start:start + count], ruined[start:start + count] = stats
+    else:
+        total_return[:] = drawdown[:] = 0.0
+        ruined[:] = False
+
+    return MonteCarloResult(
+        total_return_percent=total_return,
+        max_drawdown_percent=drawdown,
+        ruined=ruined,
+        observed_return_percent=float(observed[0][0]),
+        observed_drawdown_percent=float(observed[1][0]),
+        trades=trades,
+        block_size=block_size,
+        ruin_level=ruin_level
+    )
+
+
+def monte_carlo_backtest(result: BacktestResult, **kwargs) -> MonteCarloResult:
+    """Resample the trades of a backtest from its initial equity"""
+    kwargs.setdefault("initial_equity", result.initial_equity)
+    return monte_carlo(result.trades["pnl"], **kwargs)
+
+
+def _resample_indices(rng: np.random.Generator, trades: int, paths: int, block_size: int) -> np.ndarray:
+    """Trade indices for each path: independent draws, or consecutive runs wrapping at the end"""
+    if block_size == 1:
+        return rng.integers(0, trades, size=(paths, trades), dtype=np.int64)
+    blocks = -(-trades // block_size)
+    starts = rng.integers(0, trades, size=(paths, blocks, 1), dtype=np.int64)
+    indices = (starts + np.arange(block_size)) % trades
+    return indices.reshape(paths, blocks * block_size)[:, :trades]
+
+
+def _path_stats(steps: np.ndarray, initial_equity: float, compounding: bool, ruin_level: float):
+    """Total return %, max drawdown % and ruin of each row of per-trade steps"""
+    cumulative = np.cumsum(steps, axis=1)
+    peaks = np.maximum.accumulate(cumulative, axis=1)
+    np.maximum(peaks, 0.0, out=peaks)  # The starting equity is the first peak
+    if compounding:
+        # Log-equity: drawdown is 1 - exp(min(log equity - log peak))
+        drawdown = (1.0 - np.exp(np.min(cumulative - peaks, axis=1))) * 100.0
+        total_return = np.expm1(cumulative[:, -1]) * 100.0
+        ruined = cumulative.min(axis=1) <= np.log(ruin_level) if ruin_level > 0 else cumulative.min(axis=1) == -np.inf
+    else:
+        drawdown = np.max((peaks - cumulative) / (initial_equity + peaks), axis=1) * 100.0
+        total_return = cumulative[:, -1] / initial_equity * 100.0
+        ruined = cumulative.min(axis=1) <= (ruin_level - 1.0) * initial_equity
+    return total_return, drawdown, ruined
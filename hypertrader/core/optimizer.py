@@ -0,0 +1,358 @@
+"""
+Parallel parameter sweeps over the backtester
+
+A sweep backtests one base StrategyConfig with many parameter overrides
+(e.g. take_profit_percent, stop_loss_percent, trailing_stop_percent) across a
+process pool. The candle arrays, and the entry signal when it is not swept,
+are placed once in shared memory and every worker maps them as NumPy views,
+so tasks carry only parameter sets and return only metric rows.
+
+Search strategies:
+  grid_search    every combination of the listed values
+  random_search  independent samples from lists (choice) or (low, high) ranges
+  bayes_search   Tree-structured Parzen estimator: after a random start,
+                 each batch samples values that are likely under the best
+                 quarter of results and unlikely under the rest
+
+Results are ranked by any StrategyPerformance metric and can be saved as a
+compressed .npz of parameter and metric columns. search() runs the same
+searches serially in the calling process, for callers that parallelize at a
+coarser grain (see core.walk_forward).
+"""
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.backtester import backtest, entry_signals
+from models.strategy import StrategyConfig, StrategyPerformance
+
+# Metric columns returned for every parameter set (StrategyPerformance.to_dict without dates)
+METRICS = tuple(key for key in StrategyPerformance().to_dict() if key not in ("start_date", "end_date"))
+
+# Metrics where smaller is better
+ASCENDING_METRICS = {"max_drawdown", "max_drawdown_percent", "losing_trades", "loss_rate", "consecutive_losses"}
+
+# Parameters that change the entry signal, which is otherwise computed once
+SIGNAL_PARAMETERS = {"entry_signal", "indicators", "interval"}
+
+# A search dimension: a list of choices, or a (low, high) range (integer if both ends are)
+Dimension = Union[Sequence[Any], Tuple[float, float]]
+
+_CONFIG_FIELDS = {f.name for f in fields(StrategyConfig)}
+
+
+@dataclass
+class SweepResult:
+    """Metrics of every evaluated parameter set, in evaluation order"""
+    params: List[Dict[str, Any]]
+    metrics: Dict[str, np.ndarray]
+    metric: str = "sharpe_ratio"
+
+    def order(self, metric: Optional[str] = None) -> np.ndarray:
+        """Indices from best to worst by a metric (NaN last)"""
+        metric = metric or self.metric
+        values = self.metrics[metric]
+        keys = values if metric in ASCENDING_METRICS else -values
+        return np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")
+
+    def top(self, count: int = 10, metric: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Best parameter sets with their metrics"""
+        return [
+            {"params": self.params[i], **{name: float(values[i]) for name, values in self.metrics.items()}}
+            for i in self.order(metric)[:count]
+        ]
+
+    @property
+    def best(self) -> Dict[str, Any]:
+        return self.params[int(self.order()[0])] if self.params else {}
+
+    def save(self, path: str):
+        """Write parameter and metric columns to a compressed .npz"""
+        names = sorted({name for params in self.params for name in params})
+        columns = {f"param:{name}": np.array([params.get(name) for params in self.params]) for name in names}
+        columns.update({f"metric:{name}": values for name, values in self.metrics.items()})
+        np.savez_compressed(path, ranking_metric=np.array(self.metric), **columns)
+
+    @classmethod
+    def load(cls, path: str) -> "SweepResult":
+        with np.load(path, allow_pickle=False) as data:
+            names = [key[6:] for key in data.files if key.startswith("param:")]
+            columns = [data[f"param:{name}"].tolist() for name in names]
+            rows = len(columns[0]) if columns else 0
+            params = [{name: column[i] for name, column in zip(names, columns)} for i in range(rows)]
+            metrics = {key[7:]: data[key] for key in data.files if key.startswith("metric:")}
+            return cls(params, metrics, str(data["ranking_metric"]))
+
+
+class SweepRunner:
+    """Process pool with the candles (and the fixed entry signal) in shared memory"""
+
+    def __init__(self, config: StrategyConfig, candles: Dict[str, np.ndarray],
+                 workers: Optional[int] = None, signal_fixed: bool = True, **backtest_kwargs):
+        self.config = config
+        self.candles = candles
+        self.workers = workers or os.cpu_count() or 1
+        self.signal_fixed = signal_fixed
+        self.backtest_kwargs = backtest_kwargs
+        self._memory: Optional[shared_memory.SharedMemory] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "SweepRunner":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        columns = {name: np.ascontiguousarray(values) for name, values in self.candles.items()}
+        if self.signal_fixed:
+            columns["signal"] = entry_signals(self.config, columns)
+
+        # One block holding every column, 8-byte aligned
+        layout, size = [], 0
+        for name, values in columns.items():
+            layout.append((name, values.dtype.str, len(values), size))
+            size += -(-values.nbytes // 8) * 8
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 8))
+        for (name, dtype, length, offset), values in zip(layout, columns.values()):
+            np.ndarray(length, dtype=dtype, buffer=self._memory.buf, offset=offset)[:] = values
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self._memory.name, layout, self.config, self.backtest_kwargs)
+        )
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def run(self, param_sets: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Metric rows (columns in METRICS order) for each parameter set"""
+        if self._pool is None:
+            raise RuntimeError("SweepRunner is not started")
+        if not param_sets:
+            return np.empty((0, len(METRICS)))
+        # A few batches per worker balances load without per-task overhead
+        batch = max(1, math.ceil(len(param_sets) / (self.workers * 4)))
+        batches = [list(param_sets[i:i + batch]) for i in range(0, len(param_sets), batch)]
+        return np.vstack(list(self._pool.map(_run_batch, batches)))
+
+    def map(self, function, tasks: Sequence[Any]) -> List[Any]:
+        """Run a module-level function over tasks in the pool; it reads shared_columns()"""
+        if self._pool is None:
+            raise RuntimeError("SweepRunner is not started")
+        return list(self._pool.map(function, tasks))
+
+
+# Worker side
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(memory_name: str, layout, config: StrategyConfig, backtest_kwargs: Dict[str, Any]):
+    # Workers share the parent's resource tracker, which unlinks the block
+    # if the parent dies without closing the runner
+    memory = shared_memory.SharedMemory(name=memory_name)
+    columns = {
+        name: np.ndarray(length, dtype=dtype, buffer=memory.buf, offset=offset)
+        for name, dtype, length, offset in layout
+    }
+    _worker.update(memory=memory, columns=columns, config=config, kwargs=backtest_kwargs)
+
+
+def shared_columns() -> Dict[str, np.ndarray]:
+    """In a pool worker, the runner's columns mapped from shared memory"""
+    return _worker["columns"]
+
+
+def _run_batch(param_sets: List[Dict[str, Any]]) -> np.ndarray:
+    columns = _worker["columns"]
+    return evaluate(_worker["config"], columns, param_sets, columns.get("signal"), **_worker["kwargs"])
+
+
+def evaluate(config: StrategyConfig, candles: Dict[str, np.ndarray], param_sets: Sequence[Dict[str, Any]],
+             signal: Optional[np.ndarray] = None, **backtest_kwargs) -> np.ndarray:
+    """Metric rows (columns in METRICS order) for each parameter set, in this process"""
+    rows = np.empty((len(param_sets), len(METRICS)))
+    for row, params in enumerate(param_sets):
+        result = backtest(replace(config, **params), candles, signal=signal, **backtest_kwargs)
+        performance = result.performance.to_dict()
+        rows[row] = [performance[name] for name in METRICS]
+    return rows
+
+
+# Searches
+
+def grid_search(config: StrategyConfig, candles: Dict[str, np.ndarray], grid: Dict[str, Sequence[Any]],
+                metric: str = "sharpe_ratio", workers: Optional[int] = None, **backtest_kwargs) -> SweepResult:
+    """Backtest every combination of the grid's values"""
+    names = list(grid)
+    param_sets = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    return sweep(config, candles, param_sets, metric, workers, **backtest_kwargs)
+
+
+def random_search(config: StrategyConfig, candles: Dict[str, np.ndarray], space: Dict[str, Dimension],
+                  samples: int = 100, metric: str = "sharpe_ratio", workers: Optional[int] = None,
+                  seed: Optional[int] = None, **backtest_kwargs) -> SweepResult:
+    """Backtest independent random samples of the search space"""
+    rng = np.random.default_rng(seed)
+    param_sets = [_sample(space, rng) for _ in range(samples)]
+    return sweep(config, candles, param_sets, metric, workers, **backtest_kwargs)
+
+
+def bayes_search(config: StrategyConfig, candles: Dict[str, np.ndarray], space: Dict[str, Dimension],
+                 trials: int = 100, metric: str = "sharpe_ratio", workers: Optional[int] = None,
+                 seed: Optional[int] = None, initial: Optional[int] = None, gamma: float = 0.25,
+                 **backtest_kwargs) -> SweepResult:
+    """Tree-structured Parzen estimator search, one pool-sized batch at a time"""
+    _check(config, space, metric)
+    workers = workers or os.cpu_count() or 1
+    with SweepRunner(config, candles, workers, signal_fixed=not SIGNAL_PARAMETERS & set(space),
+                     **backtest_kwargs) as runner:
+        return _tpe(space, trials, metric, runner.run, workers, np.random.default_rng(seed), initial, gamma)
+
+
+def search(config: StrategyConfig, candles: Dict[str, np.ndarray], space: Dict[str, Any],
+           method: str = "grid", trials: int = 100, metric: str = "sharpe_ratio",
+           seed: Optional[int] = None, signal: Optional[np.ndarray] = None,
+           **backtest_kwargs) -> SweepResult:
+    """Serial grid, random or bayes search in this process (space is the grid for 'grid')"""
+    _check(config, space, metric)
+    rng = np.random.default_rng(seed)
+    run = lambda batch: evaluate(config, candles, batch, signal, **backtest_kwargs)
+    if method == "grid":
+        names = list(space)
+        param_sets = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    elif method == "random":
+        param_sets = [_sample(space, rng) for _ in range(trials)]
+    elif method == "bayes":
+        return _tpe(space, trials, metric, run, 1, rng)
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+    return _result(param_sets, run(param_sets), metric)
+
+
+def _tpe(space: Dict[str, Dimension], trials: int, metric: str, run, batch_size: int,
+         rng: np.random.Generator, initial: Optional[int] = None, gamma: float = 0.25) -> SweepResult:
+    """Random start, then batches proposed from the results so far"""
+    initial = initial or max(batch_size, min(trials, 10))
+    sign = 1.0 if metric in ASCENDING_METRICS else -1.0  # Minimized score
+
+    param_sets: List[Dict[str, Any]] = []
+    rows: List[np.ndarray] = []
+    while len(param_sets) < trials:
+        count = min(batch_size if param_sets else initial, trials - len(param_sets))
+        if len(param_sets) < initial:
+            batch = [_sample(space, rng) for _ in range(count)]
+        else:
+            scores = np.vstack(rows)[:, METRICS.index(metric)] * sign
+            batch = [_propose(space, param_sets, scores, gamma, rng) for _ in range(count)]
+        rows.append(run(batch))
+        param_sets.extend(batch)
+
+    return _result(param_sets, np.vstack(rows), metric)
+
+
+def sweep(config: StrategyConfig, candles: Dict[str, np.ndarray], param_sets: Sequence[Dict[str, Any]],
+          metric: str = "sharpe_ratio", workers: Optional[int] = None, **backtest_kwargs) -> SweepResult:
+    """Backtest a list of parameter overrides in parallel"""
+    names = {name for params in param_sets for name in params}
+    _check(config, dict.fromkeys(names), metric)
+    with SweepRunner(config, candles, workers, signal_fixed=not SIGNAL_PARAMETERS & names,
+                     **backtest_kwargs) as runner:
+        rows = runner.run(param_sets)
+    return _result(list(param_sets), rows, metric)
+
+
+def _check(config: StrategyConfig, space: Dict[str, Any], metric: str):
+    unknown = set(space) - _CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {', '.join(sorted(unknown))}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+
+
+def _result(param_sets: List[Dict[str, Any]], rows: np.ndarray, metric: str) -> SweepResult:
+    rows = rows.reshape(len(param_sets), len(METRICS))
+    return SweepResult(param_sets, {name: rows[:, i] for i, name in enumerate(METRICS)}, metric)
+
+
+def _is_range(dimension: Dimension) -> bool:
+    return (isinstance(dimension, tuple) and len(dimension) == 2
+            and all(isinstance(end, (int, float)) and not isinstance(end, bool) for end in dimension))
+
+
+def _sample(space: Dict[str, Dimension], rng: np.random.Generator) -> Dict[str, Any]:
+    params = {}
+    for name, dimension in space.items():
+        if _is_range(dimension):
+            low, high = dimension
+            if isinstance(low, int) and isinstance(high, int):
+                params[name] = int(rng.integers(low, high + 1))
+            else:
+                params[name] = float(rng.uniform(low, high))
+        else:
+            params[name] = dimension[int(rng.integers(len(dimension)))]
+    return params
+
+
+def _propose(space: Dict[str, Dimension], param_sets: List[Dict[str, Any]], scores: np.ndarray,
+             gamma: float, rng: np.random.Generator, candidates: int = 24) -> Dict[str, Any]:
+    """Pick, per parameter, the candidate maximizing l(x) / g(x) over good and bad results"""
+    ranked = np.argsort(np.where(np.isnan(scores), np.inf, scores), kind="stable")
+    cut = max(1, int(math.ceil(gamma * len(ranked))))
+    good, bad = ranked[:cut], ranked[cut:]
+
+    params = {}
+    for name, dimension in space.items():
+        values = [param_sets[i][name] for i in range(len(param_sets))]
+        if _is_range(dimension):
+            low, high = (float(end) for end in dimension)
+            observed = np.array(values, dtype=np.float64)
+            good_values, bad_values = observed[good], observed[bad]
+            width = max(high - low, 1e-12)
+            bandwidth = width * max(len(good_values), 1) ** -0.2 / 2
+            draws = np.clip(rng.choice(good_values, candidates) + rng.normal(0, bandwidth, candidates), low, high)
+            if all(isinstance(end, int) for end in dimension):
+                draws = np.round(draws)
+            ratio = _parzen(draws, good_values, bandwidth, width) / _parzen(draws, bad_values, bandwidth, width)
+            best = draws[int(np.argmax(ratio))]
+            params[name] = int(best) if all(isinstance(end, int) for end in dimension) else float(best)
+        else:
+            choices = list(dimension)
+            index = {repr(choice): i for i, choice in enumerate(choices)}
+            counts_good = np.ones(len(choices))
+            counts_bad = np.ones(len(choices))
+            for i in good:
+                counts_good[index[repr(values[i])]] += 1
+            for i in bad:
+                counts_bad[index[repr(values[i])]] += 1
+            likely = counts_good / counts_good.sum()
+            draws = rng.choice(len(choices), candidates, p=likely)
+            ratio = likely[draws] / (counts_bad / counts_bad.sum())[draws]
+            params[name] = choices[int(draws[int(np.argmax(ratio))])]
+    return params
+
+
+def _parzen(x: np.ndarray, centers: np.ndarray, bandwidth: float, width: float) -> np.ndarray:
+    """Gaussian kernel density over the centers, mixed with a uniform prior"""
+    density = np.full(len(x), 1.0 / width)
+    if len(centers):
+        z = (x[:, None] - centers[None, :]) / bandwidth
+        kernels = np.exp(-0.5 * z * z).sum(axis=1) / (bandwidth * math.sqrt(2 * math.pi))
+        density = (kernels + density) / (len(centers) + 1)
+    return density
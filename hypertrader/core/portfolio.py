@@ -0,0 +1,442 @@
+"""
+Portfolio backtests: many strategies on one account
+
+Live, every strategy trades through one account: they share its equity and
+margin, orders on the same coin offset each other, and the engine's daily
+loss limit and order size limit apply to all of them. This module backtests
+a set of strategies that way, in one time-ordered pass over candles aligned
+on a common grid.
+
+Each strategy's own rules (signals, stops, targets, trailing stops,
+duration) follow core.backtester. On top of that:
+
+  Shared equity    Sizes are computed from the account's marked-to-market equity.
+  Shared margin    A new position needs the account's margin after the order
+                   to stay within its equity. Margin is charged on each coin's
+                   net position at the lowest leverage among the strategies
+                   trading that coin. If equity falls below
+                   MAINTENANCE_MARGIN_RATIO of that margin, every position is
+                   closed.
+  Netting          Orders filled together on a coin (at the same open or close)
+                   cross internally. Only the net quantity reaches the exchange,
+                   so fees and slippage scale with net over gross quantity.
+  Account limits   daily_loss_limit (USD of realized loss per UTC day) blocks
+                   new entries until the next day; max_order_value (USD)
+                   rejects larger orders, like TradingEngine._check_risk_limits.
+
+The pass steps through fill events (entries and exits) rather than bars, so it
+costs about the same as running the strategies separately while capturing
+their interaction. Account checks run at fills. Aligned candles can be saved
+and memory-mapped, so repeated runs and processes share one copy.
+"""
+
+import heapq
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.backtester import (
+    DAY_MS, DEFAULT_FEE_RATE, DEFAULT_INITIAL_EQUITY, DEFAULT_SLIPPAGE,
+    DURATION, END, EXIT_REASONS, LIQUIDATION, SIGNAL, STOP_LOSS, TAKE_PROFIT,
+    entry_signals, find_exit, performance_from, position_size, within_trading_hours
+)
+from models.strategy import Strategy, StrategyPerformance
+
+# Maintenance margin as a share of the initial margin
+MAINTENANCE_MARGIN_RATIO = 0.5
+
+# When in a bar an order fills; orders at the open or close of a bar net together
+AT_OPEN, INTRABAR, AT_CLOSE = 0, 1, 2
+
+_CANDLE_COLUMNS = ("o", "h", "l", "c", "v")
+
+
+@dataclass
+class AlignedCandles:
+    """Candles of several coins on one time grid: one row per coin, one column per bar.
+
+    A coin's missing bars (and bars before its first) are flat at its last
+    close with zero volume; present marks its real bars.
+    """
+    t: np.ndarray
+    coins: List[str]
+    o: np.ndarray
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+    v: np.ndarray
+    present: np.ndarray
+
+    def coin_candles(self, coin: str) -> Dict[str, np.ndarray]:
+        """A coin's real bars as regular candle columns"""
+        row = self.coins.index(coin)
+        present = self.present[row].astype(bool)
+        columns = {"t": self.t[present]}
+        columns.update({name: getattr(self, name)[row][present] for name in _CANDLE_COLUMNS})
+        return columns
+
+    def save(self, directory: str):
+        """Write as .npy files that load() memory-maps"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("t", "present") + _CANDLE_COLUMNS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        (path / "coins.json").write_text(json.dumps(self.coins))
+
+    @classmethod
+    def load(cls, directory: str) -> "AlignedCandles":
+        """Memory-map saved candles read-only; processes share the pages"""
+        path = Path(directory)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ("t", "present") + _CANDLE_COLUMNS}
+        return cls(coins=json.loads((path / "coins.json").read_text()), **arrays)
+
+
+def align_candles(candles_by_coin: Dict[str, Dict[str, np.ndarray]]) -> AlignedCandles:
+    """Put each coin's candles on the union of their open times"""
+    coins = list(candles_by_coin)
+    t = np.unique(np.concatenate([np.asarray(candles_by_coin[coin]["t"], dtype=np.int64) for coin in coins]))
+    bars = len(t)
+    present = np.zeros((len(coins), bars), dtype=np.uint8)
+    rows = {name: np.empty((len(coins), bars)) for name in _CANDLE_COLUMNS}
+
+    for row, coin in enumerate(coins):
+        candles = candles_by_coin[coin]
+        if not len(candles["t"]):
+            for name in _CANDLE_COLUMNS:
+                rows[name][row] = 0.0
+            continue
+        present[row, np.searchsorted(t, np.asarray(candles["t"], dtype=np.int64))] = 1
+        # Index of the coin's latest real bar at each grid bar (-1 before the first)
+        latest = np.cumsum(present[row]) - 1
+        real = present[row].astype(bool)
+        flat = np.where(latest >= 0, np.asarray(candles["c"])[np.maximum(latest, 0)], candles["o"][0])
+        for name in ("o", "h", "l", "c"):
+            rows[name][row] = np.where(real, np.asarray(candles[name])[np.maximum(latest, 0)], flat)
+        rows["v"][row] = np.where(real, np.asarray(candles["v"])[np.maximum(latest, 0)], 0.0)
+
+    return AlignedCandles(t=t, coins=coins, present=present, **rows)
+
+
+@dataclass
+class PortfolioResult:
+    """Outcome of a portfolio backtest"""
+    performance: StrategyPerformance               # The account
+    strategies: Dict[str, StrategyPerformance]     # Each strategy's contribution
+    # Parallel arrays as in BacktestResult, plus strategy and coin indices
+    # into strategy_ids and coins
+    trades: Dict[str, np.ndarray]
+    strategy_ids: List[str]
+    coins: List[str]
+    equity: np.ndarray
+    initial_equity: float
+    rejected: Dict[str, int]       # Entries refused, by limit
+    netted_notional: float = 0.0   # Order value crossed internally instead of on the exchange
+    halted: bool = False           # Account liquidated or wiped out
+
+    def to_dict(self) -> Dict:
+        return {
+            "performance": self.performance.to_dict(),
+            "strategies": {sid: performance.to_dict() for sid, performance in self.strategies.items()},
+            "trades": {name: values.tolist() for name, values in self.trades.items()},
+            "strategy_ids": self.strategy_ids,
+            "coins": self.coins,
+            "exit_reasons": list(EXIT_REASONS),
+            "final_equity": float(self.equity[-1]) if len(self.equity) else self.initial_equity,
+            "rejected": self.rejected,
+            "netted_notional": self.netted_notional,
+            "halted": self.halted
+        }
+
+
+class _Plan:
+    """A strategy's precomputed entries and exit rules on the grid"""
+
+    def __init__(self, strategy: Strategy, row: int, data: AlignedCandles, signal: np.ndarray):
+        config = strategy.config
+        self.config = config
+        self.row = row
+        # The coin's own bars on the grid: a signal at one bar's close enters at the next bar's open
+        bars = np.flatnonzero(data.present[row])
+        fired = np.flatnonzero(signal[:-1] != 0)
+        entries = bars[fired + 1]
+        keep = within_trading_hours(data.t[entries], config)
+        self.entry_bars = entries[keep]
+        self.entry_sides = signal[fired][keep].astype(np.int64)
+        self.signal_bars = {side: bars[np.flatnonzero(signal[:-1] == side) + 1] for side in (1, -1)}
+
+        self.stop_loss = config.stop_loss_percent / 100.0 if config.stop_loss_enabled else 0.0
+        self.take_profit = config.take_profit_percent / 100.0 if config.take_profit_enabled else 0.0
+        self.trail = config.trailing_stop_percent / 100.0 if config.trailing_stop_enabled else 0.0
+        self.max_ms = config.max_trade_duration * 60_000 if config.max_trade_duration else 0
+
+    def next_entry(self, bar: int) -> int:
+        return int(np.searchsorted(self.entry_bars, bar))
+
+
+def portfolio_backtest(strategies: Sequence[Strategy],
+                       candles: Union[AlignedCandles, Dict[str, Dict[str, np.ndarray]]],
+                       initial_equity: float = DEFAULT_INITIAL_EQUITY,
+                       fee_rate: float = DEFAULT_FEE_RATE,
+                       slippage: float = DEFAULT_SLIPPAGE,
+                       daily_loss_limit: Optional[float] = None,
+                       max_order_value: Optional[float] = None) -> PortfolioResult:
+    """Backtest strategies together on one account; candles by coin or already aligned"""
+    data = candles if isinstance(candles, AlignedCandles) else align_candles(candles)
+    t = np.asarray(data.t)
+    bars = len(t)
+    strategy_ids = [strategy.strategy_id for strategy in strategies]
+    rows = {coin: row for row, coin in enumerate(data.coins)}
+    missing = {strategy.coin for strategy in strategies} - set(rows)
+    if missing:
+        raise ValueError(f"No candles for {', '.join(sorted(missing))}")
+    if bars < 2:
+        raise ValueError("Need at least two bars")
+    bar_ms = int(np.median(np.diff(t)))
+
+    # Signals are computed once per coin and signal, however many strategies share them
+    signals: Dict[Tuple[str, str], np.ndarray] = {}
+    plans = []
+    for strategy in strategies:
+        key = (strategy.coin, strategy.config.entry_signal)
+        if key not in signals:
+            signals[key] = entry_signals(strategy.config, data.coin_candles(strategy.coin))
+        plans.append(_Plan(strategy, rows[strategy.coin], data, signals[key]))
+
+    # Margin per coin at the most conservative leverage trading it
+    leverage = np.full(len(data.coins), np.inf)
+    for plan in plans:
+        leverage[plan.row] = min(leverage[plan.row], max(plan.config.leverage, 1e-9))
+
+    sides: Dict[Tuple[int, int], Tuple[np.ndarray, ...]] = {}
+
+    def side_prices(row: int, side: int):
+        """Open, high, low, close seen from a side (a short is a long on negated prices)"""
+        if (row, side) not in sides:
+            o, h, l, c = (np.asarray(getattr(data, name)[row]) for name in ("o", "h", "l", "c"))
+            sides[(row, side)] = (o, h, l, c) if side == 1 else (-o, -l, -h, -c)
+        return sides[(row, side)]
+
+    cash = initial_equity               # Initial equity plus realized PnL
+    positions: Dict[int, list] = {}     # strategy -> [side, size, entry price, entry fee, entry bar]
+    pending_exits: Dict[int, Tuple[int, float]] = {}  # strategy -> (reason, exit price in side space)
+    net = np.zeros(len(data.coins))     # Net coin quantity across strategies
+    trades: List[Tuple] = []
+    rejected = {"margin": 0, "order_value": 0, "daily_loss": 0}
+    netted_notional = 0.0
+    day_pnl: Dict[int, float] = {}
+    blocked_until = 0
+    halted = False
+
+    events: List[Tuple[int, int, int]] = []  # (bar, phase, strategy)
+    for index, plan in enumerate(plans):
+        if len(plan.entry_bars):
+            heapq.heappush(events, (int(plan.entry_bars[0]), AT_OPEN, index))
+
+    def schedule_entry(index: int, bar: int):
+        plan = plans[index]
+        k = plan.next_entry(bar)
+        if k < len(plan.entry_bars):
+            heapq.heappush(events, (int(plan.entry_bars[k]), AT_OPEN, index))
+
+    def marks(bar: int, phase: int) -> np.ndarray:
+        return np.asarray((data.o if phase == AT_OPEN else data.c)[:, bar])
+
+    def account(prices: np.ndarray) -> Tuple[float, float]:
+        """Marked-to-market equity and margin used"""
+        equity = cash
+        for index, (side, size, entry_price, entry_fee, _) in positions.items():
+            equity += side * size * (prices[plans[index].row] - entry_price) - entry_fee
+        margin = float(np.sum(np.abs(net) * prices / leverage))
+        return equity, margin
+
+    def close_position(index: int, bar: int, price: float, fee: float, reason: int):
+        nonlocal cash
+        side, size, entry_price, entry_fee, entry_bar = positions.pop(index)
+        pnl = side * size * (price - entry_price) - entry_fee - fee
+        cash += pnl
+        net[plans[index].row] -= side * size
+        day = int(t[bar]) // DAY_MS
+        day_pnl[day] = day_pnl.get(day, 0.0) + pnl
+        trades.append((index, plans[index].row, entry_bar, bar, side, size, entry_price, price,
+                       pnl, entry_fee + fee, reason, entry_fee))
+
+    def open_position(index: int, bar: int, side: int, size: float, price: float, fee: float):
+        plan = plans[index]
+        positions[index] = [side, size, price, fee, bar]
+        net[plan.row] += side * size
+
+        o, h, l, c = side_prices(plan.row, side)
+        entry = side * price
+        stop = entry - plan.stop_loss * abs(entry) if plan.stop_loss else -np.inf
+        target = entry + plan.take_profit * abs(entry) if plan.take_profit else np.inf
+        last, forced = bars - 1, END
+        opposite = plan.signal_bars[-side]
+        k = np.searchsorted(opposite, bar + 1)
+        if k < len(opposite):
+            last, forced = int(opposite[k]), SIGNAL
+        if plan.max_ms:
+            limit = int(np.searchsorted(t, t[bar] + plan.max_ms)) - 1
+            if limit < last:
+                last, forced = max(limit, bar), DURATION
+
+        # A signal exit fills at the open of its bar, so only the bars before it can stop out
+        scan_last = last - 1 if forced == SIGNAL else last
+        exit_bar, exit_price, reason = find_exit(o, h, l, bar, scan_last, entry, stop, STOP_LOSS, target, plan.trail)
+        if exit_bar is None:
+            exit_bar, reason = last, forced
+            exit_price = o[last] if reason == SIGNAL else c[last]
+        phase = AT_OPEN if reason == SIGNAL else AT_CLOSE if reason in (DURATION, END) else INTRABAR
+        pending_exits[index] = (reason, float(exit_price))
+        heapq.heappush(events, (exit_bar, phase, index))
+
+    while events and not halted:
+        bar, phase, _ = events[0]
+        batch = []
+        while events and events[0][:2] == (bar, phase):
+            batch.append(heapq.heappop(events)[2])
+        prices = marks(bar, phase)
+
+        if phase == INTRABAR:
+            # Stops and targets are separate exchange orders at their own prices
+            for index in batch:
+                reason, side_price = pending_exits.pop(index)
+                side = positions[index][0]
+                price = side * side_price
+                if reason != TAKE_PROFIT:
+                    price -= side * slippage * abs(price)
+                close_position(index, bar, price, positions[index][1] * abs(price) * fee_rate, reason)
+                schedule_entry(index, bar + 1)
+        else:
+            exiting = [index for index in batch if index in positions]
+            entering = [index for index in batch if index not in positions]
+            orders = []  # (strategy, row, signed quantity, exit reason or None for entries)
+            for index in exiting:
+                side, size = positions[index][:2]
+                reason, _ = pending_exits.pop(index)
+                orders.append((index, plans[index].row, -side * size, reason))
+                if phase == AT_OPEN:
+                    # A signal exit frees the strategy to reverse on the same open
+                    plan = plans[index]
+                    k = plan.next_entry(bar)
+                    if k < len(plan.entry_bars) and plan.entry_bars[k] == bar:
+                        entering.append(index)
+                    else:
+                        schedule_entry(index, bar)
+                else:
+                    schedule_entry(index, bar + 1)
+
+            if entering:
+                equity, _ = account(prices)
+                pending_net = net.copy()
+                for index, _, quantity, _ in orders:
+                    pending_net[plans[index].row] += quantity
+                for index in entering:
+                    plan = plans[index]
+                    k = plan.next_entry(bar)
+                    side = int(plan.entry_sides[k])
+                    price = float(prices[plan.row])
+                    size = position_size(plan.config, equity, price, plan.stop_loss)
+                    refused = None
+                    if bar < blocked_until:
+                        refused = "daily_loss"
+                    elif size <= 0:
+                        refused = "margin"
+                    elif max_order_value and size * price > max_order_value:
+                        refused = "order_value"
+                    else:
+                        pending_net[plan.row] += side * size
+                        if np.sum(np.abs(pending_net) * prices / leverage) > equity:
+                            pending_net[plan.row] -= side * size
+                            refused = "margin"
+                    if refused:
+                        rejected[refused] += 1
+                        schedule_entry(index, blocked_until if refused == "daily_loss" else bar + 1)
+                    else:
+                        orders.append((index, plan.row, side * size, None))
+
+            # Orders on a coin cross internally; only the net quantity pays the exchange
+            gross = np.zeros(len(data.coins))
+            signed = np.zeros(len(data.coins))
+            for _, row, quantity, _ in orders:
+                gross[row] += abs(quantity)
+                signed[row] += quantity
+            with np.errstate(invalid="ignore", divide="ignore"):
+                exchange_share = np.where(gross > 0, np.abs(signed) / gross, 0.0)
+            netted_notional += float(np.sum((gross - np.abs(signed)) * prices))
+
+            for index, row, quantity, reason in orders:
+                base = float(prices[row])
+                price = base + np.sign(quantity) * slippage * abs(base) * exchange_share[row]
+                fee = abs(quantity) * abs(price) * fee_rate * exchange_share[row]
+                if reason is not None:
+                    close_position(index, bar, price, fee, reason)
+                else:
+                    open_position(index, bar, int(np.sign(quantity)), abs(quantity), price, fee)
+
+        # Account limits after the fills
+        day = int(t[bar]) // DAY_MS
+        if daily_loss_limit and -day_pnl.get(day, 0.0) >= daily_loss_limit:
+            blocked_until = max(blocked_until, int(np.searchsorted(t, (day + 1) * DAY_MS)))
+        equity, margin = account(marks(bar, AT_CLOSE))
+        if positions and (equity <= 0 or equity < MAINTENANCE_MARGIN_RATIO * margin):
+            close_prices = marks(bar, AT_CLOSE)
+            for index in list(positions):
+                side, size = positions[index][:2]
+                price = float(close_prices[plans[index].row])
+                price -= side * slippage * abs(price)
+                close_position(index, bar, price, size * abs(price) * fee_rate, LIQUIDATION)
+            halted = True
+        elif cash <= 0:
+            halted = True
+
+    return _result(plans, strategy_ids, data, trades, initial_equity, bar_ms, rejected, netted_notional, halted)
+
+
+def _result(plans: List[_Plan], strategy_ids: List[str], data: AlignedCandles, trades: List[Tuple],
+            initial_equity: float, bar_ms: int, rejected: Dict[str, int], netted_notional: float,
+            halted: bool) -> PortfolioResult:
+    t = np.asarray(data.t)
+
+    def equity_curve(selected: List[Tuple]) -> np.ndarray:
+        """Realized PnL plus open positions marked to each close"""
+        realized = np.zeros(len(t))
+        unrealized = np.zeros(len(t))
+        for _, row, entry, exit_bar, side, size, entry_price, _, pnl, _, _, entry_fee in selected:
+            realized[exit_bar] += pnl
+            if exit_bar > entry:
+                closes = data.c[row][entry:exit_bar]
+                unrealized[entry:exit_bar] += side * size * (closes - entry_price) - entry_fee
+        return initial_equity + np.cumsum(realized) + unrealized
+
+    trades.sort(key=lambda trade: (trade[3], trade[2]))
+    equity = equity_curve(trades)
+    performance = performance_from(np.array([trade[8] for trade in trades]), equity, t, initial_equity, bar_ms)
+
+    by_strategy: Dict[int, List[Tuple]] = {index: [] for index in range(len(plans))}
+    for trade in trades:
+        by_strategy[trade[0]].append(trade)
+    strategies = {
+        strategy_ids[index]: performance_from(
+            np.array([trade[8] for trade in selected]), equity_curve(selected), t, initial_equity, bar_ms
+        )
+        for index, selected in by_strategy.items()
+    }
+
+    if trades:
+        index, row, entry, exit_bar, side, size, entry_price, exit_price, pnl, fees, reason, _ = (
+            np.array(column) for column in zip(*trades)
+        )
+    else:
+        index = row = entry = exit_bar = side = reason = np.empty(0, dtype=np.int64)
+        size = entry_price = exit_price = pnl = fees = np.empty(0)
+    columns = {
+        "strategy": index.astype(np.uint32), "coin": row.astype(np.uint32),
+        "entry_time": t[entry], "exit_time": t[exit_bar], "side": side.astype(np.int8),
+        "size": size, "entry_price": entry_price, "exit_price": exit_price,
+        "pnl": pnl, "fees": fees, "reason": reason.astype(np.uint8)
+    }
+    return PortfolioResult(performance, strategies, columns, strategy_ids, list(data.coins), equity,
+                           initial_equity, rejected, netted_notional, halted)
@@ -0,0 +1,479 @@
+"""
+Entry signal expression compiler
+
+StrategyConfig.entry_signal is a small expression language over prices and
+indicators:
+
+    long: ema(close, 20) > ema(close, 50) and rsi(14) < 30; short: rsi(14) > 70
+
+Clauses are separated by ';' and optionally prefixed with 'long:' or 'short:'
+(long by default); the first clause that holds at a bar's close gives the
+direction. An expression is built from
+  - numbers and the price columns open, high, low, close, volume
+  - indicators from core.indicators as calls, e.g. sma(20), ema(close, 20),
+    ema(rsi(14), 5), atr(14), macd(12, 26, 9).hist, bbands(20, 2).upper. An
+    indicator of one series takes an optional source first (close by default);
+    the others read their OHLCV columns. Specs work too: rsi:14, macd:12:26:9.hist
+  - + - * /, comparisons < <= > >= == !=, and, or, not, parentheses, abs(x)
+  - cross_above(a, b) and cross_below(a, b): a crossed b at this bar
+
+A source is parsed once into a DAG where equal subexpressions are one node
+(ema(20), ema(close, 20) and ema:20 included; operands of + * == != and or are
+ordered, constants are folded), then evaluated two ways:
+  evaluate     computes each node once over whole arrays. Columns with one
+               row per coin evaluate the signal over a universe in one pass.
+  incremental  generates straight-line Python that updates each node once per
+               closed bar from streaming indicator state. Indicators on the
+               price columns can instead be read from the shared indicator
+               graph, leaving only derived series and crossings to the evaluator.
+Both follow the batch and streaming indicator conventions, so they agree bar
+for bar. Indicators of a derived series skip its leading NaN warm-up, like
+the batch functions.
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from core.indicator_graph import canonical_spec
+from core.indicators import INDICATORS, parse_spec
+from core.streaming_indicators import STREAMING_INDICATORS, NAN
+
+PRICE_COLUMNS = {"open": "o", "high": "h", "low": "l", "close": "c", "volume": "v"}
+# Outputs of indicators that return several series
+INDICATOR_OUTPUTS = {"macd": ("macd", "signal", "hist"), "bbands": ("mid", "upper", "lower")}
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<spec>[a-z_]\w*(?::\d+(?:\.\d+)?)+)
+  | (?P<number>\d+(?:\.\d+)?(?:e[+-]?\d+)?)
+  | (?P<name>[a-z_]\w*)
+  | (?P<op><=|>=|==|!=|[<>()+\-*/,.:])
+)""", re.VERBOSE)
+
+_COMPARISONS = {"<": "lt", "<=": "le", ">": "gt", ">=": "ge", "==": "eq", "!=": "ne"}
+_ARITHMETIC = {"+": "add", "-": "sub", "*": "mul", "/": "div"}
+# Operators whose operands can be swapped, so a + b and b + a are one node
+_COMMUTATIVE = {"add", "mul", "eq", "ne", "and", "or"}
+_KEYWORDS = {"and", "or", "not", "long", "short"}
+
+# Node type of each operator's result
+NUMBER, BOOL, MULTI = "number", "bool", "multi"
+
+_NUMPY = {
+    "add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.divide,
+    "lt": np.less, "le": np.less_equal, "gt": np.greater, "ge": np.greater_equal,
+    "eq": np.equal, "ne": np.not_equal, "and": np.logical_and, "or": np.logical_or
+}
+_PYTHON = {
+    "add": "{} + {}", "sub": "{} - {}", "mul": "{} * {}", "div": "_divide({}, {})",
+    "lt": "{} < {}", "le": "{} <= {}", "gt": "{} > {}", "ge": "{} >= {}",
+    "eq": "{} == {}", "ne": "{} != {}", "and": "{} and {}", "or": "{} or {}"
+}
+
+
+class SignalSyntaxError(ValueError):
+    """An entry signal that does not parse"""
+
+
+def _divide(a: float, b: float) -> float:
+    """a / b with NumPy's float semantics instead of ZeroDivisionError"""
+    if b:
+        return a / b
+    if a == 0.0 or a != a:
+        return NAN
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def _inputs(node: Tuple) -> List[int]:
+    """Indices of the nodes a node reads"""
+    if node[0] in ("const", "bool", "column"):
+        return []
+    if node[0] == "indicator":
+        return [] if node[2] is None else [node[2]]
+    if node[0] == "output":
+        return [node[1]]
+    return list(node[1:])
+
+
+def _output(value: Any, key: str) -> float:
+    return value[key] if isinstance(value, dict) else NAN
+
+
+class SignalProgram:
+    """A parsed entry signal: DAG nodes in evaluation order and (direction, node) clauses"""
+
+    def __init__(self, source: str):
+        self.source = source
+        # Each node is (op, *arguments); arguments are node indices or constants
+        self.nodes: List[Tuple] = []
+        self.types: List[str] = []
+        self._index: Dict[Tuple, int] = {}
+        self.clauses: List[Tuple[int, int]] = []
+
+        self._tokens: List[Tuple[str, str]] = []
+        self._position = 0
+        for clause in filter(None, (part.strip() for part in source.lower().split(";"))):
+            self._tokens = self._tokenize(clause)
+            self._position = 0
+            direction = 1
+            if self._peek(1) == ("op", ":") and self._peek()[1] in ("long", "short"):
+                direction = 1 if self._next()[1] == "long" else -1
+                self._next()
+            root = self._or()
+            if self._peek() is not None:
+                raise SignalSyntaxError(f"Unexpected '{self._peek()[1]}' in: {clause}")
+            if self.types[root] != BOOL:
+                raise SignalSyntaxError(f"Clause is not a condition: {clause}")
+            self.clauses.append((direction, root))
+
+        # Nodes the clauses depend on, in order (indicator parameters are dropped)
+        live = set()
+        for _, root in self.clauses:
+            stack = [root]
+            while stack:
+                i = stack.pop()
+                if i not in live:
+                    live.add(i)
+                    stack.extend(_inputs(self.nodes[i]))
+        self.order = sorted(live)
+
+    @property
+    def indicator_specs(self) -> List[str]:
+        """Canonical specs of the indicators read from the price columns"""
+        return [self.nodes[i][1] for i in self.order if self.nodes[i][0] == "indicator" and self.nodes[i][2] is None]
+
+    # Parsing
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if match is None or match.end() == position:
+                raise SignalSyntaxError(f"Unexpected '{text[position:].strip()[:10]}' in: {text}")
+            tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            position = match.end()
+        return tokens
+
+    def _peek(self, offset: int = 0) -> Optional[Tuple[str, str]]:
+        position = self._position + offset
+        return self._tokens[position] if position < len(self._tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise SignalSyntaxError("Unexpected end of signal")
+        self._position += 1
+        return token
+
+    def _accept(self, *values: str) -> Optional[str]:
+        token = self._peek()
+        if token is not None and token[0] in ("op", "name") and token[1] in values:
+            self._position += 1
+            return token[1]
+        return None
+
+    def _expect(self, value: str):
+        if self._accept(value) is None:
+            token = self._peek()
+            raise SignalSyntaxError(f"Expected '{value}'" + (f" before '{token[1]}'" if token else " at the end"))
+
+    def _or(self) -> int:
+        node = self._and()
+        while self._accept("or"):
+            node = self._node("or", node, self._and())
+        return node
+
+    def _and(self) -> int:
+        node = self._not()
+        while self._accept("and"):
+            node = self._node("and", node, self._not())
+        return node
+
+    def _not(self) -> int:
+        if self._accept("not"):
+            return self._node("not", self._not())
+        return self._comparison()
+
+    def _comparison(self) -> int:
+        node = self._sum()
+        op = self._accept(*_COMPARISONS)
+        if op:
+            node = self._node(_COMPARISONS[op], node, self._sum())
+        return node
+
+    def _sum(self) -> int:
+        node = self._term()
+        while True:
+            op = self._accept("+", "-")
+            if not op:
+                return node
+            node = self._node(_ARITHMETIC[op], node, self._term())
+
+    def _term(self) -> int:
+        node = self._unary()
+        while True:
+            op = self._accept("*", "/")
+            if not op:
+                return node
+            node = self._node(_ARITHMETIC[op], node, self._unary())
+
+    def _unary(self) -> int:
+        if self._accept("-"):
+            return self._node("neg", self._unary())
+        return self._postfix()
+
+    def _postfix(self) -> int:
+        node = self._primary()
+        if self._accept("."):
+            kind, key = self._next()
+            if self.types[node] != MULTI or kind != "name" or key not in INDICATOR_OUTPUTS[self.nodes[node][1].split(":")[0]]:
+                raise SignalSyntaxError(f"Unknown output .{key}")
+            node = self._node("output", node, key)
+        if self.types[node] == MULTI:
+            name = self.nodes[node][1].split(":")[0]
+            raise SignalSyntaxError(f"{name} needs an output: {', '.join('.' + key for key in INDICATOR_OUTPUTS[name])}")
+        return node
+
+    def _primary(self) -> int:
+        kind, value = self._next()
+        if kind == "number":
+            return self._node("const", float(value))
+        if kind == "spec":
+            return self._indicator(value, None)
+        if kind == "op" and value == "(":
+            node = self._or()
+            self._expect(")")
+            return node
+        if kind != "name" or value in _KEYWORDS:
+            raise SignalSyntaxError(f"Unexpected '{value}'")
+
+        if value in PRICE_COLUMNS:
+            return self._node("column", PRICE_COLUMNS[value])
+        arguments = self._arguments() if self._peek() == ("op", "(") else []
+        if value in ("cross_above", "cross_below"):
+            if len(arguments) != 2 or any(self.types[a] != NUMBER for a in arguments):
+                raise SignalSyntaxError(f"{value} takes two numbers")
+            return self._node(value, *arguments)
+        if value == "abs":
+            if len(arguments) != 1 or self.types[arguments[0]] != NUMBER:
+                raise SignalSyntaxError("abs takes one number")
+            return self._node("abs", arguments[0])
+        if value not in INDICATORS:
+            raise SignalSyntaxError(f"Unknown name: {value}")
+
+        # A leading non-constant argument of a one-series indicator is its source
+        source = None
+        if arguments and self.nodes[arguments[0]][0] != "const" and INDICATORS[value][1] == ("c",):
+            source, *arguments = arguments
+            if self.types[source] != NUMBER:
+                raise SignalSyntaxError(f"The source of {value} must be a number")
+            if self.nodes[source] == ("column", "c"):
+                source = None
+        if any(self.nodes[a][0] != "const" for a in arguments):
+            raise SignalSyntaxError(f"Parameters of {value} must be numbers")
+        spec = ":".join([value, *(f"{self.nodes[a][1]:g}" for a in arguments)])
+        return self._indicator(spec, source)
+
+    def _arguments(self) -> List[int]:
+        self._expect("(")
+        arguments = []
+        if not self._accept(")"):
+            arguments.append(self._or())
+            while self._accept(","):
+                arguments.append(self._or())
+            self._expect(")")
+        return arguments
+
+    def _indicator(self, spec: str, source: Optional[int]) -> int:
+        try:
+            spec = canonical_spec(spec)
+        except ValueError as e:
+            raise SignalSyntaxError(str(e))
+        return self._node("indicator", spec, source)
+
+    # Nodes
+
+    def _node(self, op: str, *arguments) -> int:
+        if op in _NUMPY or op in ("neg", "not", "abs"):
+            expected = BOOL if op in ("and", "or", "not") else NUMBER
+            if any(self.types[a] != expected for a in arguments):
+                raise SignalSyntaxError(f"'{op}' needs {'conditions' if expected == BOOL else 'numbers'}")
+            # Fold constants
+            if all(self.nodes[a][0] in ("const", "bool") for a in arguments):
+                values = [self.nodes[a][1] for a in arguments]
+                if op == "neg":
+                    return self._node("const", -values[0])
+                if op == "abs":
+                    return self._node("const", abs(values[0]))
+                if op == "not":
+                    return self._node("bool", not values[0])
+                with np.errstate(all="ignore"):
+                    result = _NUMPY[op](*values)
+                return self._node("bool", bool(result)) if result.dtype == bool else self._node("const", float(result))
+        if op in _COMMUTATIVE:
+            arguments = tuple(sorted(arguments))
+
+        key = (op, *arguments)
+        if key in self._index:
+            return self._index[key]
+        if op == "const":
+            node_type = NUMBER
+        elif op == "indicator":
+            node_type = MULTI if arguments[0].split(":")[0] in INDICATOR_OUTPUTS else NUMBER
+        elif op in _COMPARISONS.values() or op in ("bool", "and", "or", "not", "cross_above", "cross_below"):
+            node_type = BOOL
+        else:
+            node_type = NUMBER
+        self.nodes.append(key)
+        self.types.append(node_type)
+        self._index[key] = len(self.nodes) - 1
+        return len(self.nodes) - 1
+
+    # Vectorized evaluation
+
+    def evaluate(self, candles: Mapping[str, np.ndarray]) -> np.ndarray:
+        """Direction at each bar's close: +1 long, -1 short, 0 none.
+
+        Columns are 1-D, or 2-D with one row per coin (e.g. AlignedCandles),
+        evaluated in the same pass with indicators run along each row.
+        """
+        shape = np.shape(candles["c"])
+        values: List[Any] = [None] * len(self.nodes)
+        with np.errstate(all="ignore"):
+            for i in self.order:
+                values[i] = self._vector(self.nodes[i], values, candles)
+
+        signal = np.zeros(shape, dtype=np.int8)
+        for direction, root in self.clauses:
+            fires = np.broadcast_to(values[root], shape)
+            signal[(signal == 0) & fires] = direction
+        return signal
+
+    @staticmethod
+    def _vector(node: Tuple, values: List[Any], candles: Mapping[str, np.ndarray]) -> Any:
+        op = node[0]
+        if op in ("const", "bool"):
+            return node[1]
+        if op == "column":
+            return np.asarray(candles[node[1]], dtype=np.float64)
+        if op == "indicator":
+            name, params = parse_spec(node[1])
+            function, inputs, _ = INDICATORS[name]
+            series = [values[node[2]]] if node[2] is not None else [np.asarray(candles[c], dtype=np.float64) for c in inputs]
+            series = [np.broadcast_to(s, np.shape(candles["c"])) for s in series]
+            if series[0].ndim == 1:
+                return function(*series, *params)
+            rows = [function(*(s[row] for s in series), *params) for row in range(series[0].shape[0])]
+            if isinstance(rows[0], dict):
+                return {key: np.stack([r[key] for r in rows]) for key in rows[0]}
+            return np.stack(rows)
+        if op == "output":
+            return values[node[1]][node[2]]
+        if op == "neg":
+            return -values[node[1]]
+        if op == "abs":
+            return np.abs(values[node[1]])
+        if op == "not":
+            return np.logical_not(values[node[1]])
+        if op in ("cross_above", "cross_below"):
+            shape = np.shape(candles["c"])
+            a, b = (np.broadcast_to(values[i], shape) for i in node[1:])
+            previous_a, previous_b = _previous(a), _previous(b)
+            if op == "cross_above":
+                return (a > b) & (previous_a <= previous_b)
+            return (a < b) & (previous_a >= previous_b)
+        return _NUMPY[op](values[node[1]], values[node[2]])
+
+    # Incremental evaluation
+
+    def incremental(self, shared: bool = False) -> "IncrementalSignal":
+        """A per-bar evaluator; with shared, price-column indicators come from update()'s values"""
+        return IncrementalSignal(self, shared)
+
+    def __repr__(self) -> str:
+        return f"SignalProgram({self.source!r}, nodes={len(self.order)})"
+
+
+def _previous(x: np.ndarray) -> np.ndarray:
+    """x one bar later along the last axis (NaN at the first bar)"""
+    out = np.empty(x.shape)
+    out[..., 0] = np.nan
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+class IncrementalSignal:
+    """Streaming evaluator of a SignalProgram: update() once per closed bar"""
+
+    def __init__(self, program: SignalProgram, shared: bool = False):
+        self.program = program
+        self.shared = shared
+        self.state: List[Any] = []
+        lines = ["def update(bar, values, state):"]
+        for i in program.order:
+            lines.extend(self._statement(i, program.nodes[i]))
+        for direction, root in program.clauses:
+            lines.append(f"    if {self._ref(root)}: return {direction}")
+        lines.append("    return 0")
+        self.code = "\n".join(lines)
+        namespace = {"_divide": _divide, "_output": _output, "nan": NAN, "inf": math.inf}
+        exec(compile(self.code, f"<signal {program.source!r}>", "exec"), namespace)
+        self._update = namespace["update"]
+
+    def _state(self, value: Any) -> int:
+        self.state.append(value)
+        return len(self.state) - 1
+
+    def _ref(self, i: int) -> str:
+        """A node's value in generated code: its variable, or the constant itself"""
+        node = self.program.nodes[i]
+        return repr(node[1]) if node[0] in ("const", "bool") else f"v{i}"
+
+    def _statement(self, i: int, node: Tuple) -> List[str]:
+        op, target = node[0], f"    v{i} = "
+        ref = self._ref
+        if op in ("const", "bool"):
+            return []  # Inlined where used
+        if op == "column":
+            return [target + f"bar[{node[1]!r}]"]
+        if op == "indicator":
+            spec, source = node[1], node[2]
+            name, params = parse_spec(spec)
+            if source is None and self.shared:
+                return [target + f"values.get({spec!r}, nan)"]
+            k = self._state(STREAMING_INDICATORS[name](*params))
+            if source is None:
+                return [target + f"state[{k}].update_bar(bar)"]
+            # Derived series start with NaN; wait for the first value like the batch functions
+            return [target + f"state[{k}].update(v{source}) if v{source} == v{source} else state[{k}].value"]
+        if op == "output":
+            return [target + f"_output({ref(node[1])}, {node[2]!r})"]
+        if op == "neg":
+            return [target + f"-{ref(node[1])}"]
+        if op == "abs":
+            return [target + f"abs({ref(node[1])})"]
+        if op == "not":
+            return [target + f"not {ref(node[1])}"]
+        if op in ("cross_above", "cross_below"):
+            k = self._state([NAN, NAN])
+            a, b = ref(node[1]), ref(node[2])
+            condition = f"{a} > {b} and state[{k}][0] <= state[{k}][1]" if op == "cross_above" \
+                else f"{a} < {b} and state[{k}][0] >= state[{k}][1]"
+            return [target + condition, f"    state[{k}][0] = {a}", f"    state[{k}][1] = {b}"]
+        return [target + _PYTHON[op].format(ref(node[1]), ref(node[2]))]
+
+    def update(self, bar: Mapping[str, float], values: Optional[Mapping[str, Any]] = None) -> int:
+        """Direction at a closed bar (o/h/l/c/v); values maps canonical specs when shared"""
+        return self._update(bar, values or {}, self.state)
+
+
+@lru_cache(maxsize=256)
+def compile_signal(source: str) -> SignalProgram:
+    """Parse an entry signal once; programs are shared, so treat them as read-only"""
+    return SignalProgram(source)
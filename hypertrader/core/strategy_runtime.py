@@ -0,0 +1,396 @@
+"""
+Event-driven strategy runtime
+
+Strategies run on market events instead of a polling cycle. Each strategy
+subscribes to the closed bars of its coin and interval, where it reads its
+entry signal from the shared indicator values, and to the price ticks of its
+coin, where it manages the open position (stop loss, trailing stop, take
+profit, trade duration). Events go on one queue and a dispatcher thread hands
+each one to its subscribers as soon as it arrives, so a decision follows its
+tick by the run time of the handlers rather than by a loop interval.
+
+Signals leave the dispatcher on an order queue: an executor thread sends them
+through the engine's order checks and posts the outcome back as an event. A
+slow exchange call never holds up other strategies' ticks, and positions are
+only changed on the dispatcher thread. A strategy waits for its orders to come
+back before it signals again, and the orders of one decision (close, then
+reverse) stop at the first that fails. A rejected exit is retried on a later
+tick, backing off from EXIT_RETRY_MS up to EXIT_RETRY_MAX_MS.
+
+Every handler call is timed from the event's arrival against the strategy's
+latency_budget_ms; strategies with tighter budgets are served first and
+breaches are counted. An exception only affects its own strategy, which is
+paused after MAX_CONSECUTIVE_ERRORS failures in a row.
+
+Positions follow the backtester's rules: one at a time, an opposite signal
+closes and reverses it, entries only while active and inside trading hours.
+They are tracked from the strategy's accepted market orders at the price of
+the event that triggered them. Exits are managed for any strategy holding a
+position, so pausing a strategy stops new entries but keeps its stops.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from core.backtester import position_size, within_trading_hours
+from core.signal_compiler import compile_signal
+from models.order import Order, OrderSide
+from models.strategy import Strategy
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "8h": 28_800_000,
+    "12h": 43_200_000, "1d": 86_400_000
+}
+
+# A strategy is paused after this many failed events in a row
+MAX_CONSECUTIVE_ERRORS = 5
+
+# A rejected exit is retried after this long, doubling per rejection up to the maximum
+EXIT_RETRY_MS = 1000
+EXIT_RETRY_MAX_MS = 60_000
+
+# Event kinds on the runtime queue
+_BAR, _TICK, _FILLED, _STOP = range(4)
+
+
+@dataclass
+class Signal:
+    """An order a strategy wants, priced at the event that triggered it"""
+    strategy_id: str
+    coin: str
+    side: OrderSide
+    size: float
+    price: float
+    reason: str  # entry, signal, stop_loss, trailing_stop, take_profit or duration
+    reduce_only: bool = False
+
+
+class BarBuilder:
+    """Aggregates a price stream into bars of one interval (mid prices carry no volume)"""
+
+    def __init__(self, interval: str):
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unknown interval {interval}")
+        self.interval_ms = INTERVAL_MS[interval]
+        self.bar: Optional[Dict[str, float]] = None
+
+    def update(self, price: float, t_ms: int) -> Optional[Dict[str, float]]:
+        """Add a price; returns the previous bar once a price falls in a later one"""
+        start = t_ms - t_ms % self.interval_ms
+        closed = None
+        if self.bar is not None and start > self.bar["t"]:
+            closed, self.bar = self.bar, None
+        if self.bar is None:
+            self.bar = {"t": start, "o": price, "h": price, "l": price, "c": price, "v": 0.0}
+        else:
+            self.bar["h"] = max(self.bar["h"], price)
+            self.bar["l"] = min(self.bar["l"], price)
+            self.bar["c"] = price
+        return closed
+
+
+class LiveStrategy:
+    """Position and decisions of one running strategy"""
+
+    def __init__(self, strategy: Strategy):
+        self.strategy = strategy
+        config = strategy.config
+        # Price-column indicators come from the engine's shared graph
+        self.signal = compile_signal(config.entry_signal).incremental(shared=True)
+        self.budget_ns = int(config.latency_budget_ms * 1_000_000)
+        self.stop_loss = config.stop_loss_percent / 100.0 if config.stop_loss_enabled else 0.0
+        self.take_profit = config.take_profit_percent / 100.0 if config.take_profit_enabled else 0.0
+        self.trail = config.trailing_stop_percent / 100.0 if config.trailing_stop_enabled else 0.0
+        self.max_duration_ms = config.max_trade_duration * 60_000 if config.max_trade_duration else 0
+
+        # Position: side +1/-1 (0 flat), best price since entry for the trailing stop
+        self.side = 0
+        self.size = 0.0
+        self.entry_price = 0.0
+        self.entry_ms = 0
+        self.best = 0.0
+        self.pending = False  # Orders sent and not answered yet
+        self.exit_sent_ms = 0
+        self.exit_rejections = 0  # Exits rejected in a row, backing off the next one
+
+        # Health
+        self.events = 0
+        self.signals = 0
+        self.errors = 0
+        self.consecutive_errors: Dict[str, int] = {}  # By handler, so quiet ticks don't hide failing bars
+        self.over_budget = 0
+        self.latency_total_ns = 0
+        self.latency_max_ns = 0
+
+    @property
+    def strategy_id(self) -> str:
+        return self.strategy.strategy_id
+
+    def on_bar(self, bar: Mapping[str, float], values: Mapping[str, Any], now_ms: int, equity: float) -> List[Signal]:
+        # The signal sees every bar to keep its state, even while orders are out
+        direction = self.signal.update(bar, values)
+        if self.pending:
+            return []
+        price = bar["c"]
+        signals = []
+        reason = None
+        if self.side and direction == -self.side:
+            reason = "signal"
+        elif self.side and self.max_duration_ms and now_ms - self.entry_ms >= self.max_duration_ms:
+            reason = "duration"
+        if reason:
+            signals.append(self._close(price, reason))
+
+        if direction and (not self.side or reason == "signal") and self.strategy.is_active() \
+                and within_trading_hours(np.array([now_ms]), self.strategy.config)[0]:
+            size = position_size(self.strategy.config, equity, price, self.stop_loss)
+            if size > 0:
+                side = OrderSide.LONG if direction > 0 else OrderSide.SHORT
+                signals.append(Signal(self.strategy_id, self.strategy.coin, side, size, price, "entry"))
+        self.pending = bool(signals)
+        return signals
+
+    def on_tick(self, price: float, now_ms: int, equity: float) -> List[Signal]:
+        if not self.side or self.pending:
+            return []
+        move = self.side * (price - self.entry_price) / self.entry_price
+        reason = None
+        # Stops before the target, the trailing stop from the best price before this tick
+        if self.stop_loss and move <= -self.stop_loss:
+            reason = "stop_loss"
+        elif self.trail and self.side * (price - self.best) / self.best <= -self.trail:
+            reason = "trailing_stop"
+        elif self.take_profit and move >= self.take_profit:
+            reason = "take_profit"
+        elif self.max_duration_ms and now_ms - self.entry_ms >= self.max_duration_ms:
+            reason = "duration"
+        if self.side * (price - self.best) > 0:
+            self.best = price
+        if reason is None:
+            return []
+        if self.exit_rejections and \
+                now_ms - self.exit_sent_ms < min(EXIT_RETRY_MS << (self.exit_rejections - 1), EXIT_RETRY_MAX_MS):
+            return []
+        self.pending = True
+        self.exit_sent_ms = now_ms
+        return [self._close(price, reason)]
+
+    def on_filled(self, results: List[Tuple[Signal, Optional[Order]]], now_ms: int) -> List[float]:
+        """Apply the accepted orders of a decision; returns the PnL of closed positions"""
+        self.pending = False
+        closed = []
+        for signal, order in results:
+            if order is None:
+                if signal.reduce_only:
+                    self.exit_rejections += 1
+                break
+            if signal.reduce_only:
+                self.exit_rejections = 0
+                pnl = self.side * (signal.price - self.entry_price) * self.size
+                self.strategy.record_trade(pnl)
+                closed.append(pnl)
+                self.side, self.size = 0, 0.0
+            else:
+                self.side = 1 if signal.side == OrderSide.LONG else -1
+                self.size = signal.size
+                self.entry_price = self.best = signal.price
+                self.entry_ms = now_ms
+        return closed
+
+    def _close(self, price: float, reason: str) -> Signal:
+        side = OrderSide.SHORT if self.side > 0 else OrderSide.LONG
+        return Signal(self.strategy_id, self.strategy.coin, side, self.size, price, reason, reduce_only=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "signals": self.signals,
+            "errors": self.errors,
+            "over_budget": self.over_budget,
+            "latency_budget_us": self.budget_ns / 1000.0,
+            "mean_latency_us": self.latency_total_ns / self.events / 1000.0 if self.events else 0.0,
+            "max_latency_us": self.latency_max_ns / 1000.0,
+            "side": self.side,
+            "size": self.size,
+            "entry_price": self.entry_price
+        }
+
+
+class StrategyRuntime:
+    """Delivers bar and tick events to subscribed strategies on a dispatcher thread"""
+
+    def __init__(self, execute: Callable[[Signal], Optional[Order]],
+                 on_trade: Optional[Callable[[Strategy, float], None]] = None):
+        self.execute = execute
+        self.on_trade = on_trade
+        self.logger = logging.getLogger(__name__)
+
+        self.strategies: Dict[str, LiveStrategy] = {}
+        # Subscriber lists are replaced, never changed in place, so the dispatcher can read them unlocked
+        self.bar_subscribers: Dict[Tuple[str, str], List[LiveStrategy]] = {}
+        self.tick_subscribers: Dict[str, List[LiveStrategy]] = {}
+        self.lock = threading.Lock()
+
+        # Account equity for position sizing, refreshed by the engine
+        self.equity = 0.0
+
+        self.events: queue.SimpleQueue = queue.SimpleQueue()
+        self.orders: queue.SimpleQueue = queue.SimpleQueue()
+        self.is_running = False
+        self.dispatcher_thread = None
+        self.executor_thread = None
+        self.dispatched = 0
+
+    # Subscriptions
+
+    def add(self, strategy: Strategy):
+        """Subscribe a strategy to its coin's ticks and its interval's bars (replacing any earlier one)"""
+        live = LiveStrategy(strategy)
+        with self.lock:
+            self.strategies[strategy.strategy_id] = live
+            self._index()
+
+    def remove(self, strategy_id: str):
+        with self.lock:
+            if self.strategies.pop(strategy_id, None) is not None:
+                self._index()
+
+    def _index(self):
+        bars: Dict[Tuple[str, str], List[LiveStrategy]] = {}
+        ticks: Dict[str, List[LiveStrategy]] = {}
+        # Tightest latency budget first
+        for live in sorted(self.strategies.values(), key=lambda live: live.budget_ns):
+            bars.setdefault((live.strategy.coin, live.strategy.config.interval), []).append(live)
+            ticks.setdefault(live.strategy.coin, []).append(live)
+        self.bar_subscribers, self.tick_subscribers = bars, ticks
+
+    def coins(self) -> List[str]:
+        return list(self.tick_subscribers)
+
+    # Events
+
+    def publish_bar(self, coin: str, interval: str, bar: Mapping[str, float],
+                    values: Dict[str, Dict[str, Any]], t_ms: Optional[int] = None):
+        """Queue a closed bar with each subscribed strategy's indicator values"""
+        self.events.put((_BAR, (coin, interval), bar, values, t_ms or int(time.time() * 1000), time.perf_counter_ns()))
+
+    def publish_tick(self, coin: str, price: float, t_ms: Optional[int] = None):
+        self.events.put((_TICK, coin, price, t_ms or int(time.time() * 1000), time.perf_counter_ns()))
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        # Events left from an earlier run are stale, and signals still queued were never sent
+        self.events = queue.SimpleQueue()
+        self.orders = queue.SimpleQueue()
+        for live in self.strategies.values():
+            live.pending = False
+        self.dispatcher_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.executor_thread = threading.Thread(target=self._execute_loop, daemon=True)
+        self.dispatcher_thread.start()
+        self.executor_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running:
+            return
+        self.is_running = False
+        # Stop the executor first so the fills it posts are applied before the dispatcher stops
+        self.orders.put(None)
+        self.executor_thread.join(timeout=timeout)
+        self.events.put((_STOP,))
+        self.dispatcher_thread.join(timeout=timeout)
+
+    def _dispatch_loop(self):
+        while True:
+            event = self.events.get()
+            kind = event[0]
+            if kind == _STOP:
+                return
+            if kind == _FILLED:
+                self._filled(event[1])
+                continue
+
+            if kind == _BAR:
+                _, key, bar, values, t_ms, received = event
+                for live in self.bar_subscribers.get(key, ()):
+                    self._deliver(live, received, live.on_bar, bar, values.get(live.strategy_id, {}), t_ms, self.equity)
+            else:
+                _, coin, price, t_ms, received = event
+                for live in self.tick_subscribers.get(coin, ()):
+                    self._deliver(live, received, live.on_tick, price, t_ms, self.equity)
+            self.dispatched += 1
+
+    def _deliver(self, live: LiveStrategy, received: int, handler: Callable, *args):
+        """Run one strategy's handler, isolating its errors and timing it against its budget"""
+        name = handler.__name__
+        try:
+            signals = handler(*args)
+            live.consecutive_errors[name] = 0
+        except Exception as e:
+            live.errors += 1
+            failures = live.consecutive_errors[name] = live.consecutive_errors.get(name, 0) + 1
+            self.logger.error(f"Strategy {live.strategy.name} failed in {name}: {e}")
+            if failures >= MAX_CONSECUTIVE_ERRORS and live.strategy.is_active():
+                live.strategy.pause()
+                self.logger.error(f"Strategy {live.strategy.name} paused after {failures} errors in a row")
+            return
+
+        latency = time.perf_counter_ns() - received
+        live.events += 1
+        live.latency_total_ns += latency
+        live.latency_max_ns = max(live.latency_max_ns, latency)
+        if latency > live.budget_ns:
+            live.over_budget += 1
+            if live.over_budget == 1 or live.over_budget % 1000 == 0:
+                self.logger.warning(
+                    f"Strategy {live.strategy.name} took {latency / 1000:.0f}us, "
+                    f"over its {live.budget_ns / 1000:.0f}us budget ({live.over_budget} times)"
+                )
+        if signals:
+            live.signals += len(signals)
+            live.strategy.record_signal()
+            self.orders.put(signals)
+
+    def _execute_loop(self):
+        while True:
+            signals = self.orders.get()
+            if signals is None:
+                return
+            results = []
+            for signal in signals:
+                try:
+                    order = self.execute(signal)
+                except Exception as e:
+                    self.logger.error(f"Failed to execute {signal.reason} signal of {signal.strategy_id}: {e}")
+                    order = None
+                results.append((signal, order))
+                if order is None:
+                    break
+            self.events.put((_FILLED, results))
+
+    def _filled(self, results: List[Tuple[Signal, Optional[Order]]]):
+        live = self.strategies.get(results[0][0].strategy_id)
+        if live is None:
+            return
+        for pnl in live.on_filled(results, int(time.time() * 1000)):
+            if self.on_trade:
+                try:
+                    self.on_trade(live.strategy, pnl)
+                except Exception as e:
+                    self.logger.error(f"Error in trade callback: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "is_running": self.is_running,
+            "dispatched_events": self.dispatched,
+            "queued_events": self.events.qsize(),
+            "strategies": {strategy_id: live.stats() for strategy_id, live in self.strategies.items()}
+        }
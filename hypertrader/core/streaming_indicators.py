@@ -0,0 +1,425 @@
+"""
+Streaming technical indicators
+
+Constant-time updates per new bar for the live trading loop, so the cost of a
+tick does not grow with the length of the history. Each indicator follows the
+same conventions as the batch functions in core.indicators and produces the
+same values, to within floating-point rounding, when fed the same bars:
+
+  EMA / MACD        running exponential average seeded with the first n-value SMA
+  RSI / ATR         Wilder smoothing seeded with the first n-value mean
+  Bollinger/zscore  sliding-window mean and variance (Welford add/remove)
+  rolling max/min   monotonic deques
+
+Values are NaN until the indicator has seen enough bars. Every indicator can
+snapshot its state to a JSON-compatible dict and be restored from it, so a
+restart carries on where it stopped instead of replaying history.
+"""
+
+import math
+from collections import deque
+from typing import Any, Dict, Mapping, Tuple, Type, Union
+
+from core.indicators import parse_spec
+
+NAN = float("nan")
+
+# Sliding sums are recomputed from the window this often to cancel drift
+RECOMPUTE_EVERY = 1000
+
+# A standard deviation below this fraction of the mean is rounding noise (as in core.indicators)
+ZERO_STD_RELATIVE = 1e-12
+
+Value = Union[float, Dict[str, float]]
+
+
+class StreamingIndicator:
+    """Base class: update() takes the next bar's inputs and returns the current value"""
+
+    inputs: Tuple[str, ...] = ("c",)
+    _state: Tuple[str, ...] = ()
+
+    def __init__(self, *params):
+        self.params = params
+
+    def update(self, *values) -> Value:
+        raise NotImplementedError
+
+    def update_bar(self, bar: Mapping[str, float]) -> Value:
+        """Update from a bar mapping with o/h/l/c/v keys"""
+        return self.update(*(bar[key] for key in self.inputs))
+
+    @property
+    def value(self) -> Value:
+        raise NotImplementedError
+
+    @property
+    def ready(self) -> bool:
+        value = self.value
+        if isinstance(value, dict):
+            return not any(math.isnan(v) for v in value.values())
+        return not math.isnan(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-compatible state"""
+        state = {}
+        for name in self._state:
+            value = getattr(self, name)
+            if isinstance(value, StreamingIndicator):
+                value = value.snapshot()
+            elif isinstance(value, deque):
+                value = [list(item) if isinstance(item, tuple) else item for item in value]
+            state[name] = value
+        return {"type": type(self).__name__, "params": list(self.params), "state": state}
+
+    def restore(self, snapshot: Dict[str, Any]):
+        if snapshot.get("type") != type(self).__name__:
+            raise ValueError(f"Snapshot of {snapshot.get('type')} cannot restore {type(self).__name__}")
+        if tuple(snapshot.get("params", ())) != tuple(self.params):
+            raise ValueError(f"Snapshot parameters {snapshot.get('params')} do not match {list(self.params)}")
+        for name, value in snapshot["state"].items():
+            current = getattr(self, name)
+            if isinstance(current, StreamingIndicator):
+                current.restore(value)
+            elif isinstance(current, deque):
+                setattr(self, name, deque(
+                    (tuple(item) if isinstance(item, list) else item for item in value),
+                    maxlen=current.maxlen
+                ))
+            else:
+                setattr(self, name, value)
+        return self
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "StreamingIndicator":
+        indicator_class = INDICATOR_CLASSES_BY_TYPE[snapshot["type"]]
+        return indicator_class(*snapshot.get("params", ())).restore(snapshot)
+
+
+class ExponentialAverage(StreamingIndicator):
+    """y = (1 - alpha) * y + alpha * x, seeded with the mean of the first n values"""
+
+    _state = ("count", "seed_sum", "level")
+
+    def __init__(self, n: int, alpha: float):
+        super().__init__(n, alpha)
+        self.n = n
+        self.alpha = alpha
+        self.count = 0
+        self.seed_sum = 0.0
+        self.level = NAN
+
+    def update(self, x: float) -> float:
+        if self.count < self.n:
+            self.count += 1
+            self.seed_sum += x
+            if self.count == self.n:
+                self.level = self.seed_sum / self.n
+        else:
+            self.level = (1.0 - self.alpha) * self.level + self.alpha * x
+        return self.level
+
+    @property
+    def value(self) -> float:
+        return self.level
+
+
+class EMA(ExponentialAverage):
+    def __init__(self, n: int = 20):
+        super().__init__(n, 2.0 / (n + 1))
+        self.params = (n,)
+
+
+class Wilder(ExponentialAverage):
+    def __init__(self, n: int = 14):
+        super().__init__(n, 1.0 / n)
+        self.params = (n,)
+
+
+class RollingStats(StreamingIndicator):
+    """Sliding-window mean and population variance (Welford add/remove)"""
+
+    _state = ("window", "mean", "m2", "updates")
+
+    def __init__(self, n: int = 20):
+        super().__init__(n)
+        self.n = n
+        self.window = deque(maxlen=n)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+
+    def update(self, x: float) -> float:
+        if len(self.window) < self.n:
+            self.window.append(x)
+            delta = x - self.mean
+            self.mean += delta / len(self.window)
+            self.m2 += delta * (x - self.mean)
+        else:
+            oldest = self.window[0]
+            self.window.append(x)
+            mean = self.mean + (x - oldest) / self.n
+            self.m2 += (x - oldest) * (x - mean + oldest - self.mean)
+            self.mean = mean
+
+        self.updates += 1
+        if self.updates % RECOMPUTE_EVERY == 0:
+            self._recompute()
+        return self.value
+
+    def _recompute(self):
+        count = len(self.window)
+        self.mean = sum(self.window) / count
+        self.m2 = sum((x - self.mean) ** 2 for x in self.window)
+
+    @property
+    def full(self) -> bool:
+        return len(self.window) == self.n
+
+    @property
+    def variance(self) -> float:
+        if not self.full:
+            return NAN
+        variance = self.m2 / self.n
+        return 0.0 if variance <= (ZERO_STD_RELATIVE * self.mean) ** 2 else variance
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def value(self) -> float:
+        return self.std
+
+
+class SMA(StreamingIndicator):
+    _state = ("window", "total", "updates")
+
+    def __init__(self, n: int = 20):
+        super().__init__(n)
+        self.n = n
+        self.window = deque(maxlen=n)
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, x: float) -> float:
+        if len(self.window) == self.n:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        self.updates += 1
+        if self.updates % RECOMPUTE_EVERY == 0:
+            self.total = sum(self.window)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.total / self.n if len(self.window) == self.n else NAN
+
+
+class RollingMax(StreamingIndicator):
+    """Maximum of the last n values via a monotonic deque of (index, value)"""
+
+    _state = ("candidates", "index")
+
+    def __init__(self, n: int = 20):
+        super().__init__(n)
+        self.n = n
+        self.candidates = deque()
+        self.index = 0
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old
+
+    def update(self, x: float) -> float:
+        while self.candidates and self._dominates(x, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.index, x))
+        if self.candidates[0][0] <= self.index - self.n:
+            self.candidates.popleft()
+        self.index += 1
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.candidates[0][1] if self.index >= self.n else NAN
+
+
+class RollingMin(RollingMax):
+    def _dominates(self, new: float, old: float) -> bool:
+        return new <= old
+
+
+class RSI(StreamingIndicator):
+    _state = ("previous", "avg_gain", "avg_loss")
+
+    def __init__(self, n: int = 14):
+        super().__init__(n)
+        self.previous = NAN
+        self.avg_gain = Wilder(n)
+        self.avg_loss = Wilder(n)
+
+    def update(self, close: float) -> float:
+        if not math.isnan(self.previous):
+            change = close - self.previous
+            self.avg_gain.update(change if change > 0 else 0.0)
+            self.avg_loss.update(-change if change < 0 else 0.0)
+        self.previous = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        gain, loss = self.avg_gain.value, self.avg_loss.value
+        if math.isnan(gain):
+            return NAN
+        if loss == 0.0:
+            return 50.0 if gain == 0.0 else 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+class MACD(StreamingIndicator):
+    _state = ("fast", "slow", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__(fast, slow, signal)
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float) -> Dict[str, float]:
+        line = self.fast.update(close) - self.slow.update(close)
+        if not math.isnan(line):
+            self.signal.update(line)
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        line = self.fast.value - self.slow.value
+        signal = self.signal.value
+        return {"macd": line, "signal": signal, "hist": line - signal}
+
+
+class Bollinger(StreamingIndicator):
+    _state = ("stats",)
+
+    def __init__(self, n: int = 20, k: float = 2.0):
+        super().__init__(n, k)
+        self.k = k
+        self.stats = RollingStats(n)
+
+    def update(self, close: float) -> Dict[str, float]:
+        self.stats.update(close)
+        return self.value
+
+    @property
+    def value(self) -> Dict[str, float]:
+        if not self.stats.full:
+            return {"mid": NAN, "upper": NAN, "lower": NAN}
+        mid, width = self.stats.mean, self.k * self.stats.std
+        return {"mid": mid, "upper": mid + width, "lower": mid - width}
+
+
+class ZScore(StreamingIndicator):
+    _state = ("stats", "last")
+
+    def __init__(self, n: int = 20):
+        super().__init__(n)
+        self.stats = RollingStats(n)
+        self.last = NAN
+
+    def update(self, close: float) -> float:
+        self.stats.update(close)
+        self.last = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        std = self.stats.std
+        if math.isnan(std):
+            return NAN
+        return 0.0 if std == 0.0 else (self.last - self.stats.mean) / std
+
+
+class ATR(StreamingIndicator):
+    inputs = ("h", "l", "c")
+    _state = ("previous_close", "average")
+
+    def __init__(self, n: int = 14):
+        super().__init__(n)
+        self.previous_close = NAN
+        self.average = Wilder(n)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = high - low
+        if not math.isnan(self.previous_close):
+            true_range = max(true_range, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.previous_close = close
+        return self.average.update(true_range)
+
+    @property
+    def value(self) -> float:
+        return self.average.value
+
+
+class VWAP(StreamingIndicator):
+    """Volume-weighted typical price: cumulative (n=0) or over the last n bars"""
+
+    inputs = ("h", "l", "c", "v")
+    _state = ("window", "weighted", "volume", "updates")
+
+    def __init__(self, n: int = 0):
+        super().__init__(n)
+        self.n = n
+        self.window = deque(maxlen=n or None)
+        self.weighted = 0.0
+        self.volume = 0.0
+        self.updates = 0
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        weighted = (high + low + close) / 3.0 * volume
+        if self.n:
+            if len(self.window) == self.n:
+                old_weighted, old_volume = self.window[0]
+                self.weighted -= old_weighted
+                self.volume -= old_volume
+            self.window.append((weighted, volume))
+        self.weighted += weighted
+        self.volume += volume
+
+        self.updates += 1
+        if self.n and self.updates % RECOMPUTE_EVERY == 0:
+            self.weighted = sum(w for w, _ in self.window)
+            self.volume = sum(v for _, v in self.window)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.n and len(self.window) < self.n:
+            return NAN
+        return self.weighted / self.volume if self.volume > 0 else NAN
+
+
+# Spec name (as in core.indicators) -> streaming class
+STREAMING_INDICATORS: Dict[str, Type[StreamingIndicator]] = {
+    "sma": SMA,
+    "ema": EMA,
+    "rsi": RSI,
+    "macd": MACD,
+    "bbands": Bollinger,
+    "atr": ATR,
+    "vwap": VWAP,
+    "zscore": ZScore,
+    "max": RollingMax,
+    "min": RollingMin,
+    "std": RollingStats,
+}
+
+INDICATOR_CLASSES_BY_TYPE: Dict[str, Type[StreamingIndicator]] = {
+    cls.__name__: cls for cls in (*STREAMING_INDICATORS.values(), ExponentialAverage, Wilder)
+}
+
+
+def create(spec: str) -> StreamingIndicator:
+    """Streaming indicator for a spec such as 'ema:20' or 'macd:12:26:9'"""
+    name, params = parse_spec(spec)
+    return STREAMING_INDICATORS[name](*params)
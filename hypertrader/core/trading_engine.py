@@ -5,11 +5,16 @@ Trading engine for order management and execution
 import logging
 import threading
 import time
-from typing import Dict, List, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable
 from datetime import datetime
 
 from core.hyperliquid_client import HyperliquidClient
 from core.data_manager import DataManager
+from core.indicator_graph import IndicatorGraph
+from core.backtester import BacktestResult, backtest_strategy
+from core.portfolio import PortfolioResult, portfolio_backtest
+from core.signal_compiler import compile_signal
+from core.strategy_runtime import BarBuilder, Signal, StrategyRuntime
 from models.order import Order, OrderType, OrderSide, OrderStatus
 from models.strategy import Strategy, StrategyStatus
 from utils.helpers import calculate_position_size, validate_order_params
@@ -25,6 +30,7 @@ class TradingEngine:
         # Engine state
         self.is_running = False
         self.engine_thread = None
+        self.wake_event = threading.Event()
         
         # Order tracking
         self.active_orders: Dict[str, Order] = {}
@@ -33,6 +39,18 @@ class TradingEngine:
         # Strategy management
         self.active_strategies: Dict[str, Strategy] = {}
         
+        # Indicators shared by all strategies, resumed from the last run
+        self.indicator_graph = IndicatorGraph()
+        self.indicator_lock = threading.Lock()
+        try:
+            self.indicator_graph.restore(self.data_manager.get_indicator_states())
+        except Exception as e:
+            self.logger.warning(f"Could not restore indicator state: {e}")
+            
+        # Strategies run on bar and tick events; bars are built from live mids
+        self.runtime = StrategyRuntime(self._execute_signal, self._record_trade)
+        self.bar_builders: Dict[str, Dict[str, BarBuilder]] = {}
+        
         # Risk management
         self.daily_loss_limit = 1000.0  # USD
         self.max_position_size = 10.0   # USD
@@ -44,22 +62,36 @@ class TradingEngine:
             return
             
         self.is_running = True
+        self.wake_event.clear()
+        self.runtime.start()
         self.engine_thread = threading.Thread(target=self._engine_loop)
         self.engine_thread.daemon = True
         self.engine_thread.start()
+        self.hyperliquid_client.start_websocket(self._on_market_message)
         
         self.logger.info("Trading engine started")
         
     def stop(self):
         """Stop the trading engine"""
         self.is_running = False
+        self.wake_event.set()
+        self.hyperliquid_client.stop_websocket()
+        self.runtime.stop()
         if self.engine_thread:
             self.engine_thread.join(timeout=5)
             
+        try:
+            with self.indicator_lock:
+                states = self.indicator_graph.snapshot()
+            self.data_manager.save_indicator_states(states)
+        except Exception as e:
+            self.logger.error(f"Failed to save indicator state: {e}")
+            
         self.logger.info("Trading engine stopped")
         
     def place_order(self, coin: str, side: OrderSide, size: float, price: Optional[float] = None,
-                   order_type: OrderType = OrderType.LIMIT, callback: Optional[Callable] = None) -> Optional[Order]:
+                   order_type: OrderType = OrderType.LIMIT, callback: Optional[Callable] = None,
+                   reduce_only: bool = False) -> Optional[Order]:
         """Place an order through the engine"""
         try:
             # Validate order parameters
@@ -69,12 +101,12 @@ class TradingEngine:
                 return None
                 
             # Risk checks
-            if not self._check_risk_limits(size, price):
+            if not self._check_risk_limits(coin, size, price, reduce_only):
                 self.logger.error("Order rejected by risk management")
                 return None
                 
             # Place order via API
-            order = self.hyperliquid_client.place_order(coin, side, size, price, order_type)
+            order = self.hyperliquid_client.place_order(coin, side, size, price, order_type, reduce_only)
             
             if order:
                 # Track the order
@@ -128,6 +160,14 @@ class TradingEngine:
     def add_strategy(self, strategy: Strategy):
         """Add a strategy to the engine"""
         try:
+            config = strategy.config
+            # Indicators the entry signal reads from price columns come from the graph too
+            specs = list(dict.fromkeys(config.indicators + compile_signal(config.entry_signal).indicator_specs))
+            builder = BarBuilder(config.interval)
+            with self.indicator_lock:
+                self.indicator_graph.subscribe(strategy.strategy_id, strategy.coin, config.interval, specs)
+            self.bar_builders.setdefault(strategy.coin, {}).setdefault(config.interval, builder)
+            self.runtime.add(strategy)
             self.active_strategies[strategy.strategy_id] = strategy
             self.data_manager.save_strategy(strategy)
             self.logger.info(f"Strategy added: {strategy.name}")
@@ -138,7 +178,18 @@ class TradingEngine:
         """Remove a strategy from the engine"""
         try:
             if strategy_id in self.active_strategies:
-                del self.active_strategies[strategy_id]
+                strategy = self.active_strategies.pop(strategy_id)
+                self.runtime.remove(strategy_id)
+                with self.indicator_lock:
+                    self.indicator_graph.unsubscribe(strategy_id)
+                    still_read = (strategy.coin, strategy.config.interval) in self.indicator_graph.sources
+                    
+                # Stop building bars nobody reads
+                if not still_read:
+                    builders = self.bar_builders.get(strategy.coin, {})
+                    builders.pop(strategy.config.interval, None)
+                    if not builders:
+                        self.bar_builders.pop(strategy.coin, None)
                 self.logger.info(f"Strategy removed: {strategy_id}")
         except Exception as e:
             self.logger.error(f"Failed to remove strategy: {e}")
@@ -165,6 +216,116 @@ class TradingEngine:
         except Exception as e:
             self.logger.error(f"Failed to stop strategy: {e}")
             
+    def backtest_strategy(self, strategy_id: str, start_ms: Optional[int] = None,
+                          end_ms: Optional[int] = None, **kwargs) -> Optional[BacktestResult]:
+        """Backtest a strategy over the stored candles of its coin and interval"""
+        try:
+            strategy = self.active_strategies.get(strategy_id)
+            if strategy is None:
+                self.logger.warning(f"Strategy {strategy_id} not found")
+                return None
+                
+            candles = self.data_manager.get_candles(strategy.coin, strategy.config.interval, start_ms, end_ms)
+            if len(candles["t"]) < 2:
+                self.logger.warning(f"No stored {strategy.config.interval} candles for {strategy.coin}")
+                return None
+                
+            result = backtest_strategy(strategy, candles, **kwargs)
+            self.logger.info(
+                f"Backtest {strategy.name}: {result.performance.total_trades} trades, "
+                f"{result.performance.total_return_percent:.2f}% return"
+            )
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Failed to backtest strategy: {e}")
+            return None
+            
+    def backtest_portfolio(self, strategy_ids: Optional[List[str]] = None, start_ms: Optional[int] = None,
+                           end_ms: Optional[int] = None, **kwargs) -> Optional[PortfolioResult]:
+        """Backtest strategies together on one account with the engine's risk limits"""
+        try:
+            ids = strategy_ids if strategy_ids is not None else list(self.active_strategies)
+            strategies = [self.active_strategies[sid] for sid in ids if sid in self.active_strategies]
+            if not strategies:
+                self.logger.warning("No strategies to backtest")
+                return None
+                
+            intervals = {strategy.config.interval for strategy in strategies}
+            if len(intervals) > 1:
+                self.logger.error(f"Portfolio backtest needs one interval, got {', '.join(sorted(intervals))}")
+                return None
+            interval = intervals.pop()
+            
+            candles = {}
+            for coin in dict.fromkeys(strategy.coin for strategy in strategies):
+                candles[coin] = self.data_manager.get_candles(coin, interval, start_ms, end_ms)
+                if len(candles[coin]["t"]) < 2:
+                    self.logger.warning(f"No stored {interval} candles for {coin}")
+                    return None
+                    
+            kwargs.setdefault("daily_loss_limit", self.daily_loss_limit)
+            kwargs.setdefault("max_order_value", self.max_position_size)
+            result = portfolio_backtest(strategies, candles, **kwargs)
+            self.logger.info(
+                f"Portfolio backtest of {len(strategies)} strategies: "
+                f"{result.performance.total_trades} trades, {result.performance.total_return_percent:.2f}% return"
+            )
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Failed to backtest portfolio: {e}")
+            return None
+            
+    def on_bar(self, coin: str, interval: str, bar: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+        """Feed a closed candle (o/h/l/c/v) to the shared indicators and the strategies.
+        
+        Each distinct indicator is updated once; returns the current indicator
+        values of every strategy reading this coin and interval. Bars are built
+        from live mids while the engine runs, so only feed bars from elsewhere
+        for coins and intervals without a live feed.
+        """
+        with self.indicator_lock:
+            affected = self.indicator_graph.on_bar(coin, interval, bar)
+            values = {
+                strategy_id: self.indicator_graph.values_for(strategy_id)
+                for strategy_id in affected
+            }
+        if values:
+            self.runtime.publish_bar(coin, interval, bar, values)
+        return values
+        
+    def on_tick(self, coin: str, price: float, t_ms: Optional[int] = None):
+        """Feed a live price: closes any finished bars of the coin, then reaches its strategies"""
+        t_ms = t_ms or int(time.time() * 1000)
+        for interval, builder in list(self.bar_builders.get(coin, {}).items()):
+            bar = builder.update(price, t_ms)
+            if bar is not None:
+                self.on_bar(coin, interval, bar)
+        self.runtime.publish_tick(coin, price, t_ms)
+        
+    def _on_market_message(self, message: Dict[str, Any]):
+        """WebSocket callback: turn allMids updates into ticks for the coins strategies trade"""
+        if message.get("channel") != "allMids":
+            return
+        mids = message.get("data", {}).get("mids", {})
+        t_ms = int(time.time() * 1000)
+        for coin in self.runtime.coins():
+            if coin in mids:
+                self.on_tick(coin, float(mids[coin]), t_ms)
+                
+    def _execute_signal(self, signal: Signal) -> Optional[Order]:
+        """Send a strategy's signal through the engine's checks as a market order"""
+        order = self.place_order(signal.coin, signal.side, signal.size, None, OrderType.MARKET,
+                                 reduce_only=signal.reduce_only)
+        if order:
+            self.logger.info(f"Strategy {signal.strategy_id} {signal.reason}: {signal.side.value} {signal.size} {signal.coin}")
+        return order
+        
+    def _record_trade(self, strategy: Strategy, pnl: float):
+        """Count a closed strategy trade against the daily loss limit"""
+        self.current_daily_loss = max(0.0, self.current_daily_loss - pnl)
+        
     def get_active_orders(self) -> List[Order]:
         """Get all active orders"""
         return list(self.active_orders.values())
@@ -182,18 +343,18 @@ class TradingEngine:
                 # Update order statuses
                 self._update_orders()
                 
-                # Process strategies
-                self._process_strategies()
+                # Refresh the equity strategies size positions from
+                self._update_equity()
                 
                 # Risk management checks
                 self._check_risk_management()
                 
-                # Sleep before next iteration
-                time.sleep(1)  # 1 second cycle
+                # Strategies run on events; this loop only does housekeeping
+                self.wake_event.wait(1)  # 1 second cycle, ends at once on stop
                 
             except Exception as e:
                 self.logger.error(f"Error in engine loop: {e}")
-                time.sleep(5)  # Longer sleep on error
+                self.wake_event.wait(5)  # Longer wait on error
                 
     def _update_orders(self):
         """Update status of active orders"""
@@ -232,16 +393,16 @@ class TradingEngine:
         except Exception as e:
             self.logger.error(f"Error updating orders: {e}")
             
-    def _process_strategies(self):
-        """Process active strategies"""
+    def _update_equity(self):
+        """Update the account value used to size strategy entries"""
         try:
-            for strategy in self.active_strategies.values():
-                if strategy.status == StrategyStatus.ACTIVE:
-                    # This is where strategy logic would be implemented
-                    # For now, just update the last signal time
-                    pass
+            if not self.runtime.strategies:
+                return
+            account = self.hyperliquid_client.get_account_info()
+            if account:
+                self.runtime.equity = account.account_value
         except Exception as e:
-            self.logger.error(f"Error processing strategies: {e}")
+            self.logger.error(f"Error updating equity: {e}")
             
     def _check_risk_management(self):
         """Check risk management rules"""
@@ -256,23 +417,27 @@ class TradingEngine:
         except Exception as e:
             self.logger.error(f"Error in risk management: {e}")
             
-    def _check_risk_limits(self, size: float, price: Optional[float]) -> bool:
+    def _check_risk_limits(self, coin: str, size: float, price: Optional[float], reduce_only: bool = False) -> bool:
         """Check if order passes risk limits"""
         try:
             # Calculate position value
             if price is None:
-                # For market orders, get current price
-                return True  # Skip risk check for market orders for now
+                # Market orders are valued at the current price
+                market_data = self.hyperliquid_client.get_market_data(coin)
+                price = market_data.get("price") if market_data else None
+                if not price:
+                    self.logger.warning(f"No price available to value market order for {coin}")
+                    return False
                 
             position_value = size * price
             
-            # Check maximum position size
-            if position_value > self.max_position_size:
+            # Check maximum position size (closing positions is always allowed)
+            if position_value > self.max_position_size and not reduce_only:
                 self.logger.warning(f"Position value {position_value} exceeds max position size {self.max_position_size}")
                 return False
                 
-            # Check daily loss limit
-            if self.current_daily_loss >= self.daily_loss_limit:
+            # Check daily loss limit (closing positions is still allowed)
+            if self.current_daily_loss >= self.daily_loss_limit and not reduce_only:
                 self.logger.warning("Daily loss limit reached")
                 return False
                 
@@ -290,5 +455,7 @@ class TradingEngine:
             "active_strategies": len([s for s in self.active_strategies.values() if s.status == StrategyStatus.ACTIVE]),
             "total_strategies": len(self.active_strategies),
             "current_daily_loss": self.current_daily_loss,
-            "daily_loss_limit": self.daily_loss_limit
+            "daily_loss_limit": self.daily_loss_limit,
+            "indicators": self.indicator_graph.stats(),
+            "runtime": self.runtime.stats()
         }
\ No newline at end of file
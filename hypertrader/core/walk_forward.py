@@ -0,0 +1,169 @@
+"""
+Walk-forward validation
+
+The candle history is split into consecutive windows: parameters are
+optimized on an in-sample window, then backtested unchanged on the
+out-of-sample window that follows it, and the split rolls forward by the
+out-of-sample length (or grows from the start when anchored). Windows are
+independent, so every window of every coin runs as one task on a shared
+process pool, with all candles and entry signals in shared memory.
+
+Entry signals are computed once over each coin's full history; indicators
+only look back, so no window sees data after its end. Each out-of-sample
+backtest starts flat.
+
+The summary shows how the out-of-sample results hold up: the mean in- and
+out-of-sample ranking metric, the compounded out-of-sample return, the share
+of profitable out-of-sample windows and the walk-forward efficiency (the
+out-of-sample return per bar over the in-sample return per bar).
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.backtester import backtest, entry_signals
+from core.optimizer import METRICS, SIGNAL_PARAMETERS, SweepRunner, search, shared_columns
+from models.strategy import StrategyConfig
+
+
+@dataclass
+class WindowResult:
+    """One in-sample optimization and its out-of-sample test"""
+    coin: str
+    in_sample_start: int    # Epoch ms of the first bar
+    out_of_sample_start: int
+    out_of_sample_end: int  # Epoch ms of the last bar
+    in_sample_bars: int
+    out_of_sample_bars: int
+    params: Dict[str, Any]
+    in_sample: Dict[str, float]
+    out_of_sample: Dict[str, float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "coin": self.coin,
+            "in_sample_start": self.in_sample_start,
+            "out_of_sample_start": self.out_of_sample_start,
+            "out_of_sample_end": self.out_of_sample_end,
+            "in_sample_bars": self.in_sample_bars,
+            "out_of_sample_bars": self.out_of_sample_bars,
+            "params": self.params,
+            "in_sample": self.in_sample,
+            "out_of_sample": self.out_of_sample
+        }
+
+
+@dataclass
+class WalkForwardResult:
+    """Every window of a walk-forward run, in coin and time order"""
+    windows: List[WindowResult]
+    metric: str = "sharpe_ratio"
+
+    def summary(self, coin: Optional[str] = None) -> Dict[str, float]:
+        """Out-of-sample robustness across windows (of one coin, or all)"""
+        windows = [w for w in self.windows if coin is None or w.coin == coin]
+        if not windows:
+            return {"windows": 0}
+        in_metric = np.array([w.in_sample[self.metric] for w in windows])
+        out_metric = np.array([w.out_of_sample[self.metric] for w in windows])
+        out_returns = np.array([w.out_of_sample["total_return_percent"] for w in windows]) / 100.0
+        in_returns = np.array([w.in_sample["total_return_percent"] for w in windows]) / 100.0
+        in_bars = np.array([w.in_sample_bars for w in windows], dtype=np.float64)
+        out_bars = np.array([w.out_of_sample_bars for w in windows], dtype=np.float64)
+
+        in_rate = (in_returns / in_bars).mean()
+        efficiency = (out_returns / out_bars).mean() / in_rate if in_rate > 0 else float("nan")
+        return {
+            "windows": len(windows),
+            f"in_sample_{self.metric}": float(np.nanmean(in_metric)),
+            f"out_of_sample_{self.metric}": float(np.nanmean(out_metric)),
+            f"out_of_sample_{self.metric}_std": float(np.nanstd(out_metric)),
+            "out_of_sample_return_percent": float((np.prod(1.0 + out_returns) - 1.0) * 100.0),
+            "profitable_windows_percent": float((out_returns > 0).mean() * 100.0),
+            "out_of_sample_trades": int(sum(w.out_of_sample["total_trades"] for w in windows)),
+            "walk_forward_efficiency": float(efficiency)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        coins = list(dict.fromkeys(w.coin for w in self.windows))
+        return {
+            "metric": self.metric,
+            "summary": self.summary(),
+            "coins": {coin: self.summary(coin) for coin in coins},
+            "windows": [w.to_dict() for w in self.windows]
+        }
+
+
+def split_windows(bars: int, in_sample: int, out_of_sample: int,
+                  anchored: bool = False) -> List[Tuple[int, int, int]]:
+    """(in-sample start, out-of-sample start, out-of-sample end) bar indices, end exclusive"""
+    if in_sample < 2 or out_of_sample < 2:
+        raise ValueError("Windows need at least two bars")
+    windows = []
+    start = in_sample
+    while start + out_of_sample <= bars:
+        windows.append((0 if anchored else start - in_sample, start, start + out_of_sample))
+        start += out_of_sample
+    return windows
+
+
+def walk_forward(config: StrategyConfig, candles_by_coin: Dict[str, Dict[str, np.ndarray]],
+                 space: Dict[str, Any], in_sample: int, out_of_sample: int,
+                 method: str = "grid", trials: int = 50, metric: str = "sharpe_ratio",
+                 anchored: bool = False, workers: Optional[int] = None, seed: Optional[int] = None,
+                 **backtest_kwargs) -> WalkForwardResult:
+    """Walk-forward optimize config over each coin's candles, window sizes in bars.
+
+    space is a grid for method 'grid', or a search space for 'random' and 'bayes'.
+    """
+    if SIGNAL_PARAMETERS & set(space):
+        raise ValueError("Walk-forward keeps the entry signal fixed; sweep it separately")
+
+    # Every coin's columns and entry signal in one shared block
+    columns: Dict[str, np.ndarray] = {}
+    tasks = []
+    for coin, candles in candles_by_coin.items():
+        signal = entry_signals(config, candles)
+        for name, values in list(candles.items()) + [("signal", signal)]:
+            columns[f"{coin}|{name}"] = np.ascontiguousarray(values)
+        for start, split, end in split_windows(len(candles["t"]), in_sample, out_of_sample, anchored):
+            window_seed = None if seed is None else seed + len(tasks)
+            tasks.append((coin, start, split, end, config, space, method, trials, metric, window_seed, backtest_kwargs))
+
+    if not tasks:
+        return WalkForwardResult([], metric)
+    with SweepRunner(config, columns, workers, signal_fixed=False) as runner:
+        windows = runner.map(_run_window, tasks)
+    return WalkForwardResult(windows, metric)
+
+
+def _run_window(task) -> WindowResult:
+    coin, start, split, end, config, space, method, trials, metric, seed, backtest_kwargs = task
+    columns = shared_columns()
+    names = [key.split("|", 1)[1] for key in columns if key.startswith(f"{coin}|")]
+    window = lambda first, last: {name: columns[f"{coin}|{name}"][first:last] for name in names}
+
+    in_sample = window(start, split)
+    optimized = search(config, in_sample, space, method, trials, metric, seed,
+                       signal=in_sample.pop("signal"), **backtest_kwargs)
+    best = optimized.order()[0]
+
+    out_of_sample = window(split, end)
+    result = backtest(replace(config, **optimized.best), out_of_sample,
+                      signal=out_of_sample.pop("signal"), **backtest_kwargs)
+    performance = result.performance.to_dict()
+
+    t = columns[f"{coin}|t"]
+    return WindowResult(
+        coin=coin,
+        in_sample_start=int(t[start]),
+        out_of_sample_start=int(t[split]),
+        out_of_sample_end=int(t[end - 1]),
+        in_sample_bars=split - start,
+        out_of_sample_bars=end - split,
+        params=optimized.best,
+        in_sample={name: float(values[best]) for name, values in optimized.metrics.items()},
+        out_of_sample={name: float(performance[name]) for name in METRICS}
+    )
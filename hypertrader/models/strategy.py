@@ -22,7 +22,9 @@ class StrategyType(Enum):
 class StrategyConfig:
     """Strategy configuration parameters"""
     # Entry conditions
-    entry_signal: str = ""
+    entry_signal: str = ""  # Expression over prices and indicators, see core.signal_compiler
+    indicators: List[str] = field(default_factory=list)  # Indicator specs, e.g. "rsi:14", "macd:12:26:9"
+    interval: str = "1h"  # Bar interval the indicators and signal run on
     entry_price_type: str = "market"  # market, limit, stop
     entry_size_type: str = "fixed"    # fixed, percentage, risk_based
     entry_size_value: float = 0.1
@@ -45,6 +47,7 @@ class StrategyConfig:
     max_trade_duration: Optional[int] = None  # minutes
     trading_hours_start: str = "00:00"
     trading_hours_end: str = "23:59"
+    latency_budget_ms: float = 1.0  # Live decision time allowed after a tick or bar arrives
     
     # Advanced
     leverage: float = 1.0
@@ -56,6 +59,8 @@ class StrategyConfig:
         """Convert to dictionary"""
         return {
             "entry_signal": self.entry_signal,
+            "indicators": list(self.indicators),
+            "interval": self.interval,
             "entry_price_type": self.entry_price_type,
             "entry_size_type": self.entry_size_type,
             "entry_size_value": self.entry_size_value,
@@ -72,6 +77,7 @@ class StrategyConfig:
             "max_trade_duration": self.max_trade_duration,
             "trading_hours_start": self.trading_hours_start,
             "trading_hours_end": self.trading_hours_end,
+            "latency_budget_ms": self.latency_budget_ms,
             "leverage": self.leverage,
             "hedge_enabled": self.hedge_enabled,
             "scale_in_enabled": self.scale_in_enabled,
@@ -0,0 +1,20 @@
+"""
+Shared fixtures for the desktop app's numeric core.
+
+The desktop app imports its packages from the hypertrader directory (core,
+models, ...), the way main.py runs it.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "hypertrader"))
+
+from tests.helpers import make_candles  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def candles():
+    return make_candles(3000)
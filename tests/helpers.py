@@ -0,0 +1,21 @@
+"""Synthetic market data for the tests"""
+
+import numpy as np
+
+
+def make_candles(n: int, seed: int = 0, volatility: float = 0.002, start_ms: int = 1_600_000_000_000):
+    """Random-walk 1m OHLCV columns"""
+    rng = np.random.default_rng(seed)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    o = np.r_[100.0, c[:-1]]
+    h = np.maximum(o, c) * (1 + np.abs(rng.normal(0, volatility / 2, n)))
+    l = np.minimum(o, c) * (1 - np.abs(rng.normal(0, volatility / 2, n)))
+    v = rng.uniform(1, 10, n)
+    t = np.arange(n, dtype=np.int64) * 60_000 + start_ms
+    return {"t": t, "o": o, "h": h, "l": l, "c": c, "v": v}
+
+
+def bars(candles):
+    """The candles as the per-bar mappings streaming code consumes"""
+    columns = [candles[key] for key in "ohlcv"]
+    return [dict(zip("ohlcv", values)) for values in zip(*columns)]
@@ -0,0 +1,168 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from core import backtester
+from core.backtester import EXIT_REASONS, SIGNAL, TAKE_PROFIT, END, backtest, entry_signals, position_size
+from core.portfolio import portfolio_backtest
+from models.strategy import Strategy, StrategyConfig
+from tests.helpers import make_candles
+
+RSI_SIGNAL = "long: rsi:14 < 25; short: rsi:14 > 75"
+
+CONFIGS = [
+    dict(stop_loss_enabled=True, take_profit_enabled=True),
+    dict(trailing_stop_enabled=True, trailing_stop_percent=0.5),
+    dict(stop_loss_enabled=True, trailing_stop_enabled=True, take_profit_enabled=True, take_profit_percent=3),
+]
+
+
+def reference_backtest(config, candles, signal, equity=backtester.DEFAULT_INITIAL_EQUITY,
+                       fee=backtester.DEFAULT_FEE_RATE, slippage=backtester.DEFAULT_SLIPPAGE):
+    """Bar-by-bar simulation of the backtester's execution model; returns (entry bar, exit bar, pnl) per trade"""
+    o, h, l, c = (candles[key] for key in "ohlc")
+    stop_loss = config.stop_loss_percent / 100 if config.stop_loss_enabled else 0
+    take_profit = config.take_profit_percent / 100 if config.take_profit_enabled else 0
+    trail = config.trailing_stop_percent / 100 if config.trailing_stop_enabled else 0
+    trades = []
+    position = None
+    i = 1
+    while i < len(o):
+        if position is None:
+            side = signal[i - 1]
+            if not side:
+                i += 1
+                continue
+            entry = o[i] * (1 + side * slippage)
+            size = position_size(config, equity, entry, stop_loss)
+            entry_fee = size * entry * fee
+            stop = entry * (1 - side * stop_loss) if stop_loss else None
+            liquidation = entry - side * (equity - entry_fee) / size
+            position = (i, side, entry, size, entry_fee, stop, liquidation)
+            best = entry
+        start, side, entry, size, entry_fee, stop, liquidation = position
+
+        exit_price = reason = None
+        if i > start and signal[i - 1] == -side:
+            exit_price, reason = o[i] * (1 - side * slippage), SIGNAL
+        else:
+            levels = [liquidation] + ([stop] if stop is not None else []) + ([best * (1 - side * trail)] if trail else [])
+            level = max(levels) if side == 1 else min(levels)
+            target = entry * (1 + side * take_profit)
+            if (side == 1 and l[i] <= level) or (side == -1 and h[i] >= level):
+                exit_price = (min(o[i], level) if side == 1 else max(o[i], level)) * (1 - side * slippage)
+            elif take_profit and ((side == 1 and h[i] >= target) or (side == -1 and l[i] <= target)):
+                exit_price, reason = (max(o[i], target) if side == 1 else min(o[i], target)), TAKE_PROFIT
+            elif i == len(o) - 1:
+                exit_price, reason = c[i] * (1 - side * slippage), END
+            if trail:
+                best = max(best, h[i]) if side == 1 else min(best, l[i])
+        if exit_price is None:
+            i += 1
+            continue
+
+        pnl = max(size * side * (exit_price - entry) - entry_fee - size * exit_price * fee, -equity)
+        equity += pnl
+        trades.append((start, i, pnl))
+        position = None
+        # A signal exit reverses on the same open
+        if reason != SIGNAL:
+            i += 1
+    return trades, equity
+
+
+@pytest.fixture(scope="module")
+def long_candles():
+    return make_candles(20000, seed=1)
+
+
+def strategy_config(**overrides):
+    return StrategyConfig(entry_signal=RSI_SIGNAL, daily_loss_limit=0, max_drawdown=0, **overrides)
+
+
+@pytest.mark.parametrize("overrides", CONFIGS)
+def test_matches_bar_by_bar_reference(long_candles, overrides):
+    config = strategy_config(**overrides)
+    result = backtest(config, long_candles)
+    trades, equity = reference_backtest(config, long_candles, entry_signals(config, long_candles))
+
+    assert result.performance.total_trades == len(trades) > 10
+    bar_of = {t: i for i, t in enumerate(long_candles["t"])}
+    assert [bar_of[t] for t in result.trades["entry_time"]] == [trade[0] for trade in trades]
+    assert [bar_of[t] for t in result.trades["exit_time"]] == [trade[1] for trade in trades]
+    np.testing.assert_allclose(result.trades["pnl"], [trade[2] for trade in trades], rtol=1e-9, atol=1e-9)
+    assert result.equity[-1] == pytest.approx(equity, rel=1e-9)
+
+
+def reversal_candles():
+    """A long signal, then a short one whose exit bar dips through the long's stop"""
+    o = np.full(6, 100.0)
+    c = np.array([101.0, 100.0, 99.0, 100.0, 100.0, 100.0])
+    h = np.maximum(o, c) + 0.5
+    l = np.minimum(o, c) - 0.5
+    l[3] = 90.0
+    t = np.arange(6, dtype=np.int64) * 3_600_000
+    return {"t": t, "o": o, "h": h, "l": l, "c": c, "v": np.ones(6)}
+
+
+REVERSAL = StrategyConfig(entry_signal="long: close > open; short: close < open", stop_loss_enabled=True,
+                          stop_loss_percent=2, entry_size_value=1, daily_loss_limit=0, max_drawdown=0)
+
+
+def test_signal_exit_fills_before_stops_in_its_bar():
+    candles = reversal_candles()
+    np.testing.assert_array_equal(entry_signals(REVERSAL, candles), [1, 0, -1, 0, 0, 0])
+    result = backtest(REVERSAL, candles, fee_rate=0, slippage=0)
+    assert [EXIT_REASONS[reason] for reason in result.trades["reason"]] == ["signal", "end"]
+    np.testing.assert_array_equal(result.trades["side"], [1, -1])
+    np.testing.assert_array_equal(result.trades["exit_price"], [100.0, 100.0])
+
+
+def test_portfolio_signal_exit_fills_before_stops_in_its_bar():
+    strategy = Strategy("r", "r", coin="BTC", config=REVERSAL)
+    result = portfolio_backtest([strategy], {"BTC": reversal_candles()}, fee_rate=0, slippage=0)
+    assert [EXIT_REASONS[reason] for reason in result.trades["reason"]] == ["signal", "end"]
+    np.testing.assert_array_equal(result.trades["side"], [1, -1])
+
+
+def test_performance_fields(long_candles):
+    result = backtest(strategy_config(**CONFIGS[2]), long_candles)
+    performance = result.performance
+    pnl = result.trades["pnl"]
+
+    assert performance.total_trades == len(pnl)
+    assert performance.winning_trades == (pnl > 0).sum()
+    assert performance.winning_trades + performance.losing_trades == performance.total_trades
+    assert performance.total_pnl == pytest.approx(pnl.sum())
+    assert result.equity[-1] == pytest.approx(result.initial_equity + pnl.sum())
+    assert performance.total_return_percent == pytest.approx(pnl.sum() / result.initial_equity * 100)
+    assert performance.largest_win == pytest.approx(pnl.max())
+    assert performance.largest_loss == pytest.approx(pnl.min())
+    assert performance.avg_win == pytest.approx(pnl[pnl > 0].mean())
+    assert performance.avg_loss == pytest.approx(pnl[pnl < 0].mean())
+    assert performance.profit_factor == pytest.approx(pnl[pnl > 0].sum() / -pnl[pnl < 0].sum())
+    assert performance.max_drawdown >= 0 and 0 <= performance.max_drawdown_percent <= 100
+    assert 1 <= performance.consecutive_wins <= performance.winning_trades
+    assert 1 <= performance.consecutive_losses <= performance.losing_trades
+    assert np.isfinite(performance.sharpe_ratio) and performance.sharpe_ratio != 0
+    assert performance.start_date is not None and performance.end_date > performance.start_date
+    # Every field is reported
+    assert {field.name for field in dataclasses.fields(performance)} <= set(performance.to_dict())
+
+
+def test_portfolio_of_one_matches_backtest(long_candles):
+    config = strategy_config(stop_loss_enabled=True, take_profit_enabled=True, trailing_stop_enabled=True,
+                             max_trade_duration=300)
+    portfolio = portfolio_backtest([Strategy("a", "a", coin="BTC", config=config)], {"BTC": long_candles})
+    single = backtest(config, long_candles)
+
+    assert portfolio.performance.total_trades == single.performance.total_trades
+    np.testing.assert_allclose(portfolio.trades["pnl"], single.trades["pnl"], rtol=1e-9, atol=1e-9)
+    assert portfolio.equity[-1] == pytest.approx(single.equity[-1], rel=1e-12)
+
+
+def test_too_few_bars():
+    result = backtest(strategy_config(), make_candles(1))
+    assert result.performance.total_trades == 0
+    assert len(result.trades["pnl"]) == 0
@@ -0,0 +1,94 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from core import indicators, streaming_indicators
+from core.indicator_graph import IndicatorGraph
+from tests.helpers import bars
+
+SPECS = ["sma:20", "ema:20", "rsi:14", "macd:12:26:9", "bbands:20:2", "atr:14", "vwap", "vwap:20",
+         "zscore:20", "max:20", "min:20", "std:20"]
+
+
+def columns(values):
+    """Per-bar values (floats or dicts of floats) as arrays keyed like the batch result"""
+    if isinstance(values[0], dict):
+        return {key: np.array([value[key] for value in values]) for key in values[0]}
+    return np.array(values)
+
+
+def assert_same_series(streamed, batch, rtol=1e-9):
+    if isinstance(batch, dict):
+        assert streamed.keys() == batch.keys()
+        for key in batch:
+            assert_same_series(streamed[key], batch[key], rtol)
+        return
+    # Warm-up bars line up exactly, values agree to rounding
+    np.testing.assert_array_equal(np.isnan(streamed), np.isnan(batch))
+    valid = ~np.isnan(batch)
+    np.testing.assert_allclose(streamed[valid], batch[valid], rtol=rtol, atol=1e-9)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_streaming_matches_batch(candles, spec):
+    indicator = streaming_indicators.create(spec)
+    streamed = columns([indicator.update_bar(bar) for bar in bars(candles)])
+    assert_same_series(streamed, indicators.compute(spec, candles))
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_streaming_resumes_from_snapshot(candles, spec):
+    feed = bars(candles)
+    half = len(feed) // 2
+    first = streaming_indicators.create(spec)
+    values = [first.update_bar(bar) for bar in feed[:half]]
+    # Through JSON, as DataManager stores it
+    resumed = streaming_indicators.StreamingIndicator.from_snapshot(json.loads(json.dumps(first.snapshot())))
+    values += [resumed.update_bar(bar) for bar in feed[half:]]
+    assert_same_series(columns(values), indicators.compute(spec, candles))
+
+
+def test_graph_matches_batch(candles):
+    graph = IndicatorGraph()
+    graph.subscribe("a", "BTC", "1m", SPECS)
+    streamed = []
+    for bar in bars(candles):
+        graph.on_bar("BTC", "1m", bar)
+        streamed.append(graph.values_for("a"))
+    for spec in SPECS:
+        assert_same_series(columns([values[spec] for values in streamed]), indicators.compute(spec, candles))
+
+
+def test_resubscribe_keeps_history(candles):
+    graph = IndicatorGraph()
+    graph.subscribe("a", "BTC", "1m", ["sma:20", "rsi:14"])
+    for bar in bars(candles)[:100]:
+        graph.on_bar("BTC", "1m", bar)
+    before = graph.values_for("a")["sma:20"]
+    graph.subscribe("a", "BTC", "1m", ["sma:20", "ema:20"])
+    values = graph.values_for("a")
+    assert values["sma:20"] == before
+    expected = indicators.compute("ema:20", {key: column[:100] for key, column in candles.items()})[-1]
+    assert math.isclose(values["ema:20"], expected, rel_tol=1e-9)
+
+
+@pytest.mark.parametrize("spec", ["rsi:0", "atr:0", "sma:-1", "bbands:20:0", "bbands:20:-2", "macd:x", "foo:3",
+                                  "sma:1:2"])
+def test_parse_spec_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        indicators.parse_spec(spec)
+
+
+def test_parse_spec_defaults():
+    assert indicators.parse_spec("macd") == ("macd", (12, 26, 9))
+    assert indicators.parse_spec("bbands:10") == ("bbands", (10, 2.0))
+    assert indicators.parse_spec("vwap:0") == ("vwap", (0,))
+
+
+def test_zero_bars():
+    empty = {key: np.zeros(0) for key in "ohlcv"}
+    for spec, values in indicators.compute_many(SPECS, empty).items():
+        for series in (values.values() if isinstance(values, dict) else [values]):
+            assert len(series) == 0, spec
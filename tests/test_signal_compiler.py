@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from core import indicators
+from core.indicator_graph import IndicatorGraph
+from core.signal_compiler import SignalSyntaxError, compile_signal
+from tests.helpers import bars
+
+EXPRESSIONS = [
+    "long: rsi:14 < 30 and close > ema:200; short: rsi:14 > 70",
+    "macd:12:26:9.hist > 0",
+    "bbands:20:2.lower > close; short: close > bbands:20:2.upper and volume > 5",
+    "close > vwap and zscore:20 < -1",
+    "LONG: RSI:14 < 40",
+    "long: ema(close,20) > ema(close,50) and rsi(14) < 30; short: ema(20) < ema:50 and rsi(14) > 70",
+    "cross_above(ema(20), sma(50)); short: cross_below(ema(close, 20), sma(close,50))",
+    "ema(rsi(14), 5) > 55 and not (atr(14) / close > 0.002)",
+    "abs(zscore(20)) > 1.5 and (high - low) / close * 100 > 0.4 or macd(12,26,9).hist > 0.01",
+    "sma(high, 10) - sma(low, 10) > 2 * std(20); short: max(20) == high",
+    "1 < 2 and close > open",
+    "close / (open - open) > 0",
+    "bbands(20, 2.5).upper < close and ema(bbands(20,2).mid, 3) > 0",
+]
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_incremental_matches_vectorized(candles, source):
+    program = compile_signal(source)
+    vectorized = program.evaluate(candles)
+    incremental = program.incremental()
+    streamed = np.array([incremental.update(bar) for bar in bars(candles)], dtype=np.int8)
+    np.testing.assert_array_equal(streamed, vectorized)
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_shared_graph_matches_vectorized(candles, source):
+    program = compile_signal(source)
+    graph = IndicatorGraph()
+    graph.subscribe("s", "BTC", "1m", program.indicator_specs)
+    incremental = program.incremental(shared=True)
+    streamed = []
+    for bar in bars(candles):
+        graph.on_bar("BTC", "1m", bar)
+        streamed.append(incremental.update(bar, graph.values_for("s")))
+    np.testing.assert_array_equal(np.array(streamed, dtype=np.int8), program.evaluate(candles))
+
+
+def test_legacy_specs_read_batch_indicators(candles):
+    rsi = indicators.compute("rsi:14", candles)
+    ema = indicators.compute("ema:200", candles)
+    with np.errstate(invalid="ignore"):
+        long = (rsi < 30) & (candles["c"] > ema)
+        short = rsi > 70
+    expected = np.where(long, 1, np.where(short, -1, 0))
+    np.testing.assert_array_equal(compile_signal(EXPRESSIONS[0]).evaluate(candles), expected)
+
+
+def test_signals_fire(candles):
+    # Guards the parity tests against comparing two all-zero series
+    assert (compile_signal(EXPRESSIONS[0]).evaluate(candles) != 0).any()
+    assert (compile_signal(EXPRESSIONS[6]).evaluate(candles) != 0).any()
+
+
+def test_empty_signal_never_trades(candles):
+    assert not compile_signal("").evaluate(candles).any()
+
+
+def test_universe_matches_single_coin(candles):
+    program = compile_signal(EXPRESSIONS[5])
+    scaled = [{key: column * (1 + k * 0.01) if key != "t" else column for key, column in candles.items()}
+              for k in range(3)]
+    universe = {key: np.stack([coin[key] for coin in scaled]) for key in "ohlcv"}
+    result = program.evaluate(universe)
+    for row, coin in enumerate(scaled):
+        np.testing.assert_array_equal(result[row], program.evaluate(coin))
+
+
+@pytest.mark.parametrize("source", ["rsi(14)", "close >", "macd(12,26,9) > 0", "foo(3) > 1",
+                                    "ema(close, x) > 1", "close > 1 and 3", "macd.zz > 1", "rsi:14 <> 3"])
+def test_syntax_errors(source):
+    with pytest.raises(SignalSyntaxError):
+        compile_signal(source)